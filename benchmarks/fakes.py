@@ -0,0 +1,261 @@
+"""
+ベンチマーク用の偽Discordオブジェクトと偽HTTP層。
+
+`Voice` Cog が参照する属性・メソッドだけを実装し、REST呼び出しは `FakeHTTP` を通して
+設定した遅延と 429 を発生させます。`member.move_to` の完了時には、ゲートウェイと同じように
+`on_voice_state_update` を発火させます。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import random
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import discord
+
+_snowflakes = itertools.count(1_000_000_000_000_000_000)
+
+
+def next_snowflake() -> int:
+    return next(_snowflakes)
+
+
+class FakeRateLimited(discord.HTTPException):
+    """偽HTTP層が返す 429（`discord.HTTPException` として扱われる）。
+
+    ``is_global=True`` ならグローバルの制限として ``X-RateLimit-Global`` / ``X-RateLimit-Scope`` ヘッダを付けます。
+    """
+
+    def __init__(self, retry_after: float, *, is_global: bool = False) -> None:
+        Exception.__init__(self, f"429 Too Many Requests (retry after {retry_after:.3f}s)")
+        headers = {"Retry-After": f"{retry_after:.3f}", "X-RateLimit-Scope": "global" if is_global else "user"}
+        if is_global:
+            headers["X-RateLimit-Global"] = "true"
+        self.response = SimpleNamespace(status=429, headers=headers)
+        self.status = 429
+        self.code = 0
+        self.text = "You are being rate limited."
+        self.retry_after = retry_after
+
+
+class FakeNotConnected(discord.HTTPException):
+    """ボイスに接続していないメンバーを移動しようとしたときのエラー（Discordの 40032 相当）。"""
+
+    def __init__(self) -> None:
+        Exception.__init__(self, "400 Bad Request (error code: 40032): Target user is not connected to voice.")
+        self.response = None
+        self.status = 400
+        self.code = 40032
+        self.text = "Target user is not connected to voice."
+
+
+class FakeHTTP:
+    """遅延と 429 を設定できるHTTP層の代わり。"""
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        rate_limit_probability: float = 0.0,
+        retry_after: float = 0.5,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self.requests: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+
+    async def request(self, route: str) -> None:
+        self.requests[route] += 1
+        await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        if self.rate_limit_probability and self._random.random() < self.rate_limit_probability:
+            self.rate_limited[route] += 1
+            raise FakeRateLimited(self.retry_after)
+
+    def stats(self) -> dict:
+        return {
+            "requests": sum(self.requests.values()),
+            "by_route": dict(self.requests),
+            "rate_limited": sum(self.rate_limited.values()),
+        }
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, guild: "FakeGuild", name: str, *, bitrate: int = 64000, user_limit: int = 0) -> None:
+        self.id = next_snowflake()
+        self.guild = guild
+        self.name = name
+        self.bitrate = bitrate
+        self.user_limit = user_limit
+        self.category_id = None
+        self.nsfw = False
+        self.position = 0
+        self._fake_members: List["FakeMember"] = []
+        self._fake_overwrites: Dict[Any, discord.PermissionOverwrite] = {}
+
+    @property
+    def members(self) -> List["FakeMember"]:
+        return list(self._fake_members)
+
+    @property
+    def overwrites(self) -> Dict[Any, discord.PermissionOverwrite]:
+        return dict(self._fake_overwrites)
+
+    @property
+    def category(self) -> None:
+        return None
+
+    async def edit(self, **options: Any) -> "FakeVoiceChannel":
+        await self.guild.http.request("PATCH /channels/{channel_id}")
+        if "name" in options:
+            self.name = options["name"]
+        if "overwrites" in options:
+            self._fake_overwrites = dict(options["overwrites"])
+        for key in ("bitrate", "user_limit"):
+            if key in options:
+                setattr(self, key, options[key])
+        return self
+
+    async def delete(self, *, reason: Optional[str] = None) -> None:
+        await self.guild.http.request("DELETE /channels/{channel_id}")
+        self.guild.remove_channel(self)
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild: "FakeGuild", name: str) -> None:
+        self.id = next_snowflake()
+        self.guild = guild
+        self.name = name
+        self.category_id = None
+        self.sent: List[str] = []
+
+    async def send(self, content: str = "", **kwargs: Any) -> None:
+        await self.guild.http.request("POST /channels/{channel_id}/messages")
+        self.sent.append(content)
+
+
+class FakeMember:
+    def __init__(self, guild: "FakeGuild", index: int) -> None:
+        self.id = next_snowflake()
+        self.guild = guild
+        self.name = f"user{index}"
+        self.display_name = f"User {index}"
+        self.bot = False
+        self.voice: Optional[SimpleNamespace] = None
+        # ベンチマーク計測用: 直近のベースVC入室時刻
+        self.join_started_at: Optional[float] = None
+
+    @property
+    def channel(self) -> Optional[FakeVoiceChannel]:
+        return self.voice.channel if self.voice else None
+
+    async def move_to(self, channel: Optional[FakeVoiceChannel], **kwargs: Any) -> None:
+        await self.guild.http.request("PATCH /guilds/{guild_id}/members/{user_id}")
+        if self.voice is None and channel is not None:
+            raise FakeNotConnected()
+        self.guild.client.move(self, channel)
+
+    async def send(self, content: str = "", **kwargs: Any) -> None:
+        await self.guild.http.request("POST /channels/{dm_id}/messages")
+
+
+class FakeGuild:
+    def __init__(self, client: "FakeClient", name: str) -> None:
+        self.id = next_snowflake()
+        self.client = client
+        self.http = client.http
+        self.name = name
+        self.unavailable = False
+        self.me = SimpleNamespace(id=0, name="bot", display_name="bot")
+        self._channels: Dict[int, discord.abc.GuildChannel] = {}
+
+    def get_channel(self, channel_id: int) -> Optional[discord.abc.GuildChannel]:
+        return self._channels.get(channel_id)
+
+    def add_channel(self, channel: discord.abc.GuildChannel) -> None:
+        self._channels[channel.id] = channel
+        self.client.channels[channel.id] = channel
+
+    def remove_channel(self, channel: discord.abc.GuildChannel) -> None:
+        self._channels.pop(channel.id, None)
+        self.client.channels.pop(channel.id, None)
+
+    async def create_voice_channel(self, name: str, **options: Any) -> FakeVoiceChannel:
+        await self.http.request("POST /guilds/{guild_id}/channels")
+        channel = FakeVoiceChannel(
+            self, name, bitrate=options.get("bitrate", 64000), user_limit=options.get("user_limit", 0)
+        )
+        channel._fake_overwrites = dict(options.get("overwrites") or {})
+        self.add_channel(channel)
+        return channel
+
+
+class FakeClient:
+    """`commands.Bot` の代わり。ボイス状態の変化を `on_voice_state_update` として配送します。"""
+
+    def __init__(self, http: FakeHTTP, database: Any, *, logger: Optional[logging.Logger] = None) -> None:
+        self.http = http
+        self.database = database
+        self.logger = logger or logging.getLogger("benchmark")
+        self.guilds: List[FakeGuild] = []
+        self.channels: Dict[int, discord.abc.GuildChannel] = {}
+        self.listener: Optional[Callable[..., Awaitable[None]]] = None
+        self.on_move: Optional[Callable[[FakeMember, Optional[FakeVoiceChannel], Optional[FakeVoiceChannel]], None]] = None
+        self.dispatched = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    # ---- commands.Bot 互換 ----
+    def get_channel(self, channel_id: int) -> Optional[discord.abc.GuildChannel]:
+        return self.channels.get(channel_id)
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        for guild in self.guilds:
+            if guild.id == guild_id:
+                return guild
+        return None
+
+    def is_ready(self) -> bool:
+        return True
+
+    async def wait_until_ready(self) -> None:
+        return None
+
+    # ---- ボイス状態 ----
+    def add_guild(self, name: str) -> FakeGuild:
+        guild = FakeGuild(self, name)
+        self.guilds.append(guild)
+        return guild
+
+    def move(self, member: FakeMember, channel: Optional[FakeVoiceChannel]) -> None:
+        """メンバーのボイス状態を変更し、ゲートウェイ同様にイベントを配送します。"""
+        before_channel = member.channel
+        if before_channel is channel:
+            return
+        if before_channel is not None and member in before_channel._fake_members:
+            before_channel._fake_members.remove(member)
+        if channel is not None:
+            channel._fake_members.append(member)
+        member.voice = SimpleNamespace(channel=channel) if channel is not None else None
+        if self.on_move is not None:
+            self.on_move(member, before_channel, channel)
+        if self.listener is not None:
+            self.dispatched += 1
+            task = asyncio.create_task(
+                self.listener(member, SimpleNamespace(channel=before_channel), SimpleNamespace(channel=channel))
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def drain(self) -> None:
+        """配送済みイベントのリスナーがすべて終わるまで待ちます。"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,281 @@
+"""
+実行プロファイル（`BOT_PROFILE`）ごとのメモリ使用量と準備完了までの時間の比較ベンチマーク。
+
+Discord に接続せず、合成した READY と GUILD_CREATE のペイロードを JSON 文字列から復号して
+`commands.Bot` の接続状態に直接流し込み、`on_ready` までの時間と RSS を計測します。
+その後、プロファイルのインテントで Discord が送ってくるイベント（メッセージ・リアクション・入力中・入退室）だけを
+同じように流し込み、準備完了後のイベント処理の時間も計測します。
+
+RSS を比べるため、各プロファイルは別プロセスで実行します。
+
+使い方:
+    python -m benchmarks.gateway_profile --guilds 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import discord
+from discord.ext import commands
+
+from benchmarks.voice_replay import git_revision
+from helpers.gateway_profile import PROFILES, build_profile
+
+BOT_ID = 900000000000000000
+# 最後の GUILD_CREATE から READY を出すまで discord.py が待つ時間（計測値からは差し引く）
+GUILD_READY_TIMEOUT = 0.2
+
+
+def rss_kb() -> int:
+    """現在の RSS（KB）。/proc がない環境では最大 RSS を返します。"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            return int(file.read().split()[1]) * (os.sysconf("SC_PAGE_SIZE") // 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _user(user_id: int, name: str) -> dict:
+    return {"id": str(user_id), "username": name, "discriminator": "0", "global_name": None, "avatar": None}
+
+
+def _member(user_id: int, name: str) -> dict:
+    return {"user": _user(user_id, name), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+
+
+def guild_payload(index: int, args: argparse.Namespace, rng: random.Random) -> dict:
+    guild_id = (index + 1) << 22 | 1
+    ids = iter(range(guild_id + 1, guild_id + 100000))
+    overwrites = [{"id": str(guild_id), "type": 0, "allow": "0", "deny": "1024"}]
+    channels = [
+        {"id": str(next(ids)), "type": 4, "name": f"category-{i}", "position": i, "permission_overwrites": overwrites}
+        for i in range(3)
+    ]
+    channels += [
+        {"id": str(next(ids)), "type": 0, "name": f"text-{i}", "position": i, "permission_overwrites": overwrites, "topic": "x" * 40, "nsfw": False}
+        for i in range(args.text_channels)
+    ]
+    voice = [
+        {"id": str(next(ids)), "type": 2, "name": f"voice-{i}", "position": i, "permission_overwrites": overwrites, "bitrate": 64000, "user_limit": 0}
+        for i in range(args.voice_channels)
+    ]
+    channels += voice
+    roles = [
+        {"id": str(guild_id if i == 0 else next(ids)), "name": "@everyone" if i == 0 else f"role-{i}", "permissions": "1071698529857",
+         "position": i, "color": 0, "hoist": False, "managed": False, "mentionable": False}
+        for i in range(args.roles)
+    ]
+    emojis = [
+        {"id": str(next(ids)), "name": f"emoji_{i}", "roles": [], "require_colons": True, "managed": False, "animated": False, "available": True}
+        for i in range(args.emojis)
+    ]
+    stickers = [
+        {"id": str(next(ids)), "name": f"sticker_{i}", "description": "x" * 20, "tags": "x", "type": 2, "format_type": 1,
+         "available": True, "guild_id": str(guild_id)}
+        for i in range(args.stickers)
+    ]
+    # インテントに members がなくても、GUILD_CREATE にはボット自身とボイスチャンネルにいるメンバーが含まれる
+    members = [_member(BOT_ID, "bot")]
+    voice_states = []
+    for i in range(args.voice_members):
+        user_id = next(ids)
+        members.append(_member(user_id, f"user-{index}-{i}"))
+        voice_states.append({"user_id": str(user_id), "channel_id": rng.choice(voice)["id"], "session_id": "x",
+                             "deaf": False, "mute": False, "self_deaf": False, "self_mute": False, "suppress": False})
+    return {
+        "id": str(guild_id),
+        "name": f"guild-{index}",
+        "owner_id": str(BOT_ID + 1),
+        "member_count": args.member_count,
+        "large": args.member_count >= 250,
+        "unavailable": False,
+        "features": [],
+        "channels": channels,
+        "roles": roles,
+        "emojis": emojis,
+        "stickers": stickers,
+        "members": members,
+        "voice_states": voice_states,
+        "threads": [],
+        "presences": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def event_stream(guilds: List[dict], intents: discord.Intents, args: argparse.Namespace, rng: random.Random) -> Iterator[str]:
+    """ギルドで起きる ``args.events`` 件の出来事のうち、プロファイルのインテントで Discord が送ってくるものだけを JSON 文字列で生成します。"""
+    allowed = {
+        "MESSAGE_CREATE": intents.guild_messages,
+        "MESSAGE_REACTION_ADD": intents.guild_reactions,
+        "TYPING_START": intents.guild_typing,
+        "VOICE_STATE_UPDATE": intents.voice_states,
+    }
+    kinds = list(allowed)
+    # メッセージ系のイベントは入退室よりずっと多い
+    weights = [1 if kind == "VOICE_STATE_UPDATE" else args.chat_ratio for kind in kinds]
+    for i in range(args.events):
+        # どのプロファイルでも同じ出来事の列になるよう、乱数は常に同じ回数だけ使う
+        guild = rng.choice(guilds)
+        kind = rng.choices(kinds, weights)[0]
+        voice_id = rng.choice([c for c in guild["channels"] if c["type"] == 2])["id"]
+        author = _user(BOT_ID + 10 + rng.randrange(10_000), "chatter")
+        if not allowed[kind]:
+            continue
+        channel = next(c for c in guild["channels"] if c["type"] == 0)
+        if kind == "MESSAGE_CREATE":
+            data = {"id": str(BOT_ID + 1_000_000 + i), "channel_id": channel["id"], "guild_id": guild["id"], "author": author,
+                    "member": {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0},
+                    "content": "hello " * 8, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+                    "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [],
+                    "pinned": False, "type": 0}
+        elif kind == "MESSAGE_REACTION_ADD":
+            data = {"user_id": author["id"], "channel_id": channel["id"], "message_id": str(BOT_ID + 1_000_000 + i),
+                    "guild_id": guild["id"], "emoji": {"id": None, "name": "👍"}, "type": 0, "burst": False}
+        elif kind == "TYPING_START":
+            data = {"user_id": author["id"], "channel_id": channel["id"], "guild_id": guild["id"], "timestamp": 0}
+        else:
+            data = {"guild_id": guild["id"], "channel_id": voice_id, "user_id": author["id"], "session_id": "x",
+                    "deaf": False, "mute": False, "self_deaf": False, "self_mute": False, "suppress": False,
+                    "member": {"user": author, "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}}
+        yield json.dumps({"op": 0, "t": kind, "d": data})
+
+
+async def run_profile(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    guilds = [guild_payload(i, args, rng) for i in range(args.guilds)]
+    raw_guilds = [json.dumps({"op": 0, "t": "GUILD_CREATE", "d": guild}) for guild in guilds]
+    intents, options = build_profile(args.profile)
+    raw_events = list(event_stream(guilds, intents, args, rng))
+    del guilds
+    gc.collect()
+
+    bot = commands.Bot(command_prefix="!", intents=intents, help_command=None, **options)
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.guild_ready_timeout = GUILD_READY_TIMEOUT
+    ready = asyncio.Event()
+
+    async def on_ready() -> None:
+        ready.set()
+
+    bot.add_listener(on_ready)
+    rss_before = rss_kb()
+
+    started = time.perf_counter()
+    state.parsers["READY"](
+        {"v": 10, "user": _user(BOT_ID, "bot") | {"bot": True}, "guilds": [], "session_id": "x", "resume_gateway_url": "wss://example.invalid", "application": {"id": str(BOT_ID), "flags": 0}}
+    )
+    for raw in raw_guilds:
+        payload = json.loads(raw)
+        state.parsers[payload["t"]](payload["d"])
+        # ゲートウェイからの受信と同じく、GUILD_CREATE ごとにイベントループへ制御を返す
+        await asyncio.sleep(0)
+    await ready.wait()
+    time_to_ready = time.perf_counter() - started - GUILD_READY_TIMEOUT
+    del raw_guilds
+    gc.collect()
+    rss_ready = rss_kb()
+
+    started = time.perf_counter()
+    for i, raw in enumerate(raw_events):
+        payload = json.loads(raw)
+        state.parsers[payload["t"]](payload["d"])
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    events_seconds = time.perf_counter() - started
+    events = len(raw_events)
+    del raw_events
+    gc.collect()
+    rss_after = rss_kb()
+
+    caches = {
+        "guilds": len(bot.guilds),
+        "members": sum(len(guild._members) for guild in bot.guilds),
+        "emojis": len(bot.emojis),
+        "stickers": len(bot.stickers),
+        "messages": len(state._messages) if state._messages is not None else 0,
+    }
+    await bot.close()
+    return {
+        "profile": args.profile,
+        "intents": intents.value,
+        "time_to_ready_s": round(time_to_ready, 3),
+        "rss_kb": {"baseline": rss_before, "ready": rss_ready, "after_events": rss_after},
+        "rss_delta_kb": {"ready": rss_ready - rss_before, "after_events": rss_after - rss_before},
+        "events": {"occurred": args.events, "delivered": events, "seconds": round(events_seconds, 3)},
+        "caches": caches,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="BOT_PROFILE ごとの RSS と準備完了時間の比較ベンチマーク")
+    parser.add_argument("--profile", choices=PROFILES, help="指定したプロファイルだけを現在のプロセスで実行する")
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--text-channels", type=int, default=20)
+    parser.add_argument("--voice-channels", type=int, default=8)
+    parser.add_argument("--roles", type=int, default=30)
+    parser.add_argument("--emojis", type=int, default=50)
+    parser.add_argument("--stickers", type=int, default=5)
+    parser.add_argument("--voice-members", type=int, default=5, help="ギルドごとにボイスチャンネルにいるメンバー数")
+    parser.add_argument("--member-count", type=int, default=500)
+    parser.add_argument("--events", type=int, default=50000, help="準備完了後に流すイベント数（インテントで届かない種類は除く）")
+    parser.add_argument("--chat-ratio", type=int, default=20, help="入退室1件あたりのメッセージ系イベントの比率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.profile:
+        print(json.dumps(asyncio.run(run_profile(args)), ensure_ascii=False))
+        return
+    forwarded = [arg for arg in (argv if argv is not None else sys.argv[1:])]
+    if "--output" in forwarded:
+        index = forwarded.index("--output")
+        del forwarded[index : index + 2]
+    results: Dict[str, dict] = {}
+    for profile in PROFILES:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.gateway_profile", "--profile", profile, *forwarded],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        results[profile] = json.loads(completed.stdout.strip().splitlines()[-1])
+    default, lean = results["default"], results["lean"]
+    result = {
+        "revision": git_revision(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "profile")},
+        "profiles": results,
+        "lean_vs_default": {
+            "rss_delta_ratio": round(lean["rss_delta_kb"]["after_events"] / max(1, default["rss_delta_kb"]["after_events"]), 3),
+            "time_to_ready_ratio": round(lean["time_to_ready_s"] / max(1e-9, default["time_to_ready_s"]), 3),
+            "events_delivered_ratio": round(lean["events"]["delivered"] / max(1, default["events"]["delivered"]), 3),
+        },
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+スキーマ v1（TEXT キー・全行インデックス）と v2（INTEGER キー・部分インデックス）の比較ベンチマーク。
+
+削除済みの履歴を大量に含む v1 のDBを作り、稼働中の生成VC数を数えるクエリを計測した後、
+`DatabaseManager.migrate()` で v2 に移行して同じクエリを計測します。移行にかかった時間とファイルサイズも出力します。
+
+使い方:
+    python -m benchmarks.schema_v2 --rows 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, List, Optional
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.voice_replay import git_revision
+from database import DatabaseManager, open_connection
+
+# 比較用: v2 以前の schema.sql（スノーフレークは TEXT、稼働中判定は (guild_id, deleted_at) の全行インデックス）
+SCHEMA_V1 = """
+CREATE TABLE IF NOT EXISTS `warns` (
+  `id` int(11) NOT NULL,
+  `user_id` varchar(20) NOT NULL,
+  `server_id` varchar(20) NOT NULL,
+  `moderator_id` varchar(20) NOT NULL,
+  `reason` varchar(255) NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS `guild_vc_settings` (
+  `guild_id` TEXT PRIMARY KEY,
+  `base_name_template` TEXT NOT NULL DEFAULT '{user_name}のVC',
+  `name_counter` INTEGER NOT NULL DEFAULT 0,
+  `max_channels` INTEGER NOT NULL DEFAULT 50,
+  `delete_delay` INTEGER NOT NULL DEFAULT 30,
+  `log_channel_id` TEXT
+);
+CREATE TABLE IF NOT EXISTS `vc_base_channels` (
+  `channel_id` TEXT PRIMARY KEY,
+  `guild_id` TEXT NOT NULL,
+  `creator_id` TEXT,
+  `name_template` TEXT,
+  `name_counter` INTEGER NOT NULL DEFAULT 1,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `pool_size` INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS `vc_generated_channels` (
+  `channel_id` TEXT PRIMARY KEY,
+  `guild_id` TEXT NOT NULL,
+  `base_channel_id` TEXT NOT NULL,
+  `creator_id` TEXT,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `deleted_at` TIMESTAMP,
+  `delete_due_at` REAL
+);
+CREATE INDEX IF NOT EXISTS `idx_vc_generated_guild_active`
+ON `vc_generated_channels` (`guild_id`, `deleted_at`);
+CREATE INDEX IF NOT EXISTS `idx_vc_base_guild`
+ON `vc_base_channels` (`guild_id`);
+"""
+
+SNOWFLAKE = 1_000_000_000_000_000_000
+
+
+async def populate(path: str, args: argparse.Namespace) -> dict:
+    """v1 のDBに、削除済みの履歴と稼働中の行を作ります。"""
+    rng = random.Random(args.seed)
+    connection = await open_connection(path)
+    await connection.executescript(SCHEMA_V1)
+    bases = [(SNOWFLAKE + g * 1000 + b, SNOWFLAKE + g) for g in range(args.guilds) for b in range(args.bases)]
+    await connection.executemany(
+        "INSERT INTO vc_base_channels(channel_id, guild_id) VALUES(?, ?)",
+        [(str(base_id), str(guild_id)) for base_id, guild_id in bases],
+    )
+    await connection.executemany(
+        "INSERT INTO guild_vc_settings(guild_id) VALUES(?)",
+        [(str(SNOWFLAKE + g),) for g in range(args.guilds)],
+    )
+
+    def rows(count: int, deleted: bool, offset: int):
+        for i in range(count):
+            base_id, guild_id = bases[rng.randrange(len(bases))]
+            yield (
+                str(SNOWFLAKE * 2 + offset + i),
+                str(guild_id),
+                str(base_id),
+                str(SNOWFLAKE * 3 + rng.randrange(100_000)),
+                "2024-01-01 00:00:00" if deleted else None,
+            )
+
+    sql = "INSERT INTO vc_generated_channels(channel_id, guild_id, base_channel_id, creator_id, deleted_at) VALUES(?, ?, ?, ?, ?)"
+    await connection.executemany(sql, rows(args.rows, True, 0))
+    await connection.executemany(sql, rows(args.active, False, args.rows))
+    await connection.commit()
+    await connection.close()
+    return {"bases": len(bases), "historical_rows": args.rows, "active_rows": args.active}
+
+
+async def measure(call: Callable[[], Awaitable[object]], repeat: int) -> dict:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+    }
+
+
+async def measure_queries(path: str, args: argparse.Namespace) -> dict:
+    database = DatabaseManager(connection=await open_connection(path))
+    rng = random.Random(args.seed + 1)
+    base_ids = [SNOWFLAKE + g * 1000 + b for g in range(args.guilds) for b in range(args.bases)]
+    per_base = "SELECT COUNT(*) FROM vc_generated_channels WHERE base_channel_id=? AND deleted_at IS NULL"
+
+    async def count_for_base() -> None:
+        async with database.connection.execute(per_base, (rng.choice(base_ids),)) as cursor:
+            await cursor.fetchone()
+
+    try:
+        result = {
+            "count_active_generated_channels_for_base": await measure(count_for_base, args.repeat),
+            "count_active_generated_channels": await measure(
+                lambda: database.count_active_generated_channels(SNOWFLAKE + rng.randrange(args.guilds)), args.repeat
+            ),
+            "get_active_generated_channels": await measure(database.get_active_generated_channels, max(1, args.repeat // 10)),
+        }
+        async with database.connection.execute(
+            "EXPLAIN QUERY PLAN " + per_base,
+            (base_ids[0],),
+        ) as cursor:
+            result["plan_for_base"] = [row[-1] for row in await cursor.fetchall()]
+        return result
+    finally:
+        await database.close()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    workdir = tempfile.mkdtemp(prefix="vc-schema-bench-")
+    path = os.path.join(workdir, "database.db")
+    started = time.perf_counter()
+    dataset = await populate(path, args)
+    populate_seconds = time.perf_counter() - started
+    size_v1 = os.path.getsize(path)
+    before = await measure_queries(path, args)
+
+    database = DatabaseManager(connection=await open_connection(path))
+    started = time.perf_counter()
+    await database.migrate()
+    migrate_seconds = time.perf_counter() - started
+    await database.connection.execute("VACUUM")
+    await database.close()
+    size_v2 = os.path.getsize(path)
+    after = await measure_queries(path, args)
+    return {
+        "revision": git_revision(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "dataset": dataset,
+        "populate_s": round(populate_seconds, 2),
+        "migrate_s": round(migrate_seconds, 2),
+        "file_size_mb": {"v1": round(size_v1 / 2**20, 1), "v2_after_vacuum": round(size_v2 / 2**20, 1)},
+        "v1": before,
+        "v2": after,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="スキーマ v1 / v2 のクエリ比較ベンチマーク")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="削除済みの履歴行の数")
+    parser.add_argument("--active", type=int, default=2_000, help="稼働中の生成VCの数")
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--bases", type=int, default=4, help="ギルドごとのベースVC数")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+オフラインのボイスイベント再生・負荷ベンチマーク。
+
+実際のDiscordに接続せず、偽の `Guild` / `VoiceChannel` / `Member` と偽HTTP層（遅延・429を設定可能）に対して
+`Voice.on_voice_state_update` を合成または記録済みのイベント列で駆動し、結果をJSONで出力します。
+
+使い方:
+    python -m benchmarks.voice_replay --scenario join_storm --guilds 4 --members 200
+    python -m benchmarks.voice_replay --scenario mass_leave --rate-limit-prob 0.05 --output result.json
+    python -m benchmarks.voice_replay --events recorded.jsonl
+
+記録済みイベント（JSON Lines）の形式:
+    {"t": 0.12, "guild": 0, "member": 5, "to": "base:0"}
+    - t: 開始からの秒数 / guild, member: 0始まりの番号
+    - to: "base:<番号>"（ベースVC）, "own"（そのメンバー用に生成されたVC）, "lobby"（管理外のVC）, null（切断）
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeClient, FakeGuild, FakeHTTP, FakeMember, FakeTextChannel, FakeVoiceChannel
+from cogs.voice import Voice
+from database import DatabaseManager, open_connection
+from database.profiler import QueryProfiler
+
+
+class CountingConnection:
+    """aiosqlite 接続をラップし、発行したクエリとコミットの回数を数えます。"""
+
+    def __init__(self, connection: Any, counters: Dict[str, int]) -> None:
+        self._connection = connection
+        self._counters = counters
+
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        self._counters["queries"] += 1
+        return self._connection.execute(*args, **kwargs)
+
+    def executemany(self, *args: Any, **kwargs: Any) -> Any:
+        self._counters["queries"] += 1
+        return self._connection.executemany(*args, **kwargs)
+
+    def execute_fetchall(self, *args: Any, **kwargs: Any) -> Any:
+        self._counters["queries"] += 1
+        return self._connection.execute_fetchall(*args, **kwargs)
+
+    async def commit(self) -> None:
+        self._counters["commits"] += 1
+        await self._connection.commit()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+
+# -----------------
+# シナリオ
+# -----------------
+def scenario_join_storm(args: argparse.Namespace, rng: random.Random) -> List[dict]:
+    """全員が `duration` 秒の間にランダムなベースVCへ入室します。"""
+    events = []
+    for guild in range(args.guilds):
+        for member in range(args.members):
+            events.append(
+                {"t": rng.uniform(0, args.duration), "guild": guild, "member": member, "to": f"base:{rng.randrange(args.bases)}"}
+            )
+    return events
+
+
+def scenario_mass_leave(args: argparse.Namespace, rng: random.Random) -> List[dict]:
+    """入室ストームの後、全員がほぼ同時に切断します。"""
+    events = scenario_join_storm(args, rng)
+    leave_at = args.duration + args.settle
+    for guild in range(args.guilds):
+        for member in range(args.members):
+            events.append({"t": leave_at + rng.uniform(0, 0.1), "guild": guild, "member": member, "to": None})
+    return events
+
+
+def scenario_hopping(args: argparse.Namespace, rng: random.Random) -> List[dict]:
+    """入室後、生成VC・ロビー・ベースVCの間を短い間隔で行き来し、最後に切断します。"""
+    events = scenario_join_storm(args, rng)
+    for guild in range(args.guilds):
+        for member in range(args.members):
+            t = args.duration + args.settle
+            for _ in range(args.hops):
+                t += rng.uniform(0.05, 0.4)
+                to = rng.choice(["own", "lobby", f"base:{rng.randrange(args.bases)}", "own"])
+                events.append({"t": t, "guild": guild, "member": member, "to": to})
+            events.append({"t": t + 0.1, "guild": guild, "member": member, "to": None})
+    return events
+
+
+SCENARIOS = {
+    "join_storm": scenario_join_storm,
+    "mass_leave": scenario_mass_leave,
+    "hopping": scenario_hopping,
+}
+
+
+def load_events(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+# -----------------
+# 計測
+# -----------------
+def percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": round(rank(50) * 1000, 2),
+        "p95": round(rank(95) * 1000, 2),
+        "p99": round(rank(99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def _sample_tasks(peak: Dict[str, int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak["tasks"] = max(peak["tasks"], len(asyncio.all_tasks()))
+        await asyncio.sleep(0.01)
+
+
+async def _wait_idle(client: FakeClient, cog: Voice, *, deletions: bool, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await client.drain()
+        stats = cog.stats()
+        busy = stats["joins"]["queued"] or stats["joins"]["running"] or stats["rest"]["delayed"] or any(c["depth"] for c in stats["rest"]["classes"].values())
+        if deletions:
+            busy = busy or stats["deletions"]["pending"] or stats["deletions"]["in_flight"]
+        if not busy and not client._tasks:
+            return
+        await asyncio.sleep(0.05)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(args.seed)
+    events = load_events(args.events) if args.events else SCENARIOS[args.scenario](args, rng)
+    events.sort(key=lambda event: event["t"])
+    guild_count = max([args.guilds] + [event["guild"] + 1 for event in events])
+    member_count = max([args.members] + [event["member"] + 1 for event in events])
+
+    tracemalloc.start()
+    counters = {"queries": 0, "commits": 0}
+    workdir = tempfile.mkdtemp(prefix="vc-bench-")
+    db_path = os.path.join(workdir, "database.db")
+    # スキーマは migrate() が空のDBに schema.sql から作る（書き込み接続を先に開いてDBファイルを作る）
+    connection = CountingConnection(await open_connection(db_path), counters)
+    database = DatabaseManager(
+        connection=connection,
+        read_connections=[
+            CountingConnection(await open_connection(db_path, read_only=True), counters) for _ in range(args.read_pool)
+        ],
+        write_behind_ms=args.write_behind_ms,
+        profiler=QueryProfiler(slow_threshold_ms=0) if args.db_profile else None,
+    )
+    await database.migrate()
+
+    http = FakeHTTP(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_limit_probability=args.rate_limit_prob,
+        retry_after=args.retry_after_ms / 1000,
+        seed=args.seed,
+    )
+    client = FakeClient(http, database)
+
+    # ギルド・ベースVC・メンバーを用意
+    guilds: List[FakeGuild] = []
+    bases: Dict[int, List[FakeVoiceChannel]] = {}
+    lobbies: Dict[int, FakeVoiceChannel] = {}
+    members: Dict[tuple[int, int], FakeMember] = {}
+    for g in range(guild_count):
+        guild = client.add_guild(f"guild{g}")
+        guilds.append(guild)
+        bases[g] = []
+        for b in range(args.bases):
+            base = FakeVoiceChannel(guild, f"base{b}")
+            guild.add_channel(base)
+            bases[g].append(base)
+            await database.add_base_channel(base.id, guild.id, None)
+            if args.pool_size:
+                await database.set_base_pool_size(base.id, args.pool_size)
+        lobby = FakeVoiceChannel(guild, "lobby")
+        guild.add_channel(lobby)
+        lobbies[g] = lobby
+        await database.update_max_channels(guild.id, args.max_channels)
+        await database.update_delete_delay(guild.id, args.delete_delay)
+        if args.log_channel:
+            log_channel = FakeTextChannel(guild, "vc-log")
+            guild.add_channel(log_channel)
+            await database.update_log_channel_id(guild.id, log_channel.id)
+        for m in range(member_count):
+            members[(g, m)] = FakeMember(guild, m)
+
+    cog = Voice(client)
+    await cog.cog_load()
+    await cog._reconcile()
+    client.listener = cog.on_voice_state_update
+
+    # ベースVC入室から生成VCへの移動完了までを計測
+    latencies: List[float] = []
+    own: Dict[int, FakeVoiceChannel] = {}
+
+    def on_move(member: FakeMember, before: Optional[FakeVoiceChannel], after: Optional[FakeVoiceChannel]) -> None:
+        if after is not None and cog._index.is_generated(after.id):
+            own[member.id] = after
+            if before is not None and cog._index.is_base(before.id) and member.join_started_at is not None:
+                latencies.append(time.perf_counter() - member.join_started_at)
+                member.join_started_at = None
+
+    client.on_move = on_move
+    query_baseline = dict(counters)
+    if database.profiler is not None:
+        database.profiler.reset()
+    http_baseline = http.stats()["requests"]
+
+    peak = {"tasks": 0}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_tasks(peak, stop))
+    started = time.perf_counter()
+    joins = 0
+    for event in events:
+        delay = event["t"] - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        g = event["guild"]
+        member = members[(g, event["member"])]
+        to = event.get("to")
+        if to is None:
+            target = None
+        elif to == "lobby":
+            target = lobbies[g]
+        elif to == "own":
+            target = own.get(member.id)
+            if target is None or client.get_channel(target.id) is None:
+                target = lobbies[g]
+        else:
+            target = bases[g][int(str(to).split(":", 1)[1]) % len(bases[g])]
+        if target is not None and cog._index.is_base(target.id):
+            member.join_started_at = time.perf_counter()
+            joins += 1
+        client.move(member, target)
+    replay_seconds = time.perf_counter() - started
+    leaves = any(event.get("to") is None for event in events)
+    await _wait_idle(client, cog, deletions=leaves, timeout=args.delete_delay + args.timeout)
+    await cog._logs.flush()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    voice_stats = cog.stats()
+    db_profile = database.profiler.snapshot(limit=10) if database.profiler is not None else None
+    await cog.cog_unload()
+    await database.close()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    dispatched = max(1, client.dispatched)
+    queries = counters["queries"] - query_baseline["queries"]
+    commits = counters["commits"] - query_baseline["commits"]
+    http_stats = http.stats()
+    http_stats["requests"] -= http_baseline
+    return {
+        "scenario": "replay" if args.events else args.scenario,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "events": {"input": len(events), "dispatched": client.dispatched, "base_joins": joins},
+        "join_to_move_ms": percentiles(latencies),
+        "moves_missing": joins - len(latencies),
+        "db": {
+            "queries": queries,
+            "commits": commits,
+            "queries_per_event": round(queries / dispatched, 3),
+            "commits_per_event": round(commits / dispatched, 3),
+        },
+        "db_profile": db_profile,
+        "http": http_stats,
+        "peak_tasks": peak["tasks"],
+        "memory": {
+            "tracemalloc_peak_kb": round(traced_peak / 1024, 1),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "duration_s": {"replay": round(replay_seconds, 3), "total": round(elapsed, 3)},
+        "voice": voice_stats,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Voice Cog のオフライン負荷ベンチマーク")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="join_storm")
+    parser.add_argument("--events", help="記録済みイベント（JSON Lines）を再生する場合のパス")
+    parser.add_argument("--guilds", type=int, default=2)
+    parser.add_argument("--members", type=int, default=100, help="ギルドごとのメンバー数")
+    parser.add_argument("--bases", type=int, default=2, help="ギルドごとのベースVC数")
+    parser.add_argument("--duration", type=float, default=1.0, help="入室ストームの長さ（秒）")
+    parser.add_argument("--settle", type=float, default=2.0, help="入室ストーム後、次の操作までの待ち時間（秒）")
+    parser.add_argument("--hops", type=int, default=5, help="hopping シナリオでの移動回数")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0, help="各リクエストが 429 になる確率")
+    parser.add_argument("--retry-after-ms", type=float, default=500.0)
+    parser.add_argument("--max-channels", type=int, default=500)
+    parser.add_argument("--delete-delay", type=int, default=1)
+    parser.add_argument("--pool-size", type=int, default=0, help="ベースVCごとの待機複製数")
+    parser.add_argument("--write-behind-ms", type=int, default=0)
+    parser.add_argument("--read-pool", type=int, default=2)
+    parser.add_argument("--log-channel", action="store_true", help="ログチャンネルを設定する")
+    parser.add_argument("--db-profile", action="store_true", help="DBのメソッド別・SQL別の統計を出力に含める")
+    parser.add_argument("--timeout", type=float, default=30.0, help="再生後に処理の完了を待つ上限（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,20 +6,35 @@ Copyright © Krypton 2019-Present - https://github.com/kkrypt0nn (https://krypto
 バージョン: 6.4.0
 """
 
+import asyncio
+import atexit
+import hashlib
 import json
 import logging
 import os
 import platform
 import random
-import sys
+import time
+from collections import Counter
 
-import aiosqlite
 import discord
 from discord.ext import commands, tasks
 from discord.ext.commands import Context
 from dotenv import load_dotenv
 
-from database import DatabaseManager
+from database import DatabaseManager, open_connection
+from database.migrations import enable_incremental_vacuum
+from database.profiler import QueryProfiler
+from database.retention import RetentionJob
+from helpers.cluster import parse_shard_ids
+from helpers.gateway_profile import build_profile
+from helpers import log_pipeline
+from helpers.identify_gate import IdentifyGate
+from helpers.metrics import MetricsRegistry, MetricsServer
+from helpers.startup_timeline import StartupTimeline
+
+# 起動のタイムラインの起点（モジュールの読み込み完了時）
+timeline = StartupTimeline()
 
 load_dotenv()
 
@@ -56,7 +71,11 @@ intents.message_content = True
 intents.presences = True
 """
 
-intents = discord.Intents.default()
+"""
+`BOT_PROFILE=lean` にすると、VC自動作成に必要なインテントとキャッシュだけに絞った省メモリ設定で起動します
+（詳細は helpers/gateway_profile.py）。既定はテンプレート通りの `Intents.default()` です。
+"""
+intents, client_options = build_profile(os.getenv("BOT_PROFILE", "default"))
 
 """
 プレフィックス（通常）コマンドを使用する場合は、これをコメント解除してください。
@@ -89,14 +108,21 @@ class LoggingFormatter(logging.Formatter):
         logging.CRITICAL: red + bold,
     }
 
+    def __init__(self) -> None:
+        super().__init__()
+        # レベルごとのフォーマッタは一度だけ作っておく（レコードごとに作り直さない）
+        self._formatters = {
+            level: logging.Formatter(
+                f"{self.black}{self.bold}{{asctime}}{self.reset} {color}{{levelname:<8}}{self.reset} "
+                f"{self.green}{self.bold}{{name}}{self.reset} {{message}}",
+                "%Y-%m-%d %H:%M:%S",
+                style="{",
+            )
+            for level, color in self.COLORS.items()
+        }
+
     def format(self, record):
-        log_color = self.COLORS[record.levelno]
-        format = "(black){asctime}(reset) (levelcolor){levelname:<8}(reset) (green){name}(reset) {message}"
-        format = format.replace("(black)", self.black + self.bold)
-        format = format.replace("(reset)", self.reset)
-        format = format.replace("(levelcolor)", log_color)
-        format = format.replace("(green)", self.green + self.bold)
-        formatter = logging.Formatter(format, "%Y-%m-%d %H:%M:%S", style="{")
+        formatter = self._formatters.get(record.levelno, self._formatters[logging.INFO])
         return formatter.format(record)
 
 
@@ -106,24 +132,48 @@ logger.setLevel(logging.INFO)
 # Console handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(LoggingFormatter())
-# File handler
-file_handler = logging.FileHandler(filename="discord.log", encoding="utf-8", mode="w")
-file_handler_formatter = logging.Formatter(
-    "[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{"
+# File handler（サイズでローテーション。クラスタモードではランチャーがプロセスごとに `LOG_FILE` を割り当てる）
+file_handler = log_pipeline.file_handler(
+    os.getenv("LOG_FILE", "discord.log"),
+    max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+    fmt=os.getenv("LOG_FORMAT", "text"),
 )
-file_handler.setFormatter(file_handler_formatter)
 
 # Add the handlers
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+# 書き込みはキューの先のスレッドで行い、イベントループはキューに積むだけにする（discord.py のログも同じキューに流す）
+logging_pipeline = log_pipeline.LogPipeline(
+    [console_handler, file_handler], queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+)
+logging_pipeline.attach(logger, logging.getLogger("discord"))
+logging.getLogger("discord").setLevel(logging.INFO)
+logging_pipeline.start()
+atexit.register(logging_pipeline.stop)
+
+
+# `SHARD_COUNT` を設定すると AutoShardedBot として起動（`SHARD_IDS` で担当シャードを限定、launcher.py が設定する）
+SHARDED = bool(os.getenv("SHARD_COUNT"))
+DB_PATH = os.getenv("DB_PATH") or f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
+COGS_DIR = f"{os.path.realpath(os.path.dirname(__file__))}/cogs"
 
 
-class DiscordBot(commands.Bot):
+class DiscordBot(commands.AutoShardedBot if SHARDED else commands.Bot):
     def __init__(self) -> None:
+        options = {}
+        if SHARDED:
+            options["shard_count"] = int(os.getenv("SHARD_COUNT"))
+            shard_ids = parse_shard_ids(os.getenv("SHARD_IDS", ""))
+            if shard_ids:
+                options["shard_ids"] = shard_ids
         super().__init__(
             command_prefix=commands.when_mentioned_or(os.getenv("PREFIX")),
             intents=intents,
             help_command=None,
+            # これより長いレート制限は discord.py の中で待たずに `discord.RateLimited` として返し、
+            # REST スケジューラがその呼び出しだけを後で再試行する（discord.py の下限は 30 秒）
+            max_ratelimit_timeout=float(os.getenv("DISCORD_MAX_RATELIMIT_TIMEOUT", "30")),
+            **client_options,
+            **options,
         )
         """
         これによりカスタムボット変数が作成され、cogsでこれらの変数に簡単にアクセスできるようになります。
@@ -135,35 +185,51 @@ class DiscordBot(commands.Bot):
         """
         self.logger = logger
         self.database = None
+        # 削除済みの生成VCの保持期間管理（`VC_RETENTION_DAYS=0` で無効）
+        self.retention = None
+        # メトリクス（`METRICS_PORT` を設定したときだけHTTPで公開）
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        self._cogs_loaded = False
+        self.timeline = timeline
+        self._shard_disconnects: Counter[int] = Counter()
+        self._shard_ready_after: dict[int, float] = {}
+        self.register_shard_metrics()
+        self.metrics.gauge("log_queue_depth", "書き込み待ちのログレコード数").set_function(
+            lambda: logging_pipeline.queue.qsize()
+        )
+        self.metrics.gauge("log_records_dropped", "キューが満杯で捨てたログレコード数").set_function(
+            lambda: logging_pipeline.handler.dropped
+        )
+        # 複数プロセスで IDENTIFY の順番を揃えるためのロック（launcher.py が `IDENTIFY_LOCK_DIR` を設定する）
+        lock_dir = os.getenv("IDENTIFY_LOCK_DIR")
+        self.identify_gate = (
+            IdentifyGate(lock_dir, max_concurrency=int(os.getenv("MAX_CONCURRENCY", "1"))) if lock_dir else None
+        )
         self.bot_prefix = os.getenv("PREFIX")
         self.invite_link = os.getenv("INVITE_LINK")
 
-    async def init_db(self) -> None:
-        async with aiosqlite.connect(
-            f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
-        ) as db:
-            with open(
-                f"{os.path.realpath(os.path.dirname(__file__))}/database/schema.sql",
-                encoding = "utf-8"
-            ) as file:
-                await db.executescript(file.read())
-            await db.commit()
+    @staticmethod
+    def cog_names() -> list[str]:
+        return sorted(file[:-3] for file in os.listdir(COGS_DIR) if file.endswith(".py"))
+
+    async def load_cog(self, extension: str) -> None:
+        with self.timeline.phase(f"cog:{extension}"):
+            try:
+                await self.load_extension(f"cogs.{extension}")
+                self.logger.info(f"拡張機能 '{extension}' を読み込みました")
+            except Exception as e:
+                exception = f"{type(e).__name__}: {e}"
+                self.logger.error(
+                    f"Failed to load extension {extension}\n{exception}"
+                )
 
     async def load_cogs(self) -> None:
         """
         この関数のコードは、ボットが起動するたびに実行されます。
+        Cog は互いに独立しているため並行して読み込みます（`cog_load` のキャッシュの読み込みが重なる）。
         """
-        for file in os.listdir(f"{os.path.realpath(os.path.dirname(__file__))}/cogs"):
-            if file.endswith(".py"):
-                extension = file[:-3]
-                try:
-                    await self.load_extension(f"cogs.{extension}")
-                    self.logger.info(f"拡張機能 '{extension}' を読み込みました")
-                except Exception as e:
-                    exception = f"{type(e).__name__}: {e}"
-                    self.logger.error(
-                        f"Failed to load extension {extension}\n{exception}"
-                    )
+        await asyncio.gather(*(self.load_cog(extension) for extension in self.cog_names()))
 
     @tasks.loop(minutes=1.0)
     async def status_task(self) -> None:
@@ -191,32 +257,255 @@ class DiscordBot(commands.Bot):
             f"実行環境: {platform.system()} {platform.release()} ({os.name})"
         )
         self.logger.info("-------------------")
-        await self.init_db()
-        # 先にデータベース接続を用意してからCogをロード（Cog側でDBを参照できるように）
+        self.timeline.mark("setup_hook")
+        # 書き込みは単一接続、SELECTはWALの読み取り専用プールに振り分ける
+        db_path = DB_PATH
+        synchronous = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+        busy_timeout = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))
+        # 互いに依存しない準備は並行して行う（DBの処理は接続ごとのスレッドで進む）
+        connection, _ = await asyncio.gather(
+            self.timed(
+                "db_connect",
+                open_connection(db_path, synchronous=synchronous, busy_timeout=busy_timeout),
+            ),
+            self.timed("metrics_server", self.start_metrics_server()),
+        )
         self.database = DatabaseManager(
-            connection=await aiosqlite.connect(
-                f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
+            connection=connection,
+            settings_cache_size=int(os.getenv("VC_SETTINGS_CACHE_SIZE", "1024")),
+            write_behind_ms=int(os.getenv("DB_WRITE_BEHIND_MS", "0")),
+            write_behind_max=int(os.getenv("DB_WRITE_BEHIND_MAX", "64")),
+            profiler=QueryProfiler(
+                slow_threshold_ms=float(os.getenv("DB_SLOW_QUERY_MS", "100")),
+                logger=self.logger,
             )
+            if os.getenv("DB_PROFILE", "0") == "1"
+            else None,
+            logger=self.logger,
         )
-        # Run DB migrations before loading cogs
-        try:
-            await self.database.migrate()
-        except Exception as e:
-            self.logger.warning(f"DB migration skipped/failed: {e}")
-        await self.load_cogs()
-        await self.tree.sync()
+        query_time = self.metrics.histogram(
+            "db_query_seconds", "DatabaseManager のメソッドごとの所要時間", labelnames=("method",)
+        )
+        self.database.query_observer = lambda method, seconds: query_time.observe(seconds, method=method)
+
+        async def migrate() -> None:
+            # Run DB migrations before loading cogs（最新なら `PRAGMA user_version` を読むだけ）
+            try:
+                applied = await self.database.migrate()
+            except Exception as e:
+                self.logger.warning(f"DB migration skipped/failed: {e}")
+                return
+            for name, seconds in applied.items():
+                self.logger.info(f"DBマイグレーション {name} を適用しました（{seconds:.2f} 秒）")
+
+        # 読み取りプールはマイグレーションと並行して開き、マイグレーションが終わってから使い始める
+        _, read_connections = await asyncio.gather(
+            self.timed("migrate", migrate()),
+            self.timed(
+                "db_read_pool",
+                asyncio.gather(
+                    *(
+                        open_connection(
+                            db_path, read_only=True, synchronous=synchronous, busy_timeout=busy_timeout
+                        )
+                        for _ in range(int(os.getenv("DB_READ_POOL_SIZE", "2")))
+                    )
+                ),
+            ),
+        )
+        self.database.set_read_connections(list(read_connections))
+        self.start_retention(db_path, synchronous=synchronous, busy_timeout=busy_timeout)
+        with self.timeline.phase("cogs"):
+            await self.load_cogs()
+        self._cogs_loaded = True
+        with self.timeline.phase("command_sync"):
+            await self.sync_command_tree()
         self.status_task.start()
 
+    async def timed(self, name: str, awaitable):
+        """``awaitable`` を待ち、その区間をタイムラインのフェーズとして記録します。"""
+        with self.timeline.phase(name):
+            return await awaitable
+
+    def command_tree_hash(self) -> str:
+        """グローバルなスラッシュコマンドの定義（同期で送る内容）のハッシュを返します。"""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands()),
+            key=lambda command: (command.get("type", 1), command["name"]),
+        )
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    async def sync_command_tree(self, *, force: bool = False) -> bool:
+        """コマンドツリーが前回の同期から変わっている場合だけグローバルに同期します。
+
+        グローバル同期はレート制限の厳しい遅い REST 呼び出しのため、起動のたびには行いません。
+        クラスタモードではクラスタ 0 だけが同期します。
+
+        :param force: ``True`` の場合はハッシュに関係なく同期します（オーナーの `sync global`）。
+        :return: 同期した場合は ``True``。
+        """
+        if not force and os.getenv("CLUSTER_ID", "0") != "0":
+            return False
+        digest = self.command_tree_hash()
+        if not force and await self.database.get_bot_state("command_tree_hash") == digest:
+            last = await self.database.get_bot_state("command_tree_sync_seconds")
+            self.logger.info(
+                f"スラッシュコマンドに変更がないため同期を省略しました（前回の同期: {last or '?'} 秒）"
+            )
+            return False
+        started = time.perf_counter()
+        await self.tree.sync()
+        elapsed = time.perf_counter() - started
+        await self.database.set_bot_state("command_tree_hash", digest)
+        await self.database.set_bot_state("command_tree_sync_seconds", f"{elapsed:.2f}")
+        self.logger.info(f"スラッシュコマンドをグローバルに同期しました（{elapsed:.2f} 秒）")
+        return True
+
+    async def enable_incremental_vacuum(self) -> dict:
+        """DBを `auto_vacuum=INCREMENTAL` に切り替えます（オーナーコマンド `vacuum` から明示的に実行）。
+
+        ``VACUUM`` でファイル全体を書き直すため、DBと同程度の空きディスク容量が必要で、その間の書き込みは待たされます。
+        保留中の書き込みをコミットしてから、専用の接続で実行します。
+
+        :return: 切り替えたかどうか・前後のファイルサイズ・所要秒数。
+        """
+        await self.database.flush()
+        started = time.perf_counter()
+        connection = await open_connection(DB_PATH, busy_timeout=int(os.getenv("DB_BUSY_TIMEOUT", "5000")))
+        try:
+
+            async def file_bytes() -> int:
+                page_count = await connection.execute_fetchall("PRAGMA page_count")
+                page_size = await connection.execute_fetchall("PRAGMA page_size")
+                return int(page_count[0][0]) * int(page_size[0][0])
+
+            before = await file_bytes()
+            converted = await enable_incremental_vacuum(connection)
+            after = await file_bytes()
+        finally:
+            await connection.close()
+        elapsed = time.perf_counter() - started
+        if converted:
+            self.logger.info(f"DBを auto_vacuum=INCREMENTAL に切り替えました（{before / 2**20:.1f} MB → {after / 2**20:.1f} MB, {elapsed:.1f} 秒）")
+        return {
+            "converted": converted,
+            "file_bytes_before": before,
+            "file_bytes_after": after,
+            "elapsed_s": round(elapsed, 2),
+        }
+
+    def start_retention(self, db_path: str, *, synchronous: str, busy_timeout: int) -> None:
+        """保持期間を過ぎた削除済みの生成VCを、専用の接続で定期的にアーカイブ（または削除）します。"""
+        days = float(os.getenv("VC_RETENTION_DAYS", "90"))
+        if days <= 0:
+            return
+        self.retention = RetentionJob(
+            lambda: open_connection(db_path, synchronous=synchronous, busy_timeout=busy_timeout),
+            max_age_days=days,
+            mode=os.getenv("VC_RETENTION_MODE", "archive"),
+            batch_size=int(os.getenv("VC_RETENTION_BATCH", "500")),
+            interval=float(os.getenv("VC_RETENTION_INTERVAL", "21600")),
+            logger=self.logger,
+        )
+        self.retention.start()
+
+    def register_shard_metrics(self) -> None:
+        """シャードごとのレイテンシ・接続状態・ギルド数・切断回数・準備完了までの時間をメトリクスに登録します。"""
+
+        def latencies() -> dict:
+            pairs = self.latencies if SHARDED else [(self.shard_id or 0, self.latency)]
+            return {(str(shard_id),): latency for shard_id, latency in pairs}
+
+        def up() -> dict:
+            if SHARDED:
+                return {(str(shard_id),): 0 if info.is_closed() else 1 for shard_id, info in self.shards.items()}
+            return {(str(self.shard_id or 0),): 1 if self.is_ready() and not self.is_closed() else 0}
+
+        labels = {"labelnames": ("shard",)}
+        self.metrics.gauge("discord_shard_latency_seconds", "シャードごとのハートビートのレイテンシ", **labels).set_function(latencies)
+        self.metrics.gauge("discord_shard_up", "シャードが接続中なら 1", **labels).set_function(up)
+        self.metrics.gauge("discord_shard_guilds", "シャードごとのギルド数", **labels).set_function(
+            lambda: {(str(shard_id),): count for shard_id, count in Counter(guild.shard_id for guild in self.guilds).items()}
+        )
+        self.metrics.gauge("discord_shard_disconnects", "起動後のシャードごとの切断回数", **labels).set_function(
+            lambda: {(str(shard_id),): count for shard_id, count in self._shard_disconnects.items()}
+        )
+        self.metrics.gauge("discord_shard_ready_seconds", "プロセス起動からシャードの準備完了までの時間", **labels).set_function(
+            lambda: {(str(shard_id),): seconds for shard_id, seconds in self._shard_ready_after.items()}
+        )
+        self.metrics.gauge("bot_startup_phase_seconds", "起動の各フェーズの所要時間", labelnames=("phase",)).set_function(
+            lambda: {(name,): seconds for name, seconds in self.timeline.durations().items()}
+        )
+        self.metrics.gauge("bot_startup_event_seconds", "起点から起動中の各出来事までの時間", labelnames=("event",)).set_function(
+            lambda: {(name,): seconds for name, seconds in self.timeline.marks().items()}
+        )
+
+    async def before_identify_hook(self, shard_id: int | None, *, initial: bool = False) -> None:
+        """クラスタモードでは、全プロセスで共有するロックで ``max_concurrency`` のバケットごとに IDENTIFY の間隔を守ります。"""
+        if self.identify_gate is None:
+            await super().before_identify_hook(shard_id, initial=initial)
+            return
+        await self.identify_gate.wait(shard_id or 0)
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        self._shard_ready_after.setdefault(shard_id, time.monotonic() - self.timeline.started)
+        self.logger.info(f"シャード {shard_id} の準備ができました（起動から {self._shard_ready_after[shard_id]:.1f} 秒）")
+
+    async def on_ready(self) -> None:
+        # シャーディングしていない場合は on_shard_ready が来ないため、シャード 0 として記録する
+        if not SHARDED:
+            self._shard_ready_after.setdefault(self.shard_id or 0, time.monotonic() - self.timeline.started)
+        if self.timeline.mark("ready"):
+            self.logger.info(f"起動のタイムライン（起点からの開始時刻 / フェーズ / 所要時間）:\n{self.timeline.format()}")
+
+    async def on_voice_state_update(self, member, before, after) -> None:
+        # 再起動後に最初の入退室を処理できるまでの時間（Cog のリスナーと同じディスパッチで呼ばれる）
+        if self.timeline.mark("first_voice_state_update"):
+            self.logger.info(
+                f"最初の on_voice_state_update を受信しました（起動から {self.timeline.marks()['first_voice_state_update']:.1f} 秒）"
+            )
+
+    async def on_shard_disconnect(self, shard_id: int) -> None:
+        self._shard_disconnects[shard_id] += 1
+
+    async def on_disconnect(self) -> None:
+        # シャーディングしていない場合は on_shard_disconnect が来ないため、シャード 0 として数える
+        if not SHARDED:
+            self._shard_disconnects[self.shard_id or 0] += 1
+
+    async def start_metrics_server(self) -> None:
+        """`METRICS_PORT` が設定されていれば、メトリクスと死活監視のエンドポイントを起動します。"""
+        port = os.getenv("METRICS_PORT")
+        if not port:
+            return
+        self.metrics_server = MetricsServer(
+            self.metrics,
+            ready=lambda: self.is_ready() and self.database is not None and self._cogs_loaded,
+            host=os.getenv("METRICS_HOST", "127.0.0.1"),
+            port=int(port),
+            logger=self.logger,
+        )
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            self.logger.error(f"メトリクスサーバーを起動できませんでした: {e}")
+            self.metrics_server = None
+
     async def close(self) -> None:
-        """シャットダウン時にDB接続を安全にクローズする。"""
+        """シャットダウン時にCogを停止してから保留中の書き込みをコミットし、DB接続を安全にクローズする。"""
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        if self.retention is not None:
+            await self.retention.close()
         try:
+            # Cogのアンロード（連番の保存などDBへの書き込みを含む）は super().close() の中で行われる
+            await super().close()
+        finally:
             if self.database and getattr(self.database, "connection", None):
                 try:
-                    await self.database.connection.close()
+                    await self.database.close()
                 except Exception as e:
                     self.logger.warning(f"DBクローズ中に例外: {e}")
-        finally:
-            await super().close()
 
     async def on_message(self, message: discord.Message) -> None:
         """
@@ -319,4 +608,5 @@ class DiscordBot(commands.Bot):
 
 
 bot = DiscordBot()
-bot.run(os.getenv("TOKEN"))
+# discord.py 既定のログ設定（ループのスレッドで標準エラーに直接書く）は使わず、上のキューに流す
+bot.run(os.getenv("TOKEN"), log_handler=None)
@@ -6,6 +6,9 @@ Copyright © Krypton 2019-Present - https://github.com/kkrypt0nn (https://krypto
 バージョン: 6.4.0
 """
 
+import io
+import json
+
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -31,7 +34,8 @@ class Owner(commands.Cog, name="owner"):
         """
 
         if scope == "global":
-            await context.bot.tree.sync()
+            # 起動時は変更がなければ同期を省略するため、ここではハッシュに関係なく同期する
+            await context.bot.sync_command_tree(force=True)
             embed = discord.Embed(
                 description="スラッシュコマンドがグローバルに同期されました。",
                 color=0xBEBEFE,
@@ -70,7 +74,7 @@ class Owner(commands.Cog, name="owner"):
 
         if scope == "global":
             context.bot.tree.clear_commands(guild=None)
-            await context.bot.tree.sync()
+            await context.bot.sync_command_tree(force=True)
             embed = discord.Embed(
                 description="スラッシュコマンドのグローバル同期が解除されました。",
                 color=0xBEBEFE,
@@ -92,6 +96,148 @@ class Owner(commands.Cog, name="owner"):
         await context.send(embed=embed)
 
 
+    @commands.command(
+        name="vcstats",
+        description="VC機能の内部統計を表示します。",
+    )
+    @commands.is_owner()
+    async def vcstats(self, context: Context) -> None:
+        """
+        VC機能の内部統計（設定キャッシュのヒット率など）を表示します。
+
+        :param context: コマンドのコンテキスト。
+        """
+        voice = self.bot.get_cog("voice")
+        if voice is None:
+            embed = discord.Embed(
+                description="モジュール`voice`が読み込まれていません。", color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+        stats = json.dumps(voice.stats(), ensure_ascii=False, indent=2)
+        embed = discord.Embed(
+            title="VC統計", description=f"```json\n{stats[:4000]}\n```", color=0xBEBEFE
+        )
+        await context.send(embed=embed)
+
+    @commands.command(
+        name="dbprofile",
+        description="DBのプロファイル統計を出力してリセットします。",
+    )
+    @commands.is_owner()
+    async def dbprofile(self, context: Context) -> None:
+        """
+        DatabaseManager のメソッド別・SQL別の統計を出力し、統計をリセットします。
+
+        :param context: コマンドのコンテキスト。
+        """
+        profiler = getattr(self.bot.database, "profiler", None)
+        if profiler is None:
+            embed = discord.Embed(
+                description="DBのプロファイリングが無効です（`DB_PROFILE=1` で有効化）。", color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+        snapshot = profiler.snapshot()
+        profiler.reset()
+        lines = [
+            f"`{name}` — {entry['calls']} 回 / 合計 {entry['total_ms']} ms / 最大 {entry['max_ms']} ms"
+            for name, entry in list(snapshot["methods"].items())[:10]
+        ]
+        embed = discord.Embed(
+            title="DBプロファイル（合計時間の長い順）",
+            description="\n".join(lines) or "記録がありません。",
+            color=0xBEBEFE,
+        )
+        embed.set_footer(
+            text=f"{snapshot['elapsed_s']} 秒間 / 遅いクエリ {snapshot['slow_queries']} 件（>{snapshot['slow_threshold_ms']} ms）"
+        )
+        file = discord.File(
+            io.BytesIO(json.dumps(snapshot, ensure_ascii=False, indent=2).encode("utf-8")),
+            filename="dbprofile.json",
+        )
+        await context.send(embed=embed, file=file)
+
+    @commands.hybrid_command(
+        name="retention",
+        description="削除済みの生成VCの履歴を今すぐ整理し、結果を表示します。",
+    )
+    @commands.is_owner()
+    async def retention(self, context: Context) -> None:
+        """
+        保持期間を過ぎた削除済みの生成VCをアーカイブ（または削除）し、空きページを回収します。
+
+        :param context: ハイブリッドコマンドのコンテキスト。
+        """
+        job = getattr(self.bot, "retention", None)
+        if job is None:
+            embed = discord.Embed(
+                description="履歴の整理が無効です（`VC_RETENTION_DAYS=0`）。", color=0xE02B2B
+            )
+            await context.send(embed=embed)
+            return
+        await context.defer()
+        report = await job.run_once()
+        stats = job.stats()
+        action = "アーカイブ" if report["mode"] == "archive" else "削除"
+        embed = discord.Embed(
+            title="履歴の整理",
+            description=(
+                f"{report['max_age_days']} 日より前に削除された {report['rows']} 行を{action}しました"
+                f"（{report['batches']} バッチ）。\n"
+                f"回収: {report['bytes_reclaimed'] / 1024:.0f} KB"
+                f"（{report['file_bytes_before'] / 2**20:.1f} MB → {report['file_bytes_after'] / 2**20:.1f} MB）"
+            ),
+            color=0xBEBEFE,
+        )
+        if not report["incremental_vacuum"]:
+            embed.add_field(
+                name="空きページの回収",
+                value="DBが `auto_vacuum=INCREMENTAL` ではないため回収していません（`vacuum` コマンドで切り替え）。",
+                inline=False,
+            )
+        embed.set_footer(
+            text=f"{report['elapsed_s']} 秒 / 起動後の累計 {stats['runs']} 回・{stats['rows']} 行・{stats['bytes_reclaimed'] / 2**20:.1f} MB"
+        )
+        await context.send(embed=embed)
+
+    @commands.command(
+        name="vacuum",
+        description="DBを auto_vacuum=INCREMENTAL に切り替えます（DB全体を書き直します）。",
+    )
+    @commands.is_owner()
+    async def vacuum(self, context: Context) -> None:
+        """
+        既存のDBを `VACUUM` で `auto_vacuum=INCREMENTAL` に作り直し、以後は履歴の整理で空きページを回収できるようにします。
+        DBと同程度の空きディスク容量が必要で、実行中の書き込みは待たされます。
+
+        :param context: コマンドのコンテキスト。
+        """
+        async with context.typing():
+            try:
+                result = await self.bot.enable_incremental_vacuum()
+            except Exception as e:
+                embed = discord.Embed(
+                    description=f"切り替えに失敗しました: {type(e).__name__}: {e}", color=0xE02B2B
+                )
+                await context.send(embed=embed)
+                return
+        if not result["converted"]:
+            embed = discord.Embed(
+                description="DBはすでに `auto_vacuum=INCREMENTAL` です。", color=0xBEBEFE
+            )
+            await context.send(embed=embed)
+            return
+        embed = discord.Embed(
+            description=(
+                "DBを `auto_vacuum=INCREMENTAL` に切り替えました"
+                f"（{result['file_bytes_before'] / 2**20:.1f} MB → {result['file_bytes_after'] / 2**20:.1f} MB、"
+                f"{result['elapsed_s']} 秒）。"
+            ),
+            color=0xBEBEFE,
+        )
+        await context.send(embed=embed)
+
     @commands.hybrid_command(
         name="unload",
         description="Cogをアンロードします。",
@@ -11,7 +11,7 @@ VC 自動作成・コピー・自動移動・自動削除 機能
 - /vc help
 - /vc setting channel_name <ベースVC> <テンプレート>
    - ベースVC: `/vc create` で作成したVCのみ指定可能（それ以外は拒否してメッセージを返します）。
-   - テンプレート: `{user_name}`, `{count}` を使用可能（`count`はギルドごとの0始まり連番）。
+   - テンプレート: `{user_name}`, `{display_name}`, `{base_name}`, `{count}` を使用可能（`count`はベースVCごとの連番）。未知のトークンは保存時に拒否します。
 - /vc setting max_channels <数値>
 - /vc setting delete_delay <秒>
 - /vc log_channel <チャンネル>
@@ -24,28 +24,175 @@ VC 自動作成・コピー・自動移動・自動削除 機能
 from __future__ import annotations
 
 import asyncio
-from typing import Optional, Dict, Set
+import logging
+import os
+import time
+from typing import Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands
-
-
-def _safe_format_name(template: str, user: discord.abc.User, count: int) -> str:
-    # 使用可能なトークンのみ置換
-    name = template.replace("{user_name}", user.name).replace("{count}", str(count))
-    # Discordの名前長制限（100文字程度）を軽くケア
-    return name[:100]
+from discord.ext import commands, tasks
+
+from helpers.clone_pool import ClonePool
+from helpers.delete_scheduler import DeleteScheduler
+from helpers.join_queue import GuildJoinQueue
+from helpers.log_buffer import LogBuffer
+from helpers.metrics import MetricsRegistry
+from helpers.name_counters import NameCounters
+from helpers.name_template import (
+    NameContext,
+    TemplateCache,
+    TemplateError,
+    available_tokens,
+    compile_template,
+)
+from helpers.rest_scheduler import (
+    PRIORITY_CREATE,
+    PRIORITY_DELETE,
+    PRIORITY_LOG,
+    PRIORITY_MOVE,
+    RestScheduler,
+)
+from helpers.voice_index import VoiceChannelIndex
+
+
+# on_voice_state_update の分類（先頭の同期的な判定で、DBやawaitに進む前に大半を捨てる）
+# - no_channel_change: ミュート・スピーカーミュート・配信・カメラの切り替えなど、チャンネルが変わらないもの
+# - unmanaged: 入退室したチャンネルがどちらもベースVCでも生成VCでもないもの
+# - managed: 上記以外（ここだけを処理する）
+VOICE_EVENT_CLASSES = ("no_channel_change", "unmanaged", "managed")
+
+# 準備完了前（チャンネルキャッシュが未構築）に期限を迎えた削除予定を再試行するまでの秒数
+NOT_READY_RETRY_DELAY = 5.0
 
 
 class Voice(commands.Cog, name="voice"):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        # 削除スケジュール: channel_id -> asyncio.Task
-        self._delete_tasks: Dict[int, asyncio.Task] = {}
-        # 入室イベントの重複防止: (user_id, channel_id) 単発ロック
-        self._processing_joins: Set[tuple[int, int]] = set()
+        self._logger = getattr(bot, "logger", None) or logging.getLogger("discord_bot")
+        # 削除スケジュール: 1本のループ + タイマーホイール（チャンネルIDと期限のみ保持）
+        self._deletions = DeleteScheduler(
+            self._delete_expired,
+            concurrency=int(os.getenv("VC_DELETE_CONCURRENCY", "5")),
+            logger=self._logger,
+        )
+        # 直近の起動時整合処理の結果
+        self._last_reconcile: dict | None = None
+        # 入室処理: ギルドごとのキュー（(user_id, channel_id) 単位で重複入室を集約）
+        self._joins = GuildJoinQueue(
+            int(os.getenv("VC_JOIN_CONCURRENCY", "4")),
+            logger=self._logger,
+        )
+        # ベースVC / 生成VC の索引（ホットパスの判定はDBを引かずにここで行う）
+        self._index = VoiceChannelIndex()
+        # REST呼び出しの優先度付きスケジューラ（移動 > 作成 > 削除 > ログ、ギルド間はラウンドロビン）
+        self._rest = RestScheduler(
+            workers=int(os.getenv("VC_REST_WORKERS", "4")),
+            rate=float(os.getenv("VC_REST_RATE", "40")),
+            logger=self._logger,
+        )
+        # 結果を待たないREST呼び出し（上限到達のDM・払い出した複製の名前変更）のタスク
+        self._background_tasks: set[asyncio.Task] = set()
+        # ログチャンネル向けのギルド別バッファ（一定間隔でまとめて送信）
+        self._logs = LogBuffer(
+            self._send_log,
+            interval=float(os.getenv("VC_LOG_FLUSH_INTERVAL", "2")),
+            max_lines=int(os.getenv("VC_LOG_BUFFER_LINES", "200")),
+            logger=self._logger,
+        )
+        # コンパイル済みの名前テンプレート（ベースVC単位・ギルド単位）
+        self._templates = TemplateCache()
+        # {count} の連番（メモリ上で払い出し、予約済みの上限をまとめてDBに保存）
+        self._counters = NameCounters(
+            self._save_counters,
+            block=int(os.getenv("VC_COUNTER_BLOCK", "100")),
+            interval=float(os.getenv("VC_COUNTER_CHECKPOINT", "10")),
+            logger=self._logger,
+        )
+        # ベースVCごとの待機複製プール（pool_size > 0 のベースVCのみ）
+        self._pool = ClonePool(idle_ttl=float(os.getenv("VC_POOL_IDLE_TTL", "600")))
+        # 事前に作成する複製VCの名前（ベースVCと同じ名前に見えないようにする。払い出し時に変更する）
+        self._pool_idle_name = os.getenv("VC_POOL_IDLE_NAME", "待機中")
+        # メトリクス（`METRICS_PORT` を設定すると /metrics で公開されます）
+        metrics = getattr(bot, "metrics", None) or MetricsRegistry()
+        self._join_latency = metrics.histogram(
+            "vc_join_to_move_seconds",
+            "ベースVCへの入室から生成VCへの移動完了までの時間",
+            labelnames=("path",),
+        )
+        self._clone_latency = metrics.histogram("vc_clone_seconds", "複製VCを作成するREST呼び出しの時間")
+        metrics.gauge("vc_delete_pending", "削除を予約している生成VCの数").set_function(lambda: len(self._deletions))
+        metrics.gauge("vc_generated_channels", "ギルドごとの稼働中の生成VC数", labelnames=("guild",)).set_function(
+            lambda: {(str(guild_id),): count for guild_id, count in self._index.count_by_guild().items()}
+        )
+        # イベントの分類ごとの件数
+        self._voice_events = dict.fromkeys(VOICE_EVENT_CLASSES, 0)
+        metrics.gauge("vc_voice_state_events", "起動後の on_voice_state_update の分類ごとの件数", labelnames=("class",)).set_function(
+            lambda: {(name,): count for name, count in self._voice_events.items()}
+        )
+        metrics.gauge("vc_rest_queue_depth", "優先度ごとのREST呼び出しの待ち件数", labelnames=("priority",)).set_function(
+            lambda: {(name,): stats["depth"] for name, stats in self._rest.stats()["classes"].items()}
+        )
 
+    async def cog_load(self) -> None:
+        await self._load_index()
+        self._counters.start()
+        self._rest.start()
+        self._deletions.start()
+        self._logs.start()
+        self.pool_maintenance.start()
+
+    async def cog_unload(self) -> None:
+        self.pool_maintenance.cancel()
+        self._joins.close()
+        for task in list(self._background_tasks):
+            task.cancel()
+        await self._deletions.close()
+        await self._logs.close()
+        await self._rest.close()
+        await self._counters.close()
+
+    async def _load_index(self) -> None:
+        """DBからベースVC / 稼働中の生成VCを読み込み、インメモリ索引を構築します。"""
+        database = getattr(self.bot, "database", None)
+        if database is None:
+            return
+        # 互いに独立した読み込みなので、読み取りプールの接続に並行して振り分ける
+        base_ids, generated, pool_sizes, templates, counters = await asyncio.gather(
+            database.get_base_channel_ids(),
+            database.get_active_generated_channels(),
+            database.get_base_pool_sizes(),
+            database.get_base_channel_templates(),
+            database.get_name_counters(),
+        )
+        self._index.load(base_ids, generated)
+        self._pool.load_sizes(pool_sizes)
+        self._templates.load_base(templates)
+        # 連番: 読み込んだ全カウンタに1ブロックを予約し、払い出しを始める前に書き込んでおく
+        self._counters.load(*counters)
+        await self._counters.checkpoint()
+
+    async def _save_counters(self, base: dict[int, int], guild: dict[int, int]) -> None:
+        await self.bot.database.save_name_counters(base, guild)
+
+    def stats(self) -> dict:
+        """VC機能の内部状態（キャッシュ・索引など）の統計を返します。"""
+        stats = {
+            "index": self._index.stats(),
+            "joins": self._joins.stats(),
+            "deletions": self._deletions.stats(),
+            "pool": self._pool.stats(),
+            "templates": self._templates.stats(),
+            "counters": self._counters.stats(),
+            "rest": self._rest.stats(),
+            "logs": self._logs.stats(),
+            "voice_events": self.voice_event_stats(),
+            "last_reconcile": self._last_reconcile,
+        }
+        database = getattr(self.bot, "database", None)
+        if database is not None:
+            stats["database"] = database.stats()
+        return stats
 
     # -------------------------
     # アプリコマンド（スラッシュ）グループ
@@ -63,7 +210,9 @@ class Voice(commands.Cog, name="voice"):
         )
         embed.add_field(
             name="/vc setting channel_name <ベースVC> <テンプレート>",
-            value="/vc create で作成した各ベースVCごとに名前テンプレートを設定します（{user_name}, {count}）。",
+            value="/vc create で作成した各ベースVCごとに名前テンプレートを設定します（"
+            + ", ".join(f"{{{token}}}" for token in available_tokens())
+            + "）。",
             inline=False,
         )
         embed.add_field(
@@ -108,14 +257,17 @@ class Voice(commands.Cog, name="voice"):
 
         guild = interaction.guild
         author = interaction.user
+        # 作成はRESTのキュー待ちやレート制限で3秒の応答期限を超えうるため、先に応答を保留する
+        await interaction.response.defer(ephemeral=True, thinking=True)
 
         # 設定取得（なければ作成）
         settings = await self.bot.database.get_or_create_guild_vc_settings(guild.id)
 
         # チャンネル名決定
         if channel_name is None or channel_name.strip() == "":
-            next_count = await self.bot.database.increment_and_get_name_counter(guild.id)
-            channel_name = _safe_format_name(settings["base_name_template"], author, next_count)
+            next_count = self._counters.next_guild(guild.id)
+            template = self._templates.get_guild(guild.id, settings["base_name_template"])
+            channel_name = template.render(NameContext(author, next_count))
 
         # 作成カテゴリ: ユーザーが現在いるVCのカテゴリを優先、なければギルド直下
         category = None
@@ -125,23 +277,26 @@ class Voice(commands.Cog, name="voice"):
         # 実際にVC作成
         try:
             # ベースVCはテンプレートではなく通常作成。overwritesは指定しない（NoneはTypeErrorになるため）。
-            new_vc = await guild.create_voice_channel(
-                name=channel_name,
-                category=category,
+            new_vc = await self._rest.submit(
+                guild.id,
+                PRIORITY_CREATE,
+                lambda: guild.create_voice_channel(name=channel_name, category=category),
             )
         except discord.Forbidden:
-            return await interaction.response.send_message(
+            return await interaction.followup.send(
                 "権限不足のためチャンネルを作成できません。", ephemeral=True
             )
         except discord.HTTPException as e:
-            return await interaction.response.send_message(
+            return await interaction.followup.send(
                 f"チャンネル作成に失敗しました: {e}", ephemeral=True
             )
 
         # ベースVCとして記録
         await self.bot.database.add_base_channel(new_vc.id, guild.id, author.id)
+        self._index.add_base(new_vc.id)
+        self._counters.reserve_base(new_vc.id)
 
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"ベースVCを作成しました: {new_vc.mention}\nこのチャンネルに入室すると、設定をコピーした専用VCが自動生成されます。",
             ephemeral=True,
         )
@@ -156,12 +311,16 @@ class Voice(commands.Cog, name="voice"):
         await interaction.response.send_message(f"ログチャンネルを {channel.mention} に設定しました。", ephemeral=True)
 
     @setting.command(name="channel_name", description="ベース/複製VCの名前テンプレートを設定します。")
-    @app_commands.describe(base_channel="/vc create で作成したベースVCを指定してください。", template="{user_name}, {count} が使用できます。")
+    @app_commands.describe(
+        base_channel="/vc create で作成したベースVCを指定してください。",
+        template="{user_name}, {display_name}, {base_name}, {count} が使用できます。",
+    )
     async def vc_setting_channel_name(self, interaction: discord.Interaction, base_channel: discord.VoiceChannel, template: str) -> None:
         """指定したベースVCに対して複製VCの名前テンプレートを設定します。
 
         - 指定可能なのは `/vc create` で作成したベースVCのみです（それ以外は拒否）。
-        - 使用可能なトークン: `{user_name}`, `{count}`（ギルド単位の0始まり連番）。
+        - 使用可能なトークン: `{user_name}`, `{display_name}`, `{base_name}`, `{count}`（ベースVC単位の連番）。
+        - 未知のトークンを含むテンプレートは保存せずに拒否します。
         - 入力は100文字に制限します（Discordの上限に配慮）。
         """
         if interaction.guild is None:
@@ -169,13 +328,36 @@ class Voice(commands.Cog, name="voice"):
         if base_channel.guild.id != interaction.guild.id:
             return await interaction.response.send_message("同じサーバーのチャンネルを指定してください。", ephemeral=True)
         # /vc create で作られたベースVCかチェック
-        if not await self.bot.database.is_base_channel(base_channel.id):
+        if not self._index.is_base(base_channel.id):
             return await interaction.response.send_message("そのチャンネルは /vc create で作成されたベースVCではないため設定できないよ。", ephemeral=True)
-        # 簡単な検証（未知の波括弧は許容するが長過ぎるのはカット）
+        # 保存前にコンパイルして検証（長過ぎるのはカット）
         template = template[:100]
+        try:
+            compiled = compile_template(template)
+        except TemplateError as e:
+            return await interaction.response.send_message(str(e), ephemeral=True)
         await self.bot.database.set_base_channel_template(base_channel.id, template)
+        self._templates.set_base(base_channel.id, compiled)
         await interaction.response.send_message(f"{base_channel.mention} のベースVC名テンプレートを更新しました: `{template}`", ephemeral=True)
 
+    @setting.command(name="pool_size", description="ベースVCごとに待機させておく複製VCの数を設定します。")
+    @app_commands.describe(base_channel="/vc create で作成したベースVCを指定してください。", size="待機させる複製VCの数（0で無効）")
+    async def vc_setting_pool_size(self, interaction: discord.Interaction, base_channel: discord.VoiceChannel, size: app_commands.Range[int, 0, 10]) -> None:
+        """ベースVCの複製プールの大きさを設定します。
+
+        - 無人になった複製VCを削除せずに最大 `size` 個まで待機させ、次の入室で再利用します。
+        - 入室が続いている間は `size` 個まで事前に複製を用意します。
+        """
+        if interaction.guild is None:
+            return await interaction.response.send_message("サーバー内で実行してください。", ephemeral=True)
+        if base_channel.guild.id != interaction.guild.id:
+            return await interaction.response.send_message("同じサーバーのチャンネルを指定してください。", ephemeral=True)
+        if not self._index.is_base(base_channel.id):
+            return await interaction.response.send_message("そのチャンネルは /vc create で作成されたベースVCではないため設定できないよ。", ephemeral=True)
+        await self.bot.database.set_base_pool_size(base_channel.id, int(size))
+        self._pool.set_size(base_channel.id, int(size))
+        await interaction.response.send_message(f"{base_channel.mention} の待機複製数を {int(size)} に設定しました。", ephemeral=True)
+
     @vc.command(name="setting_max_channels", description="自動生成VCの同時上限数を設定します。")
     async def vc_setting_max_channels(self, interaction: discord.Interaction, limit: app_commands.Range[int, 1, 500]) -> None:
         if interaction.guild is None:
@@ -193,70 +375,275 @@ class Voice(commands.Cog, name="voice"):
     # -------------------------
     # イベントハンドラ
     # -------------------------
+    def classify_voice_event(self, before: discord.VoiceState, after: discord.VoiceState) -> str:
+        """入退室イベントを、プロセス内の索引だけで同期的に分類します（`VOICE_EVENT_CLASSES`）。"""
+        before_id = before.channel.id if before.channel is not None else None
+        after_id = after.channel.id if after.channel is not None else None
+        if before_id == after_id:
+            return "no_channel_change"
+        index = self._index
+        if (before_id is None or not (index.is_base(before_id) or index.is_generated(before_id))) and (
+            after_id is None or not (index.is_base(after_id) or index.is_generated(after_id))
+        ):
+            return "unmanaged"
+        return "managed"
+
+    def voice_event_stats(self) -> dict:
+        total = sum(self._voice_events.values())
+        return {
+            **self._voice_events,
+            "total": total,
+            "dropped_ratio": round(1 - self._voice_events["managed"] / total, 4) if total else 0.0,
+        }
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
-        # ユーザーがどこかに入室した
-        if after.channel and (before.channel is None or before.channel.id != after.channel.id):
-            await self._handle_join(member, after.channel)
+        kind = self.classify_voice_event(before, after)
+        self._voice_events[kind] += 1
+        if kind != "managed":
+            return
+        # 以下はチャンネルが変わった場合だけ
+        # ユーザーがどこかに入室した（ベースVCならキューに積むだけで待たない）
+        if after.channel:
+            channel = after.channel
+            if self._index.is_base(channel.id):
+                received = time.perf_counter()
+                self._joins.submit(
+                    channel.guild.id,
+                    (member.id, channel.id),
+                    lambda: self._handle_join(member, channel, received),
+                )
         # ユーザーがどこかから退出した
-        if before.channel and (after.channel is None or after.channel.id != before.channel.id):
+        if before.channel:
             await self._handle_leave(before.channel)
-        # ユーザーが生成VCに再入室した場合は削除スケジュールを解除
+        # ユーザーが生成VCに再入室した場合は削除スケジュールを解除（待機中の複製に直接入った場合はプールから外す）
         if after.channel:
+            self._pool.discard(after.channel.id)
             await self._cancel_delete_if_generated(after.channel)
 
-    async def _handle_join(self, member: discord.Member, channel: discord.VoiceChannel) -> None:
-        key = (member.id, channel.id)
-        if key in self._processing_joins:
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        await self._reconcile()
+
+    async def _reconcile(self) -> None:
+        """DBの稼働中生成VCとギルドのチャンネルキャッシュを突き合わせます。
+
+        - 既に存在しないチャンネルは1トランザクションでまとめて削除済みにする
+        - 無人のチャンネルは削除を予約する（DBに記録された予定時刻があればそれを引き継ぐ）
+        - 誰かいるチャンネルに残った予定は取り消す
+        """
+        started = time.perf_counter()
+        database = self.bot.database
+        due_at = await database.get_generated_delete_schedule()
+        missing: list[int] = []
+        scheduled = 0
+        cleared = 0
+        now = time.time()
+        for channel_id, record in list(self._index.generated_items()):
+            guild = self.bot.get_guild(record.guild_id)
+            if guild is None or guild.unavailable:
+                # ギルドの状態が分からない間は触らない
+                continue
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                missing.append(channel_id)
+                continue
+            if len(channel.members) == 0:
+                if channel_id not in self._deletions:
+                    if channel_id in due_at:
+                        self._deletions.schedule(channel_id, max(0.0, due_at[channel_id] - now))
+                    else:
+                        settings = await database.get_or_create_guild_vc_settings(guild.id)
+                        await self._schedule_delete(channel, int(settings["delete_delay"]))
+                    scheduled += 1
+            elif channel_id in due_at:
+                self._deletions.cancel(channel_id)
+                await database.set_generated_channel_delete_due(channel_id, None)
+                cleared += 1
+        await database.mark_generated_channels_deleted(missing)
+        for channel_id in missing:
+            self._index.discard_generated(channel_id)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._last_reconcile = {
+            "missing_marked_deleted": len(missing),
+            "empty_scheduled": scheduled,
+            "stale_schedules_cleared": cleared,
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+        self._logger.info(
+            f"生成VCの整合処理: 欠損 {len(missing)} 件を削除済みに、無人 {scheduled} 件の削除を予約、"
+            f"古い予定 {cleared} 件を取消（{elapsed_ms:.1f} ms）"
+        )
+
+    async def _handle_join(self, member: discord.Member, channel: discord.VoiceChannel, received: float) -> None:
+        """ベースVCへの入室を処理します（入室キューのワーカーから呼ばれます）。
+
+        :param received: 入室イベントを受け取った時刻（`time.perf_counter()`、キュー待ちを含めて計測するため）。
+        """
+        # ベースVCでなければ無視
+        if not self._index.is_base(channel.id):
+            return
+        # キュー待ちの間に退出・移動していれば何もしない
+        if member.voice is None or member.voice.channel is None or member.voice.channel.id != channel.id:
             return
-        self._processing_joins.add(key)
-        try:
-            # ベースVCでなければ無視
-            if not await self.bot.database.is_base_channel(channel.id):
-                return
 
-            # 上限チェック
-            settings = await self.bot.database.get_or_create_guild_vc_settings(channel.guild.id)
-            active = await self.bot.database.count_active_generated_channels(channel.guild.id)
-            if active >= int(settings["max_channels"]):
-                try:
-                    await member.send(f"現在、自動生成VCの上限 ({settings['max_channels']}) に達しています。しばらくしてからお試しください。")
-                except Exception:
-                    pass
-                await self._log(channel.guild, f"上限超過のため {member.display_name} の複製VC作成をスキップしました（{active}/{settings['max_channels']}）。")
-                return
+        # 待機中の複製があれば名前を変えて移動するだけで済ませる
+        if await self._join_from_pool(member, channel):
+            self._join_latency.observe(time.perf_counter() - received, path="pool")
+            return
+
+        # 上限チェック（枠の確保は同期的に行うため、同時入室でも上限を超えない）
+        settings = await self.bot.database.get_or_create_guild_vc_settings(channel.guild.id)
+        reservation = self._index.reserve(channel.guild.id, channel.id, int(settings["max_channels"]))
+        if reservation is None:
+            # DMは最も低い優先度で送るため、待つと後続の入室がすべて止まる: 送信は待たない
+            self._send_dm(
+                member, f"現在、自動生成VCの上限 ({settings['max_channels']}) に達しています。しばらくしてからお試しください。"
+            )
+            active = self._index.count_for_guild(channel.guild.id)
+            self._log(channel.guild, f"上限超過のため {member.display_name} の複製VC作成をスキップしました（{active}/{settings['max_channels']}）。")
+            self._event("vc_limit_reached", channel, f"生成VCの上限に達しました（{active}/{settings['max_channels']}）", user_id=member.id)
+            return
 
+        with reservation:
             # 元VCの設定をコピー
             try:
                 new_name = await self._compute_clone_name(channel, member)
+                started = time.perf_counter()
                 new_channel = await self._clone_voice_channel(channel, new_name)
+                elapsed = time.perf_counter() - started
+                self._pool.record_create_latency(elapsed)
+                self._clone_latency.observe(elapsed)
             except discord.Forbidden:
-                await self._log(channel.guild, "権限不足のためVCを複製できませんでした。")
+                self._log(channel.guild, "権限不足のためVCを複製できませんでした。")
+                self._event("vc_create_failed", channel, "権限不足のためVCを複製できませんでした", level=logging.WARNING, user_id=member.id)
                 return
             except discord.HTTPException as e:
-                await self._log(channel.guild, f"VCの複製に失敗しました: {e}")
+                self._log(channel.guild, f"VCの複製に失敗しました: {e}")
+                self._event("vc_create_failed", channel, f"VCの複製に失敗しました: {e}", level=logging.WARNING, user_id=member.id)
                 return
 
-            # DBに登録（生成VC）
+            # DBに登録（生成VC）し、確保した枠を稼働中として確定
             await self.bot.database.add_generated_channel(new_channel.id, channel.guild.id, channel.id, member.id)
-            await self._log(channel.guild, f"複製VCを作成しました: {new_channel.name}（元: {channel.name} / ユーザー: {member.display_name}）")
+            reservation.commit(new_channel.id)
+        self._log(channel.guild, f"複製VCを作成しました: {new_channel.name}（元: {channel.name} / ユーザー: {member.display_name}）")
+        self._event(
+            "vc_created",
+            new_channel,
+            f"複製VCを作成しました: {new_channel.name}",
+            base_channel_id=channel.id,
+            user_id=member.id,
+            clone_ms=round(elapsed * 1000, 1),
+        )
 
-            # ユーザーを移動
-            try:
-                await member.move_to(new_channel)
-                await self._log(channel.guild, f"{member.display_name} を {new_channel.name} に移動しました。")
-            except discord.Forbidden:
-                await self._log(channel.guild, f"{member.display_name} を移動できません（権限不足）。")
-            except discord.HTTPException as e:
-                await self._log(channel.guild, f"{member.display_name} の移動に失敗: {e}")
-        finally:
-            # ほんの僅かな待機で連続イベントを緩和
-            await asyncio.sleep(0.5)
-            self._processing_joins.discard(key)
+        # ユーザーを移動
+        try:
+            await self._rest.submit(channel.guild.id, PRIORITY_MOVE, lambda: member.move_to(new_channel))
+            self._join_latency.observe(time.perf_counter() - received, path="clone")
+            self._log(channel.guild, f"{member.display_name} を {new_channel.name} に移動しました。")
+        except discord.Forbidden:
+            self._log(channel.guild, f"{member.display_name} を移動できません（権限不足）。")
+            await self._handle_leave(new_channel)
+        except discord.HTTPException as e:
+            # 作成を待つ間に退出した場合など: 無人の複製VCが残らないよう削除を予約する
+            self._log(channel.guild, f"{member.display_name} の移動に失敗: {e}")
+            await self._handle_leave(new_channel)
+
+    async def _join_from_pool(self, member: discord.Member, channel: discord.VoiceChannel) -> bool:
+        """待機中の複製VCを払い出して移動します。払い出せた場合は ``True`` を返します。"""
+        while True:
+            # 名前を変更する枠が残っていない複製は払い出さない（新しく複製する）
+            pooled_id = self._pool.acquire(channel.id, usable=self._pool.can_rename)
+            if pooled_id is None:
+                return False
+            pooled = self.bot.get_channel(pooled_id)
+            if isinstance(pooled, discord.VoiceChannel) and len(pooled.members) == 0:
+                break
+            if pooled is None:
+                # 待機中に手動削除された
+                await self.bot.database.mark_generated_channel_deleted(pooled_id)
+                self._index.discard_generated(pooled_id)
+        await self._cancel_delete_if_generated(pooled)
+        started = time.perf_counter()
+        try:
+            new_name = await self._compute_clone_name(channel, member)
+            await self._rest.submit(channel.guild.id, PRIORITY_MOVE, lambda: member.move_to(pooled))
+        except discord.HTTPException as e:
+            self._log(channel.guild, f"待機中の複製VCを使えませんでした: {e}")
+            if len(pooled.members) == 0:
+                await self._schedule_delete(pooled, 0)
+            return False
+        self._pool.record_hit_latency(time.perf_counter() - started)
+        if pooled.name != new_name:
+            # 名前の変更は移動の後にバックグラウンドで行う（制限に当たっても入室を待たせない）
+            self._pool.record_rename(pooled.id)
+            self._rename_later(pooled, new_name)
+        self._log(channel.guild, f"{member.display_name} を待機中の複製VC {new_name} に移動しました。")
+        self._event(
+            "vc_pool_hit", pooled, f"待機中の複製VCを払い出しました: {new_name}", base_channel_id=channel.id, user_id=member.id
+        )
+        return True
+
+    async def _park(self, channel: discord.VoiceChannel, base_channel_id: int) -> bool:
+        """無人になった複製VCを削除せずにプールへ戻します。戻せた場合は ``True`` を返します。"""
+        if not self._pool.can_park(base_channel_id):
+            return False
+        base = self.bot.get_channel(base_channel_id)
+        if not isinstance(base, discord.VoiceChannel):
+            return False
+        try:
+            # 権限上書きなどをベースVCの状態に戻す。名前の変更には厳しい制限があるため名前はそのままにし、
+            # 払い出し時に1回だけ変更する。誰も待っていない処理なので最も低い優先度で送る
+            await self._rest.submit(
+                channel.guild.id,
+                PRIORITY_LOG,
+                lambda: channel.edit(
+                    overwrites=dict(base.overwrites),
+                    bitrate=base.bitrate,
+                    user_limit=base.user_limit,
+                ),
+            )
+        except discord.HTTPException:
+            return False
+        if len(channel.members) != 0:
+            # 待っている間に誰かが入った
+            return False
+        self._pool.park(base_channel_id, channel.id)
+        await self.bot.database.set_generated_channel_delete_due(channel.id, None)
+        return True
+
+    @tasks.loop(seconds=30.0)
+    async def pool_maintenance(self) -> None:
+        """待機複製プールの削減と事前作成を行います。"""
+        for channel_id in self._pool.trim():
+            channel = self.bot.get_channel(channel_id)
+            if isinstance(channel, discord.VoiceChannel) and len(channel.members) == 0:
+                await self._schedule_delete(channel, 0)
+        for base_channel_id, missing in list(self._pool.deficits()):
+            base = self.bot.get_channel(base_channel_id)
+            if not isinstance(base, discord.VoiceChannel):
+                continue
+            settings = await self.bot.database.get_or_create_guild_vc_settings(base.guild.id)
+            for _ in range(missing):
+                reservation = self._index.reserve(base.guild.id, base.id, int(settings["max_channels"]))
+                if reservation is None:
+                    break
+                with reservation:
+                    try:
+                        clone = await self._clone_voice_channel(base, self._pool_idle_name, priority=PRIORITY_LOG)
+                    except discord.HTTPException:
+                        break
+                    await self.bot.database.add_generated_channel(clone.id, base.guild.id, base.id, None)
+                    reservation.commit(clone.id)
+                self._pool.park(base.id, clone.id, prewarmed=True)
+
+    @pool_maintenance.before_loop
+    async def before_pool_maintenance(self) -> None:
+        await self.bot.wait_until_ready()
 
     async def _handle_leave(self, channel: discord.VoiceChannel) -> None:
         # Botが生成したVCのみ対象
-        if not await self.bot.database.is_generated_channel(channel.id):
+        if not self._index.is_generated(channel.id):
             return
         # 無人なら削除スケジュール
         if len(channel.members) == 0:
@@ -265,92 +652,152 @@ class Voice(commands.Cog, name="voice"):
             await self._schedule_delete(channel, delay)
 
     async def _cancel_delete_if_generated(self, channel: discord.VoiceChannel) -> None:
-        if not await self.bot.database.is_generated_channel(channel.id):
+        if not self._index.is_generated(channel.id):
             return
-        task = self._delete_tasks.pop(channel.id, None)
-        if task and not task.done():
-            task.cancel()
+        if self._deletions.cancel(channel.id):
+            await self.bot.database.set_generated_channel_delete_due(channel.id, None)
 
     async def _schedule_delete(self, channel: discord.VoiceChannel, delay: int) -> None:
-        # 既存のスケジュールがあればキャンセル
-        old = self._delete_tasks.pop(channel.id, None)
-        if old and not old.done():
-            old.cancel()
-
-        async def _job():
-            try:
-                await asyncio.sleep(delay)
-                # 再確認（存在＆無人）
-                if channel and len(channel.members) == 0:
-                    await channel.delete(reason="自動生成VCの自動削除")
-                    await self.bot.database.mark_generated_channel_deleted(channel.id)
-                    # すべての生成VC（このベース由来）が消えたらカウンタを1に戻す
-                    try:
-                        base_id = await self.bot.database.get_base_channel_id_for_generated(channel.id)
-                        if base_id is not None:
-                            remain = await self.bot.database.count_active_generated_channels_for_base(base_id)
-                            if remain == 0:
-                                await self.bot.database.reset_base_counter(base_id)
-                    except Exception:
-                        pass
-                    await self._log(channel.guild, f"{channel.name} を自動削除しました。")
-            except asyncio.CancelledError:
+        # 既存のスケジュールがあれば置き換え（再起動後も再開できるよう予定時刻をDBにも記録）
+        self._deletions.schedule(channel.id, delay)
+        await self.bot.database.set_generated_channel_delete_due(channel.id, time.time() + delay)
+
+    async def _delete_expired(self, channel_id: int) -> None:
+        """削除スケジューラから呼ばれ、期限切れの生成VCを削除します。"""
+        channel = self.bot.get_channel(channel_id)
+        if channel is None and self._index.is_generated(channel_id):
+            if not self.bot.is_ready():
+                # キャッシュが揃うまで存在を判断できない: 予定を捨てずに少し後へ送る（DBの予定時刻はそのまま）
+                self._deletions.schedule(channel_id, NOT_READY_RETRY_DELAY)
                 return
-            except discord.Forbidden:
-                await self._log(channel.guild, f"{channel.name} を削除できません（権限不足）。")
-            except discord.HTTPException as e:
-                await self._log(channel.guild, f"{channel.name} の削除に失敗: {e}")
-            finally:
-                self._delete_tasks.pop(channel.id, None)
-
-        self._delete_tasks[channel.id] = asyncio.create_task(_job())
+            # 既に存在しない（手動削除など）: 記録だけ削除済みにする
+            await self.bot.database.mark_generated_channel_deleted(channel_id)
+            self._index.discard_generated(channel_id)
+            return
+        if not isinstance(channel, discord.VoiceChannel):
+            return
+        # 再確認（存在＆無人）
+        if len(channel.members) != 0:
+            return
+        # プールに空きがあれば削除せずに待機させる
+        record = self._index.get_generated(channel.id)
+        name = channel.name
+        if record is not None and channel.id not in self._pool and await self._park(channel, record.base_channel_id):
+            self._log(channel.guild, f"{name} を待機中の複製VCとしてプールに戻しました。")
+            self._event("vc_parked", channel, f"複製VCをプールに戻しました: {name}", base_channel_id=record.base_channel_id)
+            return
+        if len(channel.members) != 0:
+            # プールに戻す処理を待つ間に誰かが入った
+            return
+        try:
+            await self._rest.submit(
+                channel.guild.id, PRIORITY_DELETE, lambda: channel.delete(reason="自動生成VCの自動削除")
+            )
+        except discord.Forbidden:
+            self._log(channel.guild, f"{channel.name} を削除できません（権限不足）。")
+            self._event("vc_delete_failed", channel, f"{channel.name} を削除できません（権限不足）", level=logging.WARNING)
+            return
+        except discord.HTTPException as e:
+            self._log(channel.guild, f"{channel.name} の削除に失敗: {e}")
+            self._event("vc_delete_failed", channel, f"{channel.name} の削除に失敗: {e}", level=logging.WARNING)
+            return
+        await self.bot.database.mark_generated_channel_deleted(channel.id)
+        record = self._index.discard_generated(channel.id)
+        # すべての生成VC（このベース由来）が消えたらカウンタを1に戻す
+        if record is not None and self._index.count_for_base(record.base_channel_id) == 0:
+            self._counters.reset_base(record.base_channel_id)
+        self._log(channel.guild, f"{channel.name} を自動削除しました。")
+        self._event(
+            "vc_deleted",
+            channel,
+            f"複製VCを自動削除しました: {channel.name}",
+            base_channel_id=record.base_channel_id if record is not None else None,
+        )
 
     async def _compute_clone_name(self, source: discord.VoiceChannel, member: discord.Member | None = None) -> str:
         """複製VCの名前を決める。ベースVCにテンプレートがあればそれを、なければギルド既定を使用。"""
         guild = source.guild
-        settings = await self.bot.database.get_or_create_guild_vc_settings(guild.id)
         # {count} はベースVC単位の連番（テンプレで作成されたVCに連動）
         # ベースVCでない場合はギルド全体のカウンタを使うフォールバック
-        if await self.bot.database.is_base_channel(source.id):
-            next_count = await self.bot.database.get_next_base_counter(source.id)
+        is_base = self._index.is_base(source.id)
+        if is_base:
+            next_count = self._counters.next_base(source.id)
         else:
-            next_count = await self.bot.database.increment_and_get_name_counter(guild.id)
+            next_count = self._counters.next_guild(guild.id)
+        # ベースVCが個別テンプレートを持っていれば優先（どちらもコンパイル済みのものを使い、描画時にDBは引かない）
+        template = self._templates.get_base(source.id) if is_base else None
+        if template is None:
+            settings = await self.bot.database.get_or_create_guild_vc_settings(guild.id)
+            template = self._templates.get_guild(guild.id, settings["base_name_template"])
         user = member or guild.me  # フォールバックでBot自身
-        # ベースVCが個別テンプレートを持っていれば優先
-        base_tpl = None
-        try:
-            if await self.bot.database.is_base_channel(source.id):
-                base_tpl = await self.bot.database.get_base_channel_template(source.id)
-        except Exception:
-            base_tpl = None
-        template = base_tpl or settings["base_name_template"]
-        name = _safe_format_name(template, user, next_count)
         # 同名存在は許容（Discordは同名チャンネルを許すため）
-        return name
+        return template.render(NameContext(user, next_count, source.name))
 
-    async def _clone_voice_channel(self, source: discord.VoiceChannel, name: str) -> discord.VoiceChannel:
+    async def _clone_voice_channel(
+        self, source: discord.VoiceChannel, name: str, *, priority: int = PRIORITY_CREATE
+    ) -> discord.VoiceChannel:
         guild = source.guild
         # パーミッションオーバーライドのコピー
         overwrites = {target: overwrite for target, overwrite in source.overwrites.items()}
-        return await guild.create_voice_channel(
-            name=name,
-            category=source.category,
-            bitrate=source.bitrate,
-            user_limit=source.user_limit,
-            overwrites=overwrites,
+        return await self._rest.submit(
+            guild.id,
+            priority,
+            lambda: guild.create_voice_channel(
+                name=name,
+                category=source.category,
+                bitrate=source.bitrate,
+                user_limit=source.user_limit,
+                overwrites=overwrites,
+            ),
         )
 
-    async def _log(self, guild: discord.Guild, message: str) -> None:
-        try:
-            settings = await self.bot.database.get_or_create_guild_vc_settings(guild.id)
-            channel_id = settings.get("log_channel_id") if settings else None
-            if channel_id:
-                ch = guild.get_channel(int(channel_id))
-                if isinstance(ch, discord.TextChannel):
-                    await ch.send(message)
-        except Exception:
-            # ログ送信に失敗してもボットの動作は継続
-            pass
+    def _log(self, guild: discord.Guild, message: str) -> None:
+        """ログ行をバッファに積みます（送信はバックグラウンドでまとめて行う）。"""
+        settings = self.bot.database.peek_guild_vc_settings(guild.id)
+        if settings is not None and not settings.get("log_channel_id"):
+            # ログチャンネル未設定が分かっているギルドは積まない
+            return
+        self._logs.append(guild.id, message)
+
+    def _event(self, event: str, channel: discord.abc.GuildChannel, message: str, *, level: int = logging.INFO, **fields) -> None:
+        """VCのライフサイクルをプロセスのログに記録します（`LOG_FORMAT=json` では ``event`` / ``guild_id`` / ``channel_id`` などが列になる）。"""
+        self._logger.log(level, message, extra={"event": event, "guild_id": channel.guild.id, "channel_id": channel.id, **fields})
+
+    def _send_dm(self, member: discord.Member, content: str) -> None:
+        """DMをバックグラウンドで送ります（結果は待たない。失敗は無視する）。"""
+
+        async def send() -> None:
+            try:
+                await self._rest.submit(member.guild.id, PRIORITY_LOG, lambda: member.send(content))
+            except Exception:
+                pass
+
+        self._spawn(send())
+
+    def _rename_later(self, channel: discord.VoiceChannel, name: str) -> None:
+        """チャンネル名の変更をバックグラウンドで行います（失敗はログに残すだけ）。"""
+
+        async def rename() -> None:
+            try:
+                await self._rest.submit(channel.guild.id, PRIORITY_CREATE, lambda: channel.edit(name=name))
+            except discord.HTTPException as e:
+                self._log(channel.guild, f"{channel.name} の名前を変更できませんでした: {e}")
+
+        self._spawn(rename())
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _send_log(self, guild_id: int, content: str) -> None:
+        settings = await self.bot.database.get_or_create_guild_vc_settings(guild_id)
+        channel_id = settings.get("log_channel_id") if settings else None
+        if not channel_id:
+            return
+        ch = self.bot.get_channel(channel_id)
+        if isinstance(ch, discord.TextChannel):
+            await self._rest.submit(guild_id, PRIORITY_LOG, lambda: ch.send(content))
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -6,113 +6,249 @@ Copyright © Krypton 2019-Present - https://github.com/kkrypt0nn (https://krypto
 バージョン: 6.4.0
 """
 
+import asyncio
+import functools
+import inspect
+import itertools
+import logging
+import pathlib
+import time
+from collections import OrderedDict
+from typing import Callable
+
 import aiosqlite
 
+from database.migrations import LATEST_VERSION, SCHEMA_PATH, run_migrations
+from database.profiler import ProfiledConnection, QueryProfiler
+
+# (メソッド名, 所要秒数) を受け取るコールバック
+QueryObserver = Callable[[str, float], None]
+
+
+async def open_connection(
+    path: str,
+    *,
+    read_only: bool = False,
+    synchronous: str = "NORMAL",
+    busy_timeout: int = 5000,
+) -> aiosqlite.Connection:
+    """WALモードでSQLite接続を開きます。
+
+    :param path: データベースファイルのパス。
+    :param read_only: 読み取り専用で開くかどうか（読み取りプール用）。
+    :param synchronous: `PRAGMA synchronous` の値（`OFF` / `NORMAL` / `FULL` / `EXTRA`）。
+    :param busy_timeout: ロック待ちのタイムアウト（ミリ秒）。
+    :return: 設定済みの接続。
+    """
+    if read_only:
+        # `?` / `#` / `%` などを含むパスでも同じファイルを開けるよう、パスはURIとしてエスケープする
+        connection = await aiosqlite.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    else:
+        connection = await aiosqlite.connect(path)
+        await connection.execute("PRAGMA journal_mode=WAL")
+    await connection.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+    if synchronous.upper() in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        await connection.execute(f"PRAGMA synchronous={synchronous.upper()}")
+    return connection
+
+
+# シャードごとに分割するテーブルと、ギルドIDの列（ギルドのシャードは ``(guild_id >> 22) % shard_count``）
+_SHARDED_TABLES = {
+    "guild_vc_settings": "guild_id",
+    "vc_base_channels": "guild_id",
+    "vc_generated_channels": "guild_id",
+    "vc_generated_channels_archive": "guild_id",
+    "warns": "server_id",
+}
+
+
+async def seed_shard_database(
+    sources: list[str], target: str, shard_ids: list[int], shard_count: int
+) -> dict[str, int]:
+    """既存のDBから、指定したシャードに属するギルドの行だけを新しいDBにコピーします（クラスタモードへの移行・再分割用）。
+
+    :param sources: コピー元のDB（いずれも最新のスキーマに移行済みであること）。単一プロセス用のDB、
+        または再分割の場合は以前の割り当てのクラスタ用DBすべて。
+    :param target: 作成するDB。
+    :param shard_ids: このDBを使うプロセスが担当するシャードID。
+    :param shard_count: 全体のシャード数。
+    :return: テーブルごとのコピーした行数。
+    """
+    # auto_vacuum はテーブル作成前（WAL への切り替えより前）に設定する必要がある
+    connection = await aiosqlite.connect(target)
+    copied: dict[str, int] = {}
+    try:
+        await connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await connection.execute("PRAGMA journal_mode=WAL")
+        with open(SCHEMA_PATH, encoding="utf-8") as file:
+            await connection.executescript(file.read())
+        await connection.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+        placeholders = ", ".join("?" for _ in shard_ids)
+        for source in sources:
+            await connection.execute("ATTACH DATABASE ? AS source", (source,))
+            for table, column in _SHARDED_TABLES.items():
+                async with connection.execute(f"PRAGMA source.table_info('{table}')") as cursor:
+                    source_columns = {row[1] for row in await cursor.fetchall()}
+                if not source_columns:
+                    continue
+                async with connection.execute(f"PRAGMA main.table_info('{table}')") as cursor:
+                    columns = [row[1] for row in await cursor.fetchall() if row[1] in source_columns]
+                names = ", ".join(columns)
+                cursor = await connection.execute(
+                    f"INSERT OR IGNORE INTO main.{table} ({names}) SELECT {names} FROM source.{table} "
+                    f"WHERE (({column} >> 22) % ?) IN ({placeholders})",
+                    (shard_count, *shard_ids),
+                )
+                copied[table] = copied.get(table, 0) + cursor.rowcount
+            await connection.commit()
+            await connection.execute("DETACH DATABASE source")
+    finally:
+        await connection.close()
+    return copied
+
 
 class DatabaseManager:
-    def __init__(self, *, connection: aiosqlite.Connection) -> None:
+    def __init__(
+        self,
+        *,
+        connection: aiosqlite.Connection,
+        read_connections: list[aiosqlite.Connection] | None = None,
+        settings_cache_size: int = 1024,
+        write_behind_ms: int = 0,
+        write_behind_max: int = 64,
+        profiler: QueryProfiler | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param connection: 書き込みに使用する唯一の接続。
+        :param read_connections: SELECT を振り分ける読み取り専用接続のプール（省略時は書き込み接続で読む）。
+        :param settings_cache_size: ギルドVC設定キャッシュの最大件数。
+        :param write_behind_ms: 0より大きい場合ライトビハインドを有効にし、書き込みをこのミリ秒ごとにまとめてコミットします。
+        :param write_behind_max: ライトビハインド時、保留中の書き込みがこの件数に達したら即座にコミットします。
+        :param profiler: 指定するとメソッドごと・SQLごとの所要時間を記録します。
+        :param logger: バックグラウンドでのコミットの失敗の出力先。
+        """
+        self.profiler = profiler
+        self._logger = logger or logging.getLogger("discord_bot")
+        if profiler is not None:
+            connection = ProfiledConnection(connection, profiler)
         self.connection = connection
+        # 読み取りプール（ラウンドロビンで振り分け）
+        self.set_read_connections(read_connections or [])
+        # ライトビハインド（グループコミット）の状態
+        self._write_behind_delay = max(0, write_behind_ms) / 1000
+        self._write_behind_max = max(1, write_behind_max)
+        self._pending_writes = 0
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_count = 0
+        self._flushed_writes = 0
+        # ギルドVC設定のライトスルーキャッシュ（guild_id -> 設定dict、LRUで件数を制限）
+        self._settings_cache: OrderedDict[int, dict] = OrderedDict()
+        # guild_id -> 設定の書き込み回数（ミス時の読み込み中に書き込みがあったら、読んだ行をキャッシュしないため）
+        self._settings_generation: dict[int, int] = {}
+        self._settings_cache_size = max(1, settings_cache_size)
+        self._settings_cache_hits = 0
+        self._settings_cache_misses = 0
+        # 公開メソッドごとの所要時間の通知先（メトリクス用。未設定なら計測しない）
+        self.query_observer: QueryObserver | None = None
+
+    def set_read_connections(self, read_connections: list[aiosqlite.Connection]) -> None:
+        """読み取りプールを設定します（起動時、マイグレーションと並行して開いたプールを後から渡すため）。"""
+        if self.profiler is not None:
+            read_connections = [ProfiledConnection(c, self.profiler) for c in read_connections]
+        self.read_connections = list(read_connections)
+        self._read_cycle = itertools.cycle(self.read_connections) if self.read_connections else None
+
+    async def migrate(self) -> dict[str, float]:
+        """未適用のマイグレーションを適用します（`database/migrations.py`）。
+
+        最新のDBでは `PRAGMA user_version` を1回読むだけです。
+
+        :return: 適用したマイグレーションと所要秒数（最新なら空）。
+        """
+        return await run_migrations(self.connection)
 
-    async def migrate(self) -> None:
-        """Run lightweight migrations to keep DB schema up-to-date at startup.
-        This will auto-add any missing columns used by the bot, with safe defaults.
-        Idempotent and safe to run multiple times.
-        Limitations: SQLite cannot easily add NOT NULL constraints retroactively; we add columns
-        with defaults where possible and backfill NULLs.
+    # -----------------
+    # 接続の振り分け
+    # -----------------
+    def _reader(self) -> aiosqlite.Connection:
+        """SELECT に使う接続を返します。
+
+        未コミットの書き込みが保留中の場合は、それを参照できるよう書き込み接続で読みます。
         """
-        # Helper: get existing column names for a table
-        async def _get_columns(table: str) -> set[str]:
-            async with self.connection.execute(f"PRAGMA table_info('{table}')") as cur:
-                rows = await cur.fetchall()
-                return {row[1] for row in rows}
-
-        # Helper: ensure column exists; if missing, run provided ALTER and optional backfill
-        async def _ensure_column(table: str, column: str, add_column_sql: str, backfill_sql: str | None = None) -> None:
-            cols = await _get_columns(table)
-            if column not in cols:
-                await self.connection.execute(add_column_sql)
-                await self.connection.commit()
-                if backfill_sql:
-                    await self.connection.execute(backfill_sql)
-                    await self.connection.commit()
-
-        # guild_vc_settings expected columns
-        await _ensure_column(
-            "guild_vc_settings",
-            "base_name_template",
-            "ALTER TABLE guild_vc_settings ADD COLUMN base_name_template TEXT NOT NULL DEFAULT '{user_name}のVC'",
-            "UPDATE guild_vc_settings SET base_name_template = COALESCE(base_name_template, '{user_name}のVC')",
-        )
-        await _ensure_column(
-            "guild_vc_settings",
-            "name_counter",
-            "ALTER TABLE guild_vc_settings ADD COLUMN name_counter INTEGER NOT NULL DEFAULT 0",
-            "UPDATE guild_vc_settings SET name_counter = COALESCE(name_counter, 0)",
-        )
-        await _ensure_column(
-            "guild_vc_settings",
-            "max_channels",
-            "ALTER TABLE guild_vc_settings ADD COLUMN max_channels INTEGER NOT NULL DEFAULT 50",
-            "UPDATE guild_vc_settings SET max_channels = COALESCE(max_channels, 50)",
-        )
-        await _ensure_column(
-            "guild_vc_settings",
-            "delete_delay",
-            "ALTER TABLE guild_vc_settings ADD COLUMN delete_delay INTEGER NOT NULL DEFAULT 30",
-            "UPDATE guild_vc_settings SET delete_delay = COALESCE(delete_delay, 30)",
-        )
-        await _ensure_column(
-            "guild_vc_settings",
-            "log_channel_id",
-            "ALTER TABLE guild_vc_settings ADD COLUMN log_channel_id TEXT",
-            None,
-        )
+        if self._read_cycle is None or self._pending_writes:
+            return self.connection
+        return next(self._read_cycle)
 
-        # vc_base_channels expected columns
-        await _ensure_column(
-            "vc_base_channels",
-            "creator_id",
-            "ALTER TABLE vc_base_channels ADD COLUMN creator_id TEXT",
-            None,
-        )
-        await _ensure_column(
-            "vc_base_channels",
-            "name_template",
-            "ALTER TABLE vc_base_channels ADD COLUMN name_template TEXT",
-            None,
-        )
-        await _ensure_column(
-            "vc_base_channels",
-            "name_counter",
-            "ALTER TABLE vc_base_channels ADD COLUMN name_counter INTEGER NOT NULL DEFAULT 1",
-            "UPDATE vc_base_channels SET name_counter = COALESCE(name_counter, 1)",
-        )
-        await _ensure_column(
-            "vc_base_channels",
-            "created_at",
-            "ALTER TABLE vc_base_channels ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
-            "UPDATE vc_base_channels SET created_at = COALESCE(created_at, CURRENT_TIMESTAMP)",
-        )
+    # -----------------
+    # 書き込み制御（ライトビハインド）
+    # -----------------
+    async def _commit(self, *, durable: bool = False) -> None:
+        """書き込みをコミットします。
 
-        # vc_generated_channels expected columns
-        await _ensure_column(
-            "vc_generated_channels",
-            "creator_id",
-            "ALTER TABLE vc_generated_channels ADD COLUMN creator_id TEXT",
-            None,
-        )
-        await _ensure_column(
-            "vc_generated_channels",
-            "created_at",
-            "ALTER TABLE vc_generated_channels ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
-            "UPDATE vc_generated_channels SET created_at = COALESCE(created_at, CURRENT_TIMESTAMP)",
-        )
-        await _ensure_column(
-            "vc_generated_channels",
-            "deleted_at",
-            "ALTER TABLE vc_generated_channels ADD COLUMN deleted_at TIMESTAMP",
-            None,
-        )
+        ライトビハインドが無効、または ``durable=True`` の場合は保留分も含めて即座にコミットします。
+        有効な場合は保留件数を数えるだけで、一定時間または一定件数ごとに1トランザクションでまとめてコミットします。
+        同じ接続からの読み取りは未コミットの書き込みも参照できます。
+        """
+        if durable or self._write_behind_delay <= 0:
+            await self.flush()
+            return
+        self._pending_writes += 1
+        if self._pending_writes >= self._write_behind_max:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(self._write_behind_delay)
+        finally:
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # 誰も await しないタスクなので、ここで出力しないと失敗が見えなくなる（保留分は次のコミットで再試行）
+            self._logger.error(f"ライトビハインドのコミットに失敗しました: {type(e).__name__}: {e}")
+
+    async def flush(self) -> None:
+        """保留中の書き込みをコミットし、永続化されるまで待ちます。"""
+        async with self._flush_lock:
+            pending = self._pending_writes
+            await self.connection.commit()
+            # コミットが終わるまでは保留ありのままにして、読み取りを書き込み接続に向け続ける
+            # （読み取りプールからは未コミットの行が見えないため）。コミット中に増えた分は残す
+            self._pending_writes -= pending
+            if pending:
+                self._flush_count += 1
+                self._flushed_writes += pending
+
+    def write_behind_stats(self) -> dict:
+        return {
+            "enabled": self._write_behind_delay > 0,
+            "pending": self._pending_writes,
+            "flushes": self._flush_count,
+            "batched_writes": self._flushed_writes,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "settings_cache": self.settings_cache_stats(),
+            "write_behind": self.write_behind_stats(),
+            "read_pool_size": len(self.read_connections),
+        }
+
+    async def close(self) -> None:
+        """保留中の書き込みをコミットしてから接続を閉じます。"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self.flush()
+        finally:
+            for read_connection in self.read_connections:
+                await read_connection.close()
+            await self.connection.close()
 
     # -----------------
     # 既存のテンプレ機能
@@ -146,7 +282,7 @@ class DatabaseManager:
                     reason,
                 ),
             )
-            await self.connection.commit()
+            await self._commit(durable=True)
             return warn_id
 
     async def remove_warn(self, warn_id: int, user_id: int, server_id: int) -> int:
@@ -165,7 +301,7 @@ class DatabaseManager:
                 server_id,
             ),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
         rows = await self.connection.execute(
             "SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?",
             (
@@ -185,7 +321,7 @@ class DatabaseManager:
         :param server_id: チェックされるべきサーバーのID。
         :return: ユーザーのすべての警告のリスト。
         """
-        rows = await self.connection.execute(
+        rows = await self._reader().execute(
             "SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns WHERE user_id=? AND server_id=?",
             (
                 user_id,
@@ -202,15 +338,53 @@ class DatabaseManager:
     # -----------------
     # VC機能: 設定・トラッキング
     # -----------------
+    def _cache_settings(self, guild_id: int, settings: dict) -> dict:
+        self._settings_cache[guild_id] = settings
+        self._settings_cache.move_to_end(guild_id)
+        while len(self._settings_cache) > self._settings_cache_size:
+            self._settings_cache.popitem(last=False)
+        return settings
+
+    def _update_cached_settings(self, guild_id: int, **values) -> None:
+        """キャッシュ済みの設定があれば書き込み内容を反映します（未キャッシュなら世代だけ進める）。"""
+        self._settings_generation[guild_id] = self._settings_generation.get(guild_id, 0) + 1
+        settings = self._settings_cache.get(guild_id)
+        if settings is not None:
+            settings.update(values)
+
+    def settings_cache_stats(self) -> dict:
+        return {
+            "size": len(self._settings_cache),
+            "max_size": self._settings_cache_size,
+            "hits": self._settings_cache_hits,
+            "misses": self._settings_cache_misses,
+        }
+
+    def peek_guild_vc_settings(self, guild_id: int) -> dict | None:
+        """キャッシュ済みの設定だけを返します（DBは読まず、ヒット/ミスにも数えません）。"""
+        return self._settings_cache.get(guild_id)
+
     async def get_or_create_guild_vc_settings(self, guild_id: int) -> dict:
-        rows = await self.connection.execute(
+        """ギルドのVC設定を返します（未作成なら既定値で作成）。
+
+        返り値はキャッシュと共有されるため、呼び出し側で変更しないでください。
+        更新は `update_*` 系のメソッドを使用してください。
+        """
+        cached = self._settings_cache.get(guild_id)
+        if cached is not None:
+            self._settings_cache_hits += 1
+            self._settings_cache.move_to_end(guild_id)
+            return cached
+        self._settings_cache_misses += 1
+        generation = self._settings_generation.get(guild_id, 0)
+        rows = await self._reader().execute(
             "SELECT guild_id, base_name_template, name_counter, max_channels, delete_delay, log_channel_id FROM guild_vc_settings WHERE guild_id=?",
-            (str(guild_id),),
+            (guild_id,),
         )
         async with rows as cursor:
             row = await cursor.fetchone()
             if row:
-                return {
+                settings = {
                     "guild_id": row[0],
                     "base_name_template": row[1],
                     "name_counter": row[2],
@@ -218,83 +392,59 @@ class DatabaseManager:
                     "delete_delay": row[4],
                     "log_channel_id": row[5],
                 }
+                if self._settings_generation.get(guild_id, 0) != generation:
+                    # 読んでいる間に更新された: 更新前の行かもしれないのでキャッシュしない（次回読み直す）
+                    return settings
+                return self._cache_settings(guild_id, settings)
         # 作成
         await self.connection.execute(
             "INSERT OR IGNORE INTO guild_vc_settings(guild_id) VALUES (?)",
-            (str(guild_id),),
+            (guild_id,),
         )
-        await self.connection.commit()
-        return {
-            "guild_id": str(guild_id),
+        await self._commit()
+        settings = {
+            "guild_id": guild_id,
             "base_name_template": "{user_name}のVC",
             "name_counter": 0,
             "max_channels": 50,
             "delete_delay": 30,
             "log_channel_id": None,
         }
-
-    async def increment_and_get_name_counter(self, guild_id: int) -> int:
-        """ギルドの連番カウンタを原子的に払い出す（現在値を返しつつ +1）。"""
-        # まずは既存行に対して UPDATE ... RETURNING を試みる
-        async with self.connection.execute(
-            """
-            UPDATE guild_vc_settings
-            SET name_counter = name_counter + 1
-            WHERE guild_id = ?
-            RETURNING name_counter - 1
-            """,
-            (str(guild_id),),
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row is not None:
-                await self.connection.commit()
-                return int(row[0])
-        # 行が存在しない場合は作成してから再試行
-        await self.connection.execute(
-            "INSERT OR IGNORE INTO guild_vc_settings(guild_id, name_counter) VALUES(?, 0)",
-            (str(guild_id),),
-        )
-        await self.connection.commit()
-        async with self.connection.execute(
-            """
-            UPDATE guild_vc_settings
-            SET name_counter = name_counter + 1
-            WHERE guild_id = ?
-            RETURNING name_counter - 1
-            """,
-            (str(guild_id),),
-        ) as cursor:
-            row = await cursor.fetchone()
-            await self.connection.commit()
-            return int(row[0]) if row and row[0] is not None else 0
+        if self._settings_generation.get(guild_id, 0) != generation:
+            return settings
+        return self._cache_settings(guild_id, settings)
 
     async def update_base_name_template(self, guild_id: int, template: str) -> None:
         await self.connection.execute(
             "INSERT INTO guild_vc_settings(guild_id, base_name_template) VALUES(?, ?) ON CONFLICT(guild_id) DO UPDATE SET base_name_template=excluded.base_name_template",
-            (str(guild_id), template),
+            (guild_id, template),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
+        self._update_cached_settings(guild_id, base_name_template=template)
 
     async def update_max_channels(self, guild_id: int, limit: int) -> None:
         await self.connection.execute(
             "INSERT INTO guild_vc_settings(guild_id, max_channels) VALUES(?, ?) ON CONFLICT(guild_id) DO UPDATE SET max_channels=excluded.max_channels",
-            (str(guild_id), limit),
+            (guild_id, limit),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
+        self._update_cached_settings(guild_id, max_channels=limit)
 
     async def update_delete_delay(self, guild_id: int, seconds: int) -> None:
         await self.connection.execute(
             "INSERT INTO guild_vc_settings(guild_id, delete_delay) VALUES(?, ?) ON CONFLICT(guild_id) DO UPDATE SET delete_delay=excluded.delete_delay",
-            (str(guild_id), seconds),
+            (guild_id, seconds),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
+        self._update_cached_settings(guild_id, delete_delay=seconds)
 
     async def update_log_channel_id(self, guild_id: int, channel_id: int | None) -> None:
         await self.connection.execute(
             "INSERT INTO guild_vc_settings(guild_id, log_channel_id) VALUES(?, ?) ON CONFLICT(guild_id) DO UPDATE SET log_channel_id=excluded.log_channel_id",
-            (str(guild_id), str(channel_id) if channel_id else None),
+            (guild_id, channel_id or None),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
+        self._update_cached_settings(guild_id, log_channel_id=channel_id or None)
 
     # --- ベースVC単位のテンプレート ---
     async def set_base_channel_template(self, base_channel_id: int, template: str) -> None:
@@ -306,9 +456,9 @@ class DatabaseManager:
         """
         await self.connection.execute(
             "UPDATE vc_base_channels SET name_template=? WHERE channel_id=?",
-            (template, str(base_channel_id)),
+            (template, base_channel_id),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
 
     async def get_base_channel_template(self, base_channel_id: int) -> str | None:
         """指定したベースVCに設定された名前テンプレートを取得します。
@@ -320,9 +470,9 @@ class DatabaseManager:
         :param base_channel_id: `/vc create` で作成されたベースVCのチャンネルID。
         :return: 個別テンプレート文字列、または未設定時は ``None``。
         """
-        rows = await self.connection.execute(
+        rows = await self._reader().execute(
             "SELECT name_template FROM vc_base_channels WHERE channel_id=?",
-            (str(base_channel_id),),
+            (base_channel_id,),
         )
         async with rows as cursor:
             row = await cursor.fetchone()
@@ -330,17 +480,39 @@ class DatabaseManager:
                 return row[0]
             return None
 
+    async def get_base_channel_templates(self) -> dict[int, str]:
+        """個別テンプレートが設定されたベースVCを ``channel_id -> name_template`` で返します（起動時のキャッシュ構築用）。"""
+        async with self._reader().execute(
+            "SELECT channel_id, name_template FROM vc_base_channels WHERE name_template IS NOT NULL AND name_template != ''"
+        ) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    async def set_base_pool_size(self, base_channel_id: int, size: int) -> None:
+        """ベースVCごとに待機させておく複製VCの数を設定します（0で無効）。"""
+        await self.connection.execute(
+            "UPDATE vc_base_channels SET pool_size=? WHERE channel_id=?",
+            (size, base_channel_id),
+        )
+        await self._commit(durable=True)
+
+    async def get_base_pool_sizes(self) -> dict[int, int]:
+        """プールが有効なベースVCを ``channel_id -> pool_size`` で返します。"""
+        async with self._reader().execute(
+            "SELECT channel_id, pool_size FROM vc_base_channels WHERE pool_size > 0"
+        ) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
     async def add_base_channel(self, channel_id: int, guild_id: int, creator_id: int | None) -> None:
         await self.connection.execute(
             "INSERT OR IGNORE INTO vc_base_channels(channel_id, guild_id, creator_id) VALUES (?, ?, ?)",
-            (str(channel_id), str(guild_id), str(creator_id) if creator_id else None),
+            (channel_id, guild_id, creator_id or None),
         )
-        await self.connection.commit()
+        await self._commit(durable=True)
 
     async def is_base_channel(self, channel_id: int) -> bool:
-        rows = await self.connection.execute(
+        rows = await self._reader().execute(
             "SELECT 1 FROM vc_base_channels WHERE channel_id=?",
-            (str(channel_id),),
+            (channel_id,),
         )
         async with rows as cursor:
             return (await cursor.fetchone()) is not None
@@ -348,22 +520,22 @@ class DatabaseManager:
     async def add_generated_channel(self, channel_id: int, guild_id: int, base_channel_id: int, creator_id: int | None) -> None:
         await self.connection.execute(
             "INSERT OR IGNORE INTO vc_generated_channels(channel_id, guild_id, base_channel_id, creator_id) VALUES (?, ?, ?, ?)",
-            (str(channel_id), str(guild_id), str(base_channel_id), str(creator_id) if creator_id else None),
+            (channel_id, guild_id, base_channel_id, creator_id or None),
         )
-        await self.connection.commit()
+        await self._commit()
 
     async def is_generated_channel(self, channel_id: int) -> bool:
-        rows = await self.connection.execute(
+        rows = await self._reader().execute(
             "SELECT 1 FROM vc_generated_channels WHERE channel_id=? AND deleted_at IS NULL",
-            (str(channel_id),),
+            (channel_id,),
         )
         async with rows as cursor:
             return (await cursor.fetchone()) is not None
 
     async def count_active_generated_channels(self, guild_id: int) -> int:
-        rows = await self.connection.execute(
+        rows = await self._reader().execute(
             "SELECT COUNT(*) FROM vc_generated_channels WHERE guild_id=? AND deleted_at IS NULL",
-            (str(guild_id),),
+            (guild_id,),
         )
         async with rows as cursor:
             row = await cursor.fetchone()
@@ -371,55 +543,115 @@ class DatabaseManager:
 
     async def mark_generated_channel_deleted(self, channel_id: int) -> None:
         await self.connection.execute(
-            "UPDATE vc_generated_channels SET deleted_at=CURRENT_TIMESTAMP WHERE channel_id=?",
-            (str(channel_id),),
+            "UPDATE vc_generated_channels SET deleted_at=CURRENT_TIMESTAMP, delete_due_at=NULL WHERE channel_id=?",
+            (channel_id,),
         )
-        await self.connection.commit()
+        await self._commit()
 
-    # ---- New per-base counters ----
-    async def get_next_base_counter(self, base_channel_id: int) -> int:
-        """Atomically get current count for base channel and increment it.
-        Returns the current value before increment. If row missing, defaults to 1 and then increments to 2.
-        """
-        # Ensure base channel row exists
-        await self.connection.execute(
-            "INSERT OR IGNORE INTO vc_base_channels(channel_id, guild_id) VALUES(?, '')",
-            (str(base_channel_id),),
+    async def mark_generated_channels_deleted(self, channel_ids: list[int]) -> None:
+        """複数の生成VCを1トランザクションで削除済みにします（起動時の整合処理用）。"""
+        if not channel_ids:
+            return
+        await self.connection.executemany(
+            "UPDATE vc_generated_channels SET deleted_at=CURRENT_TIMESTAMP, delete_due_at=NULL WHERE channel_id=?",
+            [(channel_id,) for channel_id in channel_ids],
         )
-        await self.connection.commit()
-        async with self.connection.execute(
-            """
-            UPDATE vc_base_channels
-            SET name_counter = COALESCE(name_counter, 1) + 1
-            WHERE channel_id = ?
-            RETURNING name_counter - 1
-            """,
-            (str(base_channel_id),),
-        ) as cursor:
-            row = await cursor.fetchone()
-            await self.connection.commit()
-            # If somehow no row, return 1
-            return int(row[0]) if row and row[0] is not None else 1
+        await self._commit(durable=True)
 
-    async def reset_base_counter(self, base_channel_id: int) -> None:
+    # ---- 削除予定の永続化 ----
+    async def set_generated_channel_delete_due(self, channel_id: int, due_at: float | None) -> None:
+        """生成VCの削除予定時刻（UNIX時刻）を記録します。``None`` で予定を取り消します。"""
         await self.connection.execute(
-            "UPDATE vc_base_channels SET name_counter = 1 WHERE channel_id = ?",
-            (str(base_channel_id),),
+            "UPDATE vc_generated_channels SET delete_due_at=? WHERE channel_id=?",
+            (due_at, channel_id),
         )
-        await self.connection.commit()
+        await self._commit()
 
-    async def get_base_channel_id_for_generated(self, generated_channel_id: int) -> int | None:
-        async with self.connection.execute(
-            "SELECT base_channel_id FROM vc_generated_channels WHERE channel_id=?",
-            (str(generated_channel_id),),
+    async def get_generated_delete_schedule(self) -> dict[int, float]:
+        """削除予定が記録された未削除の生成VCを ``channel_id -> 予定時刻`` で返します。"""
+        async with self._reader().execute(
+            "SELECT channel_id, delete_due_at FROM vc_generated_channels WHERE deleted_at IS NULL AND delete_due_at IS NOT NULL"
         ) as cursor:
-            row = await cursor.fetchone()
-            return int(row[0]) if row and row[0] is not None else None
-
-    async def count_active_generated_channels_for_base(self, base_channel_id: int) -> int:
-        async with self.connection.execute(
-            "SELECT COUNT(*) FROM vc_generated_channels WHERE base_channel_id=? AND deleted_at IS NULL",
-            (str(base_channel_id),),
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    # ---- 連番カウンタ（払い出しは NameCounters がメモリ上で行う） ----
+    async def get_name_counters(self) -> tuple[dict[int, int], dict[int, int]]:
+        """連番カウンタの保存値を ``(ベースVC単位, ギルド単位)`` で返します（起動時の読み込み用）。"""
+        async with self._reader().execute("SELECT channel_id, name_counter FROM vc_base_channels") as cursor:
+            base = {row[0]: row[1] for row in await cursor.fetchall() if row[1] is not None}
+        async with self._reader().execute("SELECT guild_id, name_counter FROM guild_vc_settings") as cursor:
+            guild = {row[0]: row[1] for row in await cursor.fetchall() if row[1] is not None}
+        return base, guild
+
+    async def save_name_counters(self, base: dict[int, int], guild: dict[int, int]) -> None:
+        """連番カウンタの値をまとめて書き込みます（1トランザクション）。"""
+        if base:
+            await self.connection.executemany(
+                "UPDATE vc_base_channels SET name_counter=? WHERE channel_id=?",
+                [(value, channel_id) for channel_id, value in base.items()],
+            )
+        if guild:
+            await self.connection.executemany(
+                "INSERT INTO guild_vc_settings(guild_id, name_counter) VALUES(?, ?) ON CONFLICT(guild_id) DO UPDATE SET name_counter=excluded.name_counter",
+                [(guild_id, value) for guild_id, value in guild.items()],
+            )
+        await self._commit(durable=True)
+        for guild_id, value in guild.items():
+            self._update_cached_settings(guild_id, name_counter=value)
+
+    # ---- インメモリ索引の構築用 ----
+    async def get_base_channel_ids(self) -> list[int]:
+        """全ベースVCのチャンネルIDを返します（起動時の索引構築用）。"""
+        async with self._reader().execute("SELECT channel_id FROM vc_base_channels") as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def get_active_generated_channels(self) -> list[tuple[int, int, int]]:
+        """未削除の生成VCを ``(channel_id, guild_id, base_channel_id)`` の一覧で返します（起動時の索引構築用）。"""
+        async with self._reader().execute(
+            "SELECT channel_id, guild_id, base_channel_id FROM vc_generated_channels WHERE deleted_at IS NULL"
         ) as cursor:
+            return [
+                (row[0], row[1] or 0, row[2] or 0)
+                for row in await cursor.fetchall()
+            ]
+
+    # ---- ボットの状態 ----
+    async def get_bot_state(self, key: str) -> str | None:
+        async with self._reader().execute("SELECT value FROM bot_state WHERE key=?", (key,)) as cursor:
             row = await cursor.fetchone()
-            return int(row[0]) if row and row[0] is not None else 0
+            return row[0] if row else None
+
+    async def set_bot_state(self, key: str, value: str | None) -> None:
+        await self.connection.execute(
+            "INSERT INTO bot_state(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, value),
+        )
+        await self._commit(durable=True)
+
+
+def _timed(method):
+    """公開メソッドの所要時間を ``query_observer`` と ``profiler`` に通知するラッパー。"""
+
+    @functools.wraps(method)
+    async def wrapper(self: DatabaseManager, *args, **kwargs):
+        observer = self.query_observer
+        profiler = self.profiler
+        if observer is None and profiler is None:
+            return await method(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if observer is not None:
+                observer(method.__name__, elapsed)
+            if profiler is not None:
+                profiler.record_method(method.__name__, elapsed)
+
+    return wrapper
+
+
+for _name, _method in list(vars(DatabaseManager).items()):
+    if not _name.startswith("_") and inspect.iscoroutinefunction(_method):
+        setattr(DatabaseManager, _name, _timed(_method))
+del _name, _method
@@ -0,0 +1,359 @@
+"""
+`PRAGMA user_version` で管理する番号付きマイグレーション。
+
+起動時の確認は `user_version` を1回読むだけです。DBのバージョンより新しいマイグレーションだけを番号順に1回ずつ適用し、
+適用と `user_version` の更新を同じトランザクションでコミットします（途中で失敗したものは元のまま残り、次の起動で再実行されます）。
+
+マイグレーションの種類:
+- 通常 — 全体を1トランザクションで適用
+- バッチ — 大きなテーブルのデータ変換用。関数は非同期ジェネレータで、``yield`` ごとにコミットして少し待ちます
+  （書き込みロックを長く握らず、他の接続の書き込みを挟めるように）。最後のバッチと `user_version` の更新は同じトランザクション。
+  途中で止まっても次の起動で最初からやり直して問題ないように書きます
+- トランザクション外 — トランザクション内で実行できないもの。冪等に書きます
+
+起動を待たせる処理（DB全体を書き直す ``VACUUM`` など）はマイグレーションにしません。
+既存DBの `auto_vacuum=INCREMENTAL` への切り替えは、オーナーコマンド `vacuum`（`enable_incremental_vacuum`）で明示的に行います。
+
+新しいDB（テーブルが1つもない）は、マイグレーションを順に当てずに `schema.sql` から最新の形で作り、`user_version` を最新にします。
+`schema.sql` を読むのはこの新しいDBの作成だけです。各マイグレーションは、書いた時点のテーブル・インデックスの定義を
+リテラルとして持ち、`schema.sql` は参照しません（後から `schema.sql` を変えても、古いDBに当たる内容が変わらないように）。
+スキーマを変えるときは、`schema.sql` を変更し、同じ変更を行う DDL をリテラルで書いたマイグレーションを末尾に追加します。
+既存のマイグレーションの DDL は変更しません。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Union
+
+import aiosqlite
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "schema.sql")
+
+# v2 で INTEGER に変えたスノーフレークの列
+_SNOWFLAKE_COLUMNS = {
+    "guild_id",
+    "channel_id",
+    "base_channel_id",
+    "creator_id",
+    "log_channel_id",
+    "user_id",
+    "server_id",
+    "moderator_id",
+}
+
+# user_version 導入前のDBにない可能性がある列（テーブル, 列, ADD COLUMN の定義）
+_LEGACY_COLUMNS = (
+    ("guild_vc_settings", "base_name_template", "TEXT NOT NULL DEFAULT '{user_name}のVC'"),
+    ("guild_vc_settings", "name_counter", "INTEGER NOT NULL DEFAULT 0"),
+    ("guild_vc_settings", "max_channels", "INTEGER NOT NULL DEFAULT 50"),
+    ("guild_vc_settings", "delete_delay", "INTEGER NOT NULL DEFAULT 30"),
+    ("guild_vc_settings", "log_channel_id", "TEXT"),
+    ("vc_base_channels", "creator_id", "TEXT"),
+    ("vc_base_channels", "name_template", "TEXT"),
+    ("vc_base_channels", "name_counter", "INTEGER NOT NULL DEFAULT 1"),
+    # ADD COLUMN では CURRENT_TIMESTAMP を既定値にできないため、既存の行はマイグレーション 2 で埋める
+    ("vc_base_channels", "created_at", "TIMESTAMP"),
+    ("vc_base_channels", "pool_size", "INTEGER NOT NULL DEFAULT 0"),
+    ("vc_generated_channels", "creator_id", "TEXT"),
+    ("vc_generated_channels", "created_at", "TIMESTAMP"),
+    ("vc_generated_channels", "deleted_at", "TIMESTAMP"),
+    ("vc_generated_channels", "delete_due_at", "REAL"),
+)
+
+# マイグレーション 1〜4 を書いた時点のテーブル定義（固定。`schema.sql` を変えてもここは変えない）
+# 1 はないテーブルをこの定義で作り、3 はスノーフレークが TEXT のテーブルをこの定義で作り直す
+_TABLES_V4 = {
+    "warns": """(
+  `id` int(11) NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `server_id` INTEGER NOT NULL,
+  `moderator_id` INTEGER NOT NULL,
+  `reason` varchar(255) NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+)""",
+    "guild_vc_settings": """(
+  `guild_id` INTEGER PRIMARY KEY,
+  `base_name_template` TEXT NOT NULL DEFAULT '{user_name}のVC',
+  `name_counter` INTEGER NOT NULL DEFAULT 0,
+  `max_channels` INTEGER NOT NULL DEFAULT 50,
+  `delete_delay` INTEGER NOT NULL DEFAULT 30,
+  `log_channel_id` INTEGER
+)""",
+    "vc_base_channels": """(
+  `channel_id` INTEGER PRIMARY KEY,
+  `guild_id` INTEGER NOT NULL,
+  `creator_id` INTEGER,
+  `name_template` TEXT,
+  `name_counter` INTEGER NOT NULL DEFAULT 1,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `pool_size` INTEGER NOT NULL DEFAULT 0
+)""",
+    "vc_generated_channels": """(
+  `channel_id` INTEGER PRIMARY KEY,
+  `guild_id` INTEGER NOT NULL,
+  `base_channel_id` INTEGER NOT NULL,
+  `creator_id` INTEGER,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `deleted_at` TIMESTAMP,
+  `delete_due_at` REAL
+)""",
+    "vc_generated_channels_archive": """(
+  `channel_id` INTEGER PRIMARY KEY,
+  `guild_id` INTEGER NOT NULL,
+  `base_channel_id` INTEGER NOT NULL,
+  `creator_id` INTEGER,
+  `created_at` INTEGER,
+  `deleted_at` INTEGER
+)""",
+    "bot_state": """(
+  `key` TEXT PRIMARY KEY,
+  `value` TEXT
+)""",
+}
+
+# マイグレーション 4 で作るインデックス（固定）
+_INDEXES_V4 = (
+    "CREATE INDEX IF NOT EXISTS `idx_vc_generated_guild_live` "
+    "ON `vc_generated_channels` (`guild_id`) WHERE `deleted_at` IS NULL",
+    "CREATE INDEX IF NOT EXISTS `idx_vc_generated_base_live` "
+    "ON `vc_generated_channels` (`base_channel_id`) WHERE `deleted_at` IS NULL",
+    "CREATE INDEX IF NOT EXISTS `idx_vc_base_guild` ON `vc_base_channels` (`guild_id`)",
+    "CREATE INDEX IF NOT EXISTS `idx_vc_generated_delete_due` "
+    "ON `vc_generated_channels` (`delete_due_at`) WHERE `delete_due_at` IS NOT NULL AND `deleted_at` IS NULL",
+)
+
+BatchedApply = Callable[[aiosqlite.Connection, int], AsyncIterator[None]]
+
+
+class Migration:
+    __slots__ = ("version", "name", "apply", "batched", "transaction")
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        apply: Union[Callable[[aiosqlite.Connection], Awaitable[None]], BatchedApply],
+        *,
+        batched: bool = False,
+        transaction: bool = True,
+    ) -> None:
+        """
+        :param version: 適用後の `user_version`（1 から連番）。
+        :param name: ログ用の名前。
+        :param apply: 接続を受け取る非同期関数。``batched`` の場合は ``(接続, バッチサイズ)`` を受け取る非同期ジェネレータ。
+        :param batched: バッチごとにコミットするかどうか。
+        :param transaction: ``False`` の場合はトランザクションの外で実行します。
+        """
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.batched = batched
+        self.transaction = transaction
+
+
+def schema_statements() -> list[str]:
+    """`schema.sql` の文を1つずつに分けて返します（コメントは除く）。新しいDBの作成専用です。"""
+    with open(SCHEMA_PATH, encoding="utf-8") as file:
+        script = re.sub(r"--[^\n]*", "", file.read())
+    return [statement.strip() for statement in script.split(";") if statement.strip()]
+
+
+async def _table_columns(connection: aiosqlite.Connection, table: str) -> dict[str, str]:
+    async with connection.execute(f"PRAGMA table_info('{table}')") as cursor:
+        return {row[1]: (row[2] or "").upper() for row in await cursor.fetchall()}
+
+
+# ---- 1: user_version 導入前のDBの列の補完 ----
+async def _legacy_columns(connection: aiosqlite.Connection) -> None:
+    """ないテーブルを `_TABLES_V4` の定義で作り、古いDBにない列を追加します。"""
+    for table, columns_ddl in _TABLES_V4.items():
+        await connection.execute(f"CREATE TABLE IF NOT EXISTS `{table}` {columns_ddl}")
+    columns: dict[str, dict[str, str]] = {}
+    for table, column, definition in _LEGACY_COLUMNS:
+        if table not in columns:
+            columns[table] = await _table_columns(connection, table)
+        if column not in columns[table]:
+            await connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# ---- 2: created_at の埋め戻し（バッチ） ----
+async def _backfill_created_at(connection: aiosqlite.Connection, batch_size: int) -> AsyncIterator[None]:
+    """1 で追加した `created_at` が NULL の行を、rowid の範囲ごとに現在時刻で埋めます。"""
+    for table in ("vc_base_channels", "vc_generated_channels"):
+        async with connection.execute(f"SELECT 1 FROM {table} WHERE created_at IS NULL LIMIT 1") as cursor:
+            if await cursor.fetchone() is None:
+                continue
+        last = -1
+        while True:
+            # 次のバッチの上限の rowid（スノーフレークの rowid は疎なので、範囲ではなく件数で区切る）
+            async with connection.execute(
+                f"SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?",
+                (last, batch_size - 1),
+            ) as cursor:
+                row = await cursor.fetchone()
+            upper = row[0] if row else None
+            await connection.execute(
+                f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP "
+                f"WHERE rowid > ? AND (? IS NULL OR rowid <= ?) AND created_at IS NULL",
+                (last, upper, upper),
+            )
+            if upper is None:
+                break
+            last = upper
+            yield
+
+
+# ---- 3: スキーマ v2（スノーフレークを INTEGER に） ----
+async def _snowflakes_to_integer(connection: aiosqlite.Connection) -> None:
+    """スノーフレークを TEXT で持つテーブルを、データを保ったまま `_TABLES_V4` の定義（INTEGER）で作り直します。
+
+    SQLite は列の型を変更できないため、新しいテーブルを作ってコピーし、入れ替えます。
+    """
+    for table, columns_ddl in _TABLES_V4.items():
+        old_columns = await _table_columns(connection, table)
+        if all(old_columns.get(column, "INTEGER") == "INTEGER" for column in _SNOWFLAKE_COLUMNS):
+            continue
+        await connection.execute(f"CREATE TABLE `{table}_v2` {columns_ddl}")
+        async with connection.execute(f"PRAGMA table_info('{table}_v2')") as cursor:
+            new_columns = {row[1]: bool(row[3]) for row in await cursor.fetchall()}
+        names = [column for column in new_columns if column in old_columns]
+        values = []
+        for column in names:
+            if column not in _SNOWFLAKE_COLUMNS:
+                values.append(column)
+            elif new_columns[column]:
+                values.append(f"COALESCE(CAST(NULLIF({column}, '') AS INTEGER), 0)")
+            else:
+                values.append(f"CAST(NULLIF({column}, '') AS INTEGER)")
+        await connection.execute(
+            f"INSERT INTO {table}_v2 ({', '.join(names)}) SELECT {', '.join(values)} FROM {table}"
+        )
+        # 旧インデックスはテーブルと一緒に消え、4 で作り直す
+        await connection.execute(f"DROP TABLE {table}")
+        await connection.execute(f"ALTER TABLE {table}_v2 RENAME TO {table}")
+
+
+# ---- 4: インデックス ----
+async def _indexes(connection: aiosqlite.Connection) -> None:
+    """`_INDEXES_V4` のインデックス（稼働中の生成VCの部分インデックスなど）を作ります。"""
+    for statement in _INDEXES_V4:
+        await connection.execute(statement)
+
+
+# ---- 5: auto_vacuum ----
+async def _auto_vacuum_opt_in(connection: aiosqlite.Connection) -> None:
+    """何もしません（番号を詰めないために残している）。
+
+    以前はここで既存DBを ``VACUUM`` で `auto_vacuum=INCREMENTAL` に作り直していましたが、大きなDBでは
+    ファイル全体の書き直し（DBと同程度の空き容量が必要）が終わるまで起動が止まるため、`enable_incremental_vacuum` に移しました。
+    """
+
+
+async def enable_incremental_vacuum(connection: aiosqlite.Connection) -> bool:
+    """`auto_vacuum=INCREMENTAL` に切り替えます（既存DBは ``VACUUM`` で作り直す）。
+
+    ``VACUUM`` はファイル全体を書き直すため、DBの大きさに比例した時間と、DBと同程度の空きディスク容量が必要です。
+    その間は他の接続の書き込みが待たされます。以後、削除で空いたページは `database/retention.py` が
+    `PRAGMA incremental_vacuum` で少しずつ回収します。
+
+    :param connection: トランザクションを開いていない書き込み接続。
+    :return: 切り替えた場合は ``True``（すでに INCREMENTAL なら ``False``）。
+    """
+    async with connection.execute("PRAGMA auto_vacuum") as cursor:
+        row = await cursor.fetchone()
+    if row and row[0] == 2:
+        return False
+    await connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await connection.execute("VACUUM")
+    return True
+
+
+MIGRATIONS = (
+    Migration(1, "legacy_columns", _legacy_columns),
+    Migration(2, "backfill_created_at", _backfill_created_at, batched=True),
+    Migration(3, "snowflakes_to_integer", _snowflakes_to_integer),
+    Migration(4, "indexes", _indexes),
+    Migration(5, "auto_vacuum_opt_in", _auto_vacuum_opt_in),
+)
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def get_user_version(connection: aiosqlite.Connection) -> int:
+    async with connection.execute("PRAGMA user_version") as cursor:
+        row = await cursor.fetchone()
+    return row[0] if row else 0
+
+
+async def _apply(connection: aiosqlite.Connection, migration: Migration, batch_size: int, pause: float) -> None:
+    if not migration.transaction:
+        await migration.apply(connection)
+        await connection.execute(f"PRAGMA user_version = {migration.version}")
+        await connection.commit()
+        return
+    await connection.execute("BEGIN IMMEDIATE")
+    try:
+        if migration.batched:
+            async for _ in migration.apply(connection, batch_size):
+                await connection.commit()
+                await asyncio.sleep(pause)
+                await connection.execute("BEGIN IMMEDIATE")
+        else:
+            await migration.apply(connection)
+        await connection.execute(f"PRAGMA user_version = {migration.version}")
+        await connection.commit()
+    except BaseException:
+        await connection.rollback()
+        raise
+
+
+async def _create_schema(connection: aiosqlite.Connection) -> None:
+    """空のDBに `schema.sql` の最新のスキーマを作り、`user_version` を最新にします。"""
+    await connection.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in schema_statements():
+            await connection.execute(statement)
+        await connection.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+        await connection.commit()
+    except BaseException:
+        await connection.rollback()
+        raise
+    # WAL に切り替え済みの接続ではテーブル作成前の auto_vacuum 設定が効かないため、空のうちに VACUUM で反映する（空なので一瞬）
+    await enable_incremental_vacuum(connection)
+
+
+async def run_migrations(
+    connection: aiosqlite.Connection,
+    *,
+    batch_size: int = 5000,
+    pause: float = 0.01,
+) -> dict[str, float]:
+    """未適用のマイグレーションを番号順に適用します。
+
+    :param connection: 書き込み接続。
+    :param batch_size: バッチマイグレーションの1トランザクションあたりの行数。
+    :param pause: バッチの間に待つ秒数。
+    :return: 適用したマイグレーションの ``"番号_名前"`` と所要秒数（最新なら空）。
+    """
+    version = await get_user_version(connection)
+    if version >= LATEST_VERSION:
+        return {}
+    applied: dict[str, float] = {}
+    if version == 0:
+        async with connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' LIMIT 1") as cursor:
+            empty = await cursor.fetchone() is None
+        if empty:
+            started = time.perf_counter()
+            await _create_schema(connection)
+            applied["schema.sql"] = time.perf_counter() - started
+            return applied
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        started = time.perf_counter()
+        await _apply(connection, migration, max(1, batch_size), pause)
+        applied[f"{migration.version}_{migration.name}"] = time.perf_counter() - started
+    return applied
@@ -0,0 +1,191 @@
+"""
+DatabaseManager のプロファイリング。
+
+- メソッド単位: `DatabaseManager` の公開メソッドごとの呼び出し回数・合計/最大時間
+- SQL単位: 接続の `execute` / `executemany` / `execute_fetchall` / `commit` ごとの回数・合計/最大時間・返した行数
+
+しきい値を超えた SQL は、その文と所要時間をログに出力します。
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+
+import aiosqlite
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(sql: str) -> str:
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class _Entry:
+    __slots__ = ("calls", "total", "max", "rows")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def to_dict(self, *, rows: bool) -> dict:
+        result = {
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 2),
+            "avg_ms": round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+        }
+        if rows:
+            result["rows"] = self.rows
+        return result
+
+
+class QueryProfiler:
+    def __init__(self, *, slow_threshold_ms: float = 100.0, logger: logging.Logger | None = None) -> None:
+        """
+        :param slow_threshold_ms: この時間（ミリ秒）を超えた SQL をログに出力します（0 以下で無効）。
+        :param logger: 遅いクエリの出力先。
+        """
+        self.slow_threshold = slow_threshold_ms / 1000
+        self._logger = logger or logging.getLogger("discord_bot")
+        self.reset()
+
+    def reset(self) -> None:
+        self._methods: Dict[str, _Entry] = {}
+        self._statements: Dict[str, _Entry] = {}
+        self._slow = 0
+        self._since = time.monotonic()
+
+    def record_method(self, name: str, seconds: float) -> None:
+        entry = self._methods.get(name)
+        if entry is None:
+            entry = self._methods[name] = _Entry()
+        entry.calls += 1
+        entry.total += seconds
+        entry.max = max(entry.max, seconds)
+
+    def record_statement(self, sql: str, seconds: float, rows: int = 0, *, count: bool = True) -> None:
+        """SQLの実行（``count=True``）または結果の取得（``count=False``）を記録します。"""
+        key = _normalize(sql)
+        entry = self._statements.get(key)
+        if entry is None:
+            entry = self._statements[key] = _Entry()
+        if count:
+            entry.calls += 1
+        entry.total += seconds
+        entry.max = max(entry.max, seconds)
+        entry.rows += rows
+        if 0 < self.slow_threshold < seconds:
+            self._slow += 1
+            self._logger.warning(f"遅いクエリ ({seconds * 1000:.1f} ms, {rows} 行): {key}")
+
+    def snapshot(self, *, limit: Optional[int] = None) -> dict:
+        """合計時間の長い順に並べた統計を返します。"""
+        methods = sorted(self._methods.items(), key=lambda item: item[1].total, reverse=True)
+        statements = sorted(self._statements.items(), key=lambda item: item[1].total, reverse=True)
+        return {
+            "elapsed_s": round(time.monotonic() - self._since, 1),
+            "slow_threshold_ms": round(self.slow_threshold * 1000, 1),
+            "slow_queries": self._slow,
+            "methods": {name: entry.to_dict(rows=False) for name, entry in methods[:limit]},
+            "statements": [{"sql": sql, **entry.to_dict(rows=True)} for sql, entry in statements[:limit]],
+        }
+
+
+class _ProfiledCursor:
+    """カーソルをラップし、結果の取得時間と行数を同じSQLの統計に加算します。"""
+
+    def __init__(self, cursor: aiosqlite.Cursor, sql: str, profiler: QueryProfiler) -> None:
+        self._cursor = cursor
+        self._sql = sql
+        self._profiler = profiler
+
+    async def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = await self._cursor.fetchone()
+        self._profiler.record_statement(self._sql, time.perf_counter() - started, 1 if row is not None else 0, count=False)
+        return row
+
+    async def fetchall(self) -> Any:
+        started = time.perf_counter()
+        rows = await self._cursor.fetchall()
+        self._profiler.record_statement(self._sql, time.perf_counter() - started, len(rows), count=False)
+        return rows
+
+    async def fetchmany(self, size: Optional[int] = None) -> Any:
+        started = time.perf_counter()
+        rows = await self._cursor.fetchmany(size)
+        self._profiler.record_statement(self._sql, time.perf_counter() - started, len(rows), count=False)
+        return rows
+
+    async def __aenter__(self) -> "_ProfiledCursor":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._cursor.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class _ProfiledResult:
+    """`connection.execute()` の戻り値と同じく、``await`` と ``async with`` の両方で使えるようにします。"""
+
+    def __init__(self, connection: "ProfiledConnection", sql: str, parameters: Any) -> None:
+        self._connection = connection
+        self._sql = sql
+        self._parameters = parameters
+        self._cursor: Optional[_ProfiledCursor] = None
+
+    async def _execute(self) -> _ProfiledCursor:
+        started = time.perf_counter()
+        cursor = await self._connection._connection.execute(self._sql, self._parameters)
+        self._connection._profiler.record_statement(self._sql, time.perf_counter() - started)
+        return _ProfiledCursor(cursor, self._sql, self._connection._profiler)
+
+    def __await__(self):
+        return self._execute().__await__()
+
+    async def __aenter__(self) -> _ProfiledCursor:
+        self._cursor = await self._execute()
+        return self._cursor
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._cursor is not None:
+            await self._cursor._cursor.close()
+
+
+class ProfiledConnection:
+    """aiosqlite 接続をラップし、発行したSQLを `QueryProfiler` に記録します。"""
+
+    def __init__(self, connection: aiosqlite.Connection, profiler: QueryProfiler) -> None:
+        self._connection = connection
+        self._profiler = profiler
+
+    def execute(self, sql: str, parameters: Any = None) -> _ProfiledResult:
+        return _ProfiledResult(self, sql, parameters)
+
+    async def executemany(self, sql: str, parameters: Any) -> Any:
+        parameters = list(parameters)
+        started = time.perf_counter()
+        cursor = await self._connection.executemany(sql, parameters)
+        self._profiler.record_statement(sql, time.perf_counter() - started)
+        return cursor
+
+    async def execute_fetchall(self, sql: str, parameters: Any = None) -> Any:
+        started = time.perf_counter()
+        rows = await self._connection.execute_fetchall(sql, parameters)
+        self._profiler.record_statement(sql, time.perf_counter() - started, len(rows))
+        return rows
+
+    async def commit(self) -> None:
+        started = time.perf_counter()
+        await self._connection.commit()
+        self._profiler.record_statement("COMMIT", time.perf_counter() - started)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
@@ -0,0 +1,224 @@
+"""
+削除済みの生成VC（`vc_generated_channels` の `deleted_at` が入った行）の保持期間管理。
+
+保持期間を過ぎた行を、小さなバッチごとにコンパクトなアーカイブテーブル（`vc_generated_channels_archive`）へ移すか削除し、
+空いたページを `PRAGMA incremental_vacuum` で少しずつファイルから切り詰めます。
+
+イベント処理が使う書き込み接続を長く占有しないよう、ジョブは専用の接続で動き、
+バッチごとに短いトランザクションを切ってから一定時間待ちます（WALなので読み取りは妨げません）。
+
+対象の行は、チャンネルID（スノーフレーク）に含まれる作成時刻で範囲を絞り込み、
+主キー（rowid）順に走査するため、削除済み行用のインデックスは不要です。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+import aiosqlite
+
+# Discord のスノーフレークの起点（2015-01-01T00:00:00Z、ミリ秒）
+DISCORD_EPOCH_MS = 1420070400000
+
+MODES = ("archive", "delete")
+
+
+def snowflake_at(timestamp: float) -> int:
+    """指定したUNIX時刻以前に作られたIDより大きい、最小のスノーフレークを返します。"""
+    return max(0, int(timestamp * 1000) - DISCORD_EPOCH_MS) << 22
+
+
+class RetentionJob:
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[aiosqlite.Connection]],
+        *,
+        max_age_days: float = 90.0,
+        mode: str = "archive",
+        batch_size: int = 500,
+        pause: float = 0.05,
+        interval: float = 21600.0,
+        vacuum_pages: int = 256,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param connect: ジョブ専用の書き込み接続を開く関数。
+        :param max_age_days: 削除からこの日数を過ぎた行を対象にします。
+        :param mode: ``"archive"``（アーカイブテーブルへ移す）または ``"delete"``（削除する）。
+        :param batch_size: 1トランザクションで処理する行数。
+        :param pause: バッチ間・インクリメンタルバキュームの区切りごとに待つ秒数。
+        :param interval: 定期実行の間隔（秒）。
+        :param vacuum_pages: `PRAGMA incremental_vacuum` 1回で解放するページ数。
+        :param logger: 実行結果の出力先。
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode は {', '.join(MODES)} のいずれかです: {mode!r}")
+        self._connect = connect
+        self.max_age = max_age_days * 86400
+        self.mode = mode
+        self._batch_size = max(1, batch_size)
+        self._pause = max(0.0, pause)
+        self._interval = interval
+        self._vacuum_pages = max(1, vacuum_pages)
+        self._logger = logger or logging.getLogger("discord_bot")
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._runs = 0
+        self._total_rows = 0
+        self._total_bytes = 0
+        self.last_report: Optional[dict] = None
+        # 直近の実行時に DB が auto_vacuum=INCREMENTAL だったか（未実行なら None）
+        self.incremental_vacuum: Optional[bool] = None
+
+    # ---- 定期実行 ----
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._logger.error(f"履歴の整理に失敗しました: {type(e).__name__}: {e}")
+            await asyncio.sleep(self._interval)
+
+    # ---- 1回分の処理 ----
+    async def run_once(self) -> dict:
+        """保持期間を過ぎた行を処理し、空きページを回収して結果を返します。"""
+        async with self._lock:
+            started = time.perf_counter()
+            connection = await self._connect()
+            try:
+                size_before = await self._file_bytes(connection)
+                rows, batches = await self._move_expired(connection)
+                pages, page_size = await self._vacuum(connection)
+                size_after = await self._file_bytes(connection)
+            finally:
+                await connection.close()
+            report = {
+                "mode": self.mode,
+                "max_age_days": round(self.max_age / 86400, 2),
+                "rows": rows,
+                "batches": batches,
+                "incremental_vacuum": self.incremental_vacuum,
+                "pages_reclaimed": pages,
+                "bytes_reclaimed": pages * page_size,
+                "file_bytes_before": size_before,
+                "file_bytes_after": size_after,
+                "elapsed_s": round(time.perf_counter() - started, 2),
+            }
+            self._runs += 1
+            self._total_rows += rows
+            self._total_bytes += pages * page_size
+            self.last_report = report
+            if rows or pages:
+                action = "アーカイブ" if self.mode == "archive" else "削除"
+                self._logger.info(
+                    f"履歴の整理: {rows} 行を{action}し、{pages * page_size / 1024:.0f} KB を回収しました"
+                    f"（{batches} バッチ, {report['elapsed_s']} 秒）"
+                )
+            return report
+
+    async def _move_expired(self, connection: aiosqlite.Connection) -> tuple[int, int]:
+        now = time.time()
+        cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - self.max_age))
+        # 保持期間より後に作られたチャンネルは、保持期間より前に削除されているはずがない
+        ceiling = snowflake_at(now - self.max_age)
+        after = -1
+        total = 0
+        batches = 0
+        while True:
+            await connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = await connection.execute_fetchall(
+                    """
+                    SELECT channel_id FROM vc_generated_channels
+                    WHERE channel_id > ? AND channel_id < ? AND deleted_at IS NOT NULL AND deleted_at < ?
+                    ORDER BY channel_id LIMIT ?
+                    """,
+                    (after, ceiling, cutoff, self._batch_size),
+                )
+                if not rows:
+                    await connection.rollback()
+                    break
+                last = rows[-1][0]
+                bounds = (after, last, cutoff)
+                if self.mode == "archive":
+                    await connection.execute(
+                        """
+                        INSERT OR REPLACE INTO vc_generated_channels_archive
+                            (channel_id, guild_id, base_channel_id, creator_id, created_at, deleted_at)
+                        SELECT channel_id, guild_id, base_channel_id, creator_id,
+                               CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', deleted_at) AS INTEGER)
+                        FROM vc_generated_channels
+                        WHERE channel_id > ? AND channel_id <= ? AND deleted_at IS NOT NULL AND deleted_at < ?
+                        """,
+                        bounds,
+                    )
+                await connection.execute(
+                    "DELETE FROM vc_generated_channels WHERE channel_id > ? AND channel_id <= ? AND deleted_at IS NOT NULL AND deleted_at < ?",
+                    bounds,
+                )
+                await connection.commit()
+            except Exception:
+                await connection.rollback()
+                raise
+            total += len(rows)
+            batches += 1
+            after = last
+            if len(rows) < self._batch_size:
+                break
+            await asyncio.sleep(self._pause)
+        return total, batches
+
+    async def _vacuum(self, connection: aiosqlite.Connection) -> tuple[int, int]:
+        """`auto_vacuum=INCREMENTAL` のDBで、空きページを少しずつファイルから切り詰めます。
+
+        それ以外のDBでは何もしません（切り替えはオーナーコマンド `vacuum` で明示的に行う）。
+        """
+        page_size = await self._pragma(connection, "page_size")
+        self.incremental_vacuum = await self._pragma(connection, "auto_vacuum") == 2
+        if not self.incremental_vacuum:
+            return 0, page_size
+        reclaimed = 0
+        free = await self._pragma(connection, "freelist_count")
+        while free > 0:
+            await connection.execute_fetchall(f"PRAGMA incremental_vacuum({self._vacuum_pages})")
+            remaining = await self._pragma(connection, "freelist_count")
+            if remaining >= free:
+                break
+            reclaimed += free - remaining
+            free = remaining
+            await asyncio.sleep(self._pause)
+        return reclaimed, page_size
+
+    @staticmethod
+    async def _pragma(connection: aiosqlite.Connection, name: str) -> int:
+        rows = await connection.execute_fetchall(f"PRAGMA {name}")
+        return int(rows[0][0]) if rows else 0
+
+    async def _file_bytes(self, connection: aiosqlite.Connection) -> int:
+        return await self._pragma(connection, "page_count") * await self._pragma(connection, "page_size")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "max_age_days": round(self.max_age / 86400, 2),
+            "runs": self._runs,
+            "rows": self._total_rows,
+            "bytes_reclaimed": self._total_bytes,
+            "last_report": self.last_report,
+        }
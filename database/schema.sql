@@ -1,45 +1,76 @@
+-- 最新のスキーマ（新しいDBはここから作られ、`PRAGMA user_version` が最新になる）
+-- 既存DBは database/migrations.py の番号付きマイグレーションで同じ形に更新されます。
+-- ここを変更するときは、同じ変更を行う DDL をリテラルで書いたマイグレーションを database/migrations.py の末尾に追加してください
+-- （マイグレーションはこのファイルを読まない。既存のマイグレーションは変更しない）。
+-- Discordのスノーフレークは INTEGER で保持する（64bit に収まる）
+
 CREATE TABLE IF NOT EXISTS `warns` (
   `id` int(11) NOT NULL,
-  `user_id` varchar(20) NOT NULL,
-  `server_id` varchar(20) NOT NULL,
-  `moderator_id` varchar(20) NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `server_id` INTEGER NOT NULL,
+  `moderator_id` INTEGER NOT NULL,
   `reason` varchar(255) NOT NULL,
   `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
 -- ギルドごとのVC設定
 CREATE TABLE IF NOT EXISTS `guild_vc_settings` (
-  `guild_id` TEXT PRIMARY KEY,
+  `guild_id` INTEGER PRIMARY KEY,
   `base_name_template` TEXT NOT NULL DEFAULT '{user_name}のVC',
   `name_counter` INTEGER NOT NULL DEFAULT 0,
   `max_channels` INTEGER NOT NULL DEFAULT 50,
   `delete_delay` INTEGER NOT NULL DEFAULT 30,
-  `log_channel_id` TEXT
+  `log_channel_id` INTEGER
 );
 
 -- /vc create で作られたベースVCの記録
 CREATE TABLE IF NOT EXISTS `vc_base_channels` (
-  `channel_id` TEXT PRIMARY KEY,
-  `guild_id` TEXT NOT NULL,
-  `creator_id` TEXT,
+  `channel_id` INTEGER PRIMARY KEY,
+  `guild_id` INTEGER NOT NULL,
+  `creator_id` INTEGER,
   `name_template` TEXT,
   `name_counter` INTEGER NOT NULL DEFAULT 1,
-  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `pool_size` INTEGER NOT NULL DEFAULT 0
 );
 
--- Botが自動生成した複製VCの記録
+-- Botが自動生成した複製VCの記録（削除済みの行も履歴として残る）
 CREATE TABLE IF NOT EXISTS `vc_generated_channels` (
-  `channel_id` TEXT PRIMARY KEY,
-  `guild_id` TEXT NOT NULL,
-  `base_channel_id` TEXT NOT NULL,
-  `creator_id` TEXT,
+  `channel_id` INTEGER PRIMARY KEY,
+  `guild_id` INTEGER NOT NULL,
+  `base_channel_id` INTEGER NOT NULL,
+  `creator_id` INTEGER,
   `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-  `deleted_at` TIMESTAMP
+  `deleted_at` TIMESTAMP,
+  `delete_due_at` REAL
+);
+
+-- 保持期間を過ぎた削除済みの生成VC（database/retention.py が移す。時刻はUNIX秒）
+CREATE TABLE IF NOT EXISTS `vc_generated_channels_archive` (
+  `channel_id` INTEGER PRIMARY KEY,
+  `guild_id` INTEGER NOT NULL,
+  `base_channel_id` INTEGER NOT NULL,
+  `creator_id` INTEGER,
+  `created_at` INTEGER,
+  `deleted_at` INTEGER
 );
 
--- パフォーマンス向上のためのインデックス
-CREATE INDEX IF NOT EXISTS `idx_vc_generated_guild_active`
-ON `vc_generated_channels` (`guild_id`, `deleted_at`);
+-- ボット全体の状態（スラッシュコマンドの同期済みハッシュなど）
+CREATE TABLE IF NOT EXISTS `bot_state` (
+  `key` TEXT PRIMARY KEY,
+  `value` TEXT
+);
+
+-- 稼働中（未削除）の行だけを対象にした部分インデックス（削除済みの履歴が増えても大きくならない）
+CREATE INDEX IF NOT EXISTS `idx_vc_generated_guild_live`
+ON `vc_generated_channels` (`guild_id`) WHERE `deleted_at` IS NULL;
+
+CREATE INDEX IF NOT EXISTS `idx_vc_generated_base_live`
+ON `vc_generated_channels` (`base_channel_id`) WHERE `deleted_at` IS NULL;
 
 CREATE INDEX IF NOT EXISTS `idx_vc_base_guild`
-ON `vc_base_channels` (`guild_id`);
\ No newline at end of file
+ON `vc_base_channels` (`guild_id`);
+
+-- 自動削除の予定時刻順（削除待ちの生成VCだけ）
+CREATE INDEX IF NOT EXISTS `idx_vc_generated_delete_due`
+ON `vc_generated_channels` (`delete_due_at`) WHERE `delete_due_at` IS NOT NULL AND `deleted_at` IS NULL;
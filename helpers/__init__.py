@@ -0,0 +1,3 @@
+"""
+VC機能の補助モジュール群（Cogとしてはロードされない）。
+"""
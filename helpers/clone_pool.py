@@ -0,0 +1,195 @@
+"""
+ベースVCごとの複製VCプール。
+
+無人になった複製VCを削除せずに待機させ（権限上書きをベースVCに戻して保持）、
+次の入室では名前の変更と `member.move_to` だけで済ませます。
+需要がある間はベースVCごとに設定した数まで事前に複製を用意し、需要が落ちたら待機中の複製を削減します。
+
+チャンネル名の変更は Discord の制限（チャンネルごとに 10 分間で 2 回）を超えると長く待たされるため、
+払い出すたびの変更回数をチャンネルごとに数え、枠が残っている複製だけを払い出します（待機させるときは名前を変えない）。
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+# チャンネル名の変更の制限（RENAME_WINDOW 秒あたり RENAME_LIMIT 回）
+RENAME_LIMIT = 2
+RENAME_WINDOW = 600.0
+
+
+class ClonePool:
+    def __init__(self, *, idle_ttl: float = 600.0) -> None:
+        """
+        :param idle_ttl: この秒数以上入室がないベースVCの待機中複製を削減対象にします。
+        """
+        self.idle_ttl = idle_ttl
+        # base_channel_id -> 待機中の (channel_id, 待機開始時刻)
+        self._idle: Dict[int, Deque[Tuple[int, float]]] = {}
+        # channel_id -> base_channel_id（待機中の複製の逆引き）
+        self._owner: Dict[int, int] = {}
+        # base_channel_id -> 目標プールサイズ（0 または未登録は無効）
+        self._sizes: Dict[int, int] = {}
+        # base_channel_id -> 最後に入室があった時刻
+        self._last_demand: Dict[int, float] = {}
+        # channel_id -> 直近 RENAME_WINDOW 秒の名前変更の時刻
+        self._renames: Dict[int, Deque[float]] = {}
+        # 統計
+        self._hits = 0
+        self._misses = 0
+        self._parked = 0
+        self._prewarmed = 0
+        self._trimmed = 0
+        self._rename_limited = 0
+        self._create_latency_avg = 0.0
+        self._latency_saved = 0.0
+
+    # ---- 設定 ----
+    def load_sizes(self, sizes: Dict[int, int]) -> None:
+        self._sizes = {base_id: size for base_id, size in sizes.items() if size > 0}
+
+    def set_size(self, base_channel_id: int, size: int) -> None:
+        if size > 0:
+            self._sizes[base_channel_id] = size
+        else:
+            self._sizes.pop(base_channel_id, None)
+
+    def size_of(self, base_channel_id: int) -> int:
+        return self._sizes.get(base_channel_id, 0)
+
+    # ---- 取得・返却 ----
+    def acquire(self, base_channel_id: int, usable: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+        """待機中の複製を1つ取り出します。プールが無効なベースVCでは何もせず ``None`` を返します。
+
+        :param usable: 指定すると、これが ``True`` を返す複製だけを取り出します（それ以外は待機させたまま）。
+        """
+        if base_channel_id not in self._sizes:
+            return None
+        self._last_demand[base_channel_id] = time.monotonic()
+        idle = self._idle.get(base_channel_id)
+        if idle:
+            for entry in idle:
+                if usable is None or usable(entry[0]):
+                    idle.remove(entry)
+                    if not idle:
+                        del self._idle[base_channel_id]
+                    del self._owner[entry[0]]
+                    self._hits += 1
+                    return entry[0]
+            self._rename_limited += 1
+        self._misses += 1
+        return None
+
+    def can_park(self, base_channel_id: int) -> bool:
+        """空きがあり、かつ需要が続いているベースVCであれば待機させられます。"""
+        last = self._last_demand.get(base_channel_id)
+        if last is None or time.monotonic() - last > self.idle_ttl:
+            return False
+        return len(self._idle.get(base_channel_id, ())) < self._sizes.get(base_channel_id, 0)
+
+    def park(self, base_channel_id: int, channel_id: int, *, prewarmed: bool = False) -> None:
+        self._idle.setdefault(base_channel_id, deque()).append((channel_id, time.monotonic()))
+        self._owner[channel_id] = base_channel_id
+        if prewarmed:
+            self._prewarmed += 1
+        else:
+            self._parked += 1
+
+    def discard(self, channel_id: int) -> bool:
+        """待機中の複製をプールから外します（直接入室された・削除された場合）。"""
+        base_channel_id = self._owner.pop(channel_id, None)
+        if base_channel_id is None:
+            return False
+        idle = self._idle[base_channel_id]
+        for entry in idle:
+            if entry[0] == channel_id:
+                idle.remove(entry)
+                break
+        if not idle:
+            del self._idle[base_channel_id]
+        return True
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._owner
+
+    # ---- 名前変更の制限 ----
+    def can_rename(self, channel_id: int) -> bool:
+        """制限にかからずにチャンネル名を変更できるかどうか。"""
+        renames = self._renames.get(channel_id)
+        if not renames:
+            return True
+        cutoff = time.monotonic() - RENAME_WINDOW
+        while renames and renames[0] <= cutoff:
+            renames.popleft()
+        return len(renames) < RENAME_LIMIT
+
+    def record_rename(self, channel_id: int) -> None:
+        self._renames.setdefault(channel_id, deque()).append(time.monotonic())
+
+    # ---- 事前作成・削減 ----
+    def deficits(self) -> Iterable[Tuple[int, int]]:
+        """需要が続いているベースVCについて ``(base_channel_id, 不足数)`` を返します。"""
+        now = time.monotonic()
+        for base_channel_id, size in self._sizes.items():
+            last = self._last_demand.get(base_channel_id)
+            if last is None or now - last > self.idle_ttl:
+                continue
+            missing = size - len(self._idle.get(base_channel_id, ()))
+            if missing > 0:
+                yield base_channel_id, missing
+
+    def trim(self) -> List[int]:
+        """削減対象の待機中複製をプールから外し、そのチャンネルIDを返します。
+
+        - プールサイズを超えている分（サイズを下げた場合など）
+        - 需要が `idle_ttl` 以上途絶えたベースVCで、`idle_ttl` 以上待機している複製
+        """
+        now = time.monotonic()
+        trimmed: List[int] = []
+        for base_channel_id in list(self._idle):
+            idle = self._idle[base_channel_id]
+            size = self._sizes.get(base_channel_id, 0)
+            while len(idle) > size:
+                trimmed.append(idle.pop()[0])
+            last = self._last_demand.get(base_channel_id, 0.0)
+            if now - last > self.idle_ttl:
+                while idle and now - idle[0][1] > self.idle_ttl:
+                    trimmed.append(idle.popleft()[0])
+            if not idle:
+                del self._idle[base_channel_id]
+        for channel_id in trimmed:
+            del self._owner[channel_id]
+        self._trimmed += len(trimmed)
+        # 制限の窓を過ぎた名前変更の記録を捨てる（削除済みのチャンネルの分も含む）
+        cutoff = now - RENAME_WINDOW
+        for channel_id in [channel_id for channel_id, renames in self._renames.items() if renames[-1] <= cutoff]:
+            del self._renames[channel_id]
+        return trimmed
+
+    # ---- レイテンシ ----
+    def record_create_latency(self, seconds: float) -> None:
+        """プールを使わずに作成した場合の所要時間を記録します（指数移動平均）。"""
+        if self._create_latency_avg == 0.0:
+            self._create_latency_avg = seconds
+        else:
+            self._create_latency_avg = self._create_latency_avg * 0.8 + seconds * 0.2
+
+    def record_hit_latency(self, seconds: float) -> None:
+        """プールから払い出した場合の所要時間を記録し、作成と比べて短縮できた時間を積算します。"""
+        self._latency_saved += max(0.0, self._create_latency_avg - seconds)
+
+    def stats(self) -> dict:
+        return {
+            "bases": len(self._sizes),
+            "idle": len(self._owner),
+            "hits": self._hits,
+            "misses": self._misses,
+            "parked": self._parked,
+            "prewarmed": self._prewarmed,
+            "trimmed": self._trimmed,
+            "rename_limited": self._rename_limited,
+            "create_latency_avg_ms": round(self._create_latency_avg * 1000, 1),
+            "latency_saved_ms": round(self._latency_saved * 1000, 1),
+        }
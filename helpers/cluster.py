@@ -0,0 +1,98 @@
+"""
+クラスタモード（複数プロセスでのシャーディング）の構成。
+
+シャードIDの指定は ``"0-3,8"`` のような範囲とカンマ区切りの組み合わせで書きます。
+クラスタ（プロセス）ごとの割り当ては ``;`` で区切ります（例: ``"0-3;4-7"``）。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Tuple
+
+
+def parse_shard_ids(text: str) -> List[int]:
+    """``"0-3,8"`` のような指定をシャードIDの一覧にします。"""
+    shard_ids: List[int] = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(value) for value in part.split("-", 1))
+            if last < first:
+                raise ValueError(f"シャードIDの範囲が逆順です: {part!r}")
+            shard_ids.extend(range(first, last + 1))
+        else:
+            shard_ids.append(int(part))
+    return sorted(set(shard_ids))
+
+
+def format_shard_ids(shard_ids: List[int]) -> str:
+    return ",".join(str(shard_id) for shard_id in shard_ids)
+
+
+def split_shards(shard_count: int, cluster_count: int) -> List[List[int]]:
+    """シャード ``0..shard_count-1`` を、連続した範囲でクラスタに均等に割り当てます。"""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    size, extra = divmod(shard_count, cluster_count)
+    layout: List[List[int]] = []
+    start = 0
+    for index in range(cluster_count):
+        end = start + size + (1 if index < extra else 0)
+        layout.append(list(range(start, end)))
+        start = end
+    return layout
+
+
+def build_layout(shard_count: int, cluster_count: int, explicit: Optional[str] = None) -> List[List[int]]:
+    """クラスタごとのシャードIDを決めます。
+
+    :param shard_count: 全体のシャード数。
+    :param cluster_count: ``explicit`` がない場合のクラスタ数。
+    :param explicit: ``"0-3;4-7"`` のような明示的な割り当て（全シャードを重複なく含むこと）。
+    """
+    if not explicit:
+        return split_shards(shard_count, cluster_count)
+    layout = [parse_shard_ids(part) for part in explicit.split(";") if part.strip()]
+    assigned = [shard_id for shard_ids in layout for shard_id in shard_ids]
+    if sorted(assigned) != list(range(shard_count)):
+        raise ValueError(f"CLUSTER_SHARDS はシャード 0〜{shard_count - 1} を重複なく1回ずつ含む必要があります: {explicit!r}")
+    return layout
+
+
+def format_layout(layout: List[List[int]]) -> str:
+    """クラスタごとの割り当てを ``CLUSTER_SHARDS`` と同じ書式（``"0-3;4-7"``）にします。"""
+    parts = []
+    for shard_ids in layout:
+        if len(shard_ids) > 1 and shard_ids == list(range(shard_ids[0], shard_ids[-1] + 1)):
+            parts.append(f"{shard_ids[0]}-{shard_ids[-1]}")
+        else:
+            parts.append(format_shard_ids(shard_ids))
+    return ";".join(parts)
+
+
+_CLUSTER_DATABASE_NAME = re.compile(r"^shards-(?P<label>\d+(?:-\d+|(?:_\d+)*))-of-(?P<count>\d+)\.db$")
+
+
+def cluster_database_name(shard_ids: List[int], shard_count: int) -> str:
+    """クラスタ用のDBファイル名（担当シャードが変わると別のファイルになります）。"""
+    if shard_ids == list(range(shard_ids[0], shard_ids[-1] + 1)):
+        label = f"{shard_ids[0]}-{shard_ids[-1]}"
+    else:
+        label = "_".join(str(shard_id) for shard_id in shard_ids)
+    return f"shards-{label}-of-{shard_count}.db"
+
+
+def parse_cluster_database_name(name: str) -> Optional[Tuple[List[int], int]]:
+    """`cluster_database_name` の逆。クラスタ用のDBファイル名でなければ ``None`` を返します。"""
+    match = _CLUSTER_DATABASE_NAME.match(name)
+    if match is None:
+        return None
+    label = match.group("label")
+    if "-" in label:
+        first, last = (int(value) for value in label.split("-", 1))
+        shard_ids = list(range(first, last + 1))
+    else:
+        shard_ids = [int(value) for value in label.split("_")]
+    return shard_ids, int(match.group("count"))
@@ -0,0 +1,160 @@
+"""
+自動生成VCの削除スケジューラ。
+
+無人になったチャンネルごとに `asyncio.Task` を作る代わりに、1本のバックグラウンドループと
+タイマーホイール（tick -> チャンネルID集合）で削除予定を管理します。
+保持するのはチャンネルIDと期限だけで、予約・再予約・取消はいずれも O(1) です。
+期限切れのチャンネルは、同時実行数を制限したバッチで削除コールバックに渡されます。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Set
+
+ExpireCallback = Callable[[int], Awaitable[None]]
+
+
+class DeleteScheduler:
+    def __init__(
+        self,
+        on_expire: ExpireCallback,
+        *,
+        resolution: float = 1.0,
+        concurrency: int = 5,
+        batch_size: int = 50,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param on_expire: 期限切れのチャンネルIDを受け取って削除するコールバック。
+        :param resolution: タイマーホイール1スロットの幅（秒）。
+        :param concurrency: 1バッチ内で同時に実行する削除の上限。
+        :param batch_size: 1バッチで処理するチャンネル数の上限。
+        :param logger: コールバックで発生した例外の出力先。
+        """
+        self._on_expire = on_expire
+        self._resolution = resolution
+        self._concurrency = max(1, concurrency)
+        self._batch_size = max(1, batch_size)
+        self._logger = logger or logging.getLogger("discord_bot")
+        # タイマーホイール: tick -> チャンネルID集合 / チャンネルID -> (tick, 期限)
+        self._wheel: Dict[int, Set[int]] = {}
+        self._entries: Dict[int, tuple[int, float]] = {}
+        self._cursor = self._tick(time.monotonic()) - 1
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # 統計
+        self._expired = 0
+        self._batches = 0
+        self._last_batch_size = 0
+        self._max_batch_size = 0
+        self._in_flight = 0
+        self._lateness_total = 0.0
+        self._lateness_max = 0.0
+
+    def _tick(self, deadline: float) -> int:
+        return math.ceil(deadline / self._resolution)
+
+    # ---- 予約・取消 ----
+    def schedule(self, channel_id: int, delay: float) -> None:
+        """``delay`` 秒後に削除を予約します（予約済みなら期限を置き換えます）。"""
+        self.cancel(channel_id)
+        now = time.monotonic()
+        if not self._entries:
+            # 空の間に進んだ時刻のスロットは走査不要
+            self._cursor = max(self._cursor, self._tick(now) - 1)
+        deadline = now + max(0.0, delay)
+        tick = max(self._tick(deadline), self._cursor + 1)
+        self._wheel.setdefault(tick, set()).add(channel_id)
+        self._entries[channel_id] = (tick, deadline)
+        self._wakeup.set()
+
+    def cancel(self, channel_id: int) -> bool:
+        """予約を取り消します。予約があれば ``True`` を返します。"""
+        entry = self._entries.pop(channel_id, None)
+        if entry is None:
+            return False
+        slot = self._wheel.get(entry[0])
+        if slot is not None:
+            slot.discard(channel_id)
+            if not slot:
+                del self._wheel[entry[0]]
+        return True
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---- ループ ----
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if not self._entries:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await asyncio.sleep(self._resolution)
+            now = time.monotonic()
+            now_tick = self._tick(now) - 1
+            due: List[int] = []
+            while self._cursor < now_tick:
+                self._cursor += 1
+                slot = self._wheel.pop(self._cursor, None)
+                if not slot:
+                    continue
+                for channel_id in slot:
+                    _, deadline = self._entries.pop(channel_id)
+                    lateness = max(0.0, now - deadline)
+                    self._lateness_total += lateness
+                    self._lateness_max = max(self._lateness_max, lateness)
+                    due.append(channel_id)
+            for start in range(0, len(due), self._batch_size):
+                await self._run_batch(due[start : start + self._batch_size])
+
+    async def _run_batch(self, batch: List[int]) -> None:
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def _expire(channel_id: int) -> None:
+            async with semaphore:
+                try:
+                    await self._on_expire(channel_id)
+                except Exception as e:
+                    self._logger.error(f"VCの自動削除中に例外が発生しました (channel={channel_id}): {type(e).__name__}: {e}")
+
+        self._batches += 1
+        self._expired += len(batch)
+        self._last_batch_size = len(batch)
+        self._max_batch_size = max(self._max_batch_size, len(batch))
+        self._in_flight += len(batch)
+        try:
+            await asyncio.gather(*(_expire(channel_id) for channel_id in batch))
+        finally:
+            self._in_flight -= len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._entries),
+            "in_flight": self._in_flight,
+            "expired": self._expired,
+            "batches": self._batches,
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size": self._max_batch_size,
+            "lateness_avg": round(self._lateness_total / self._expired, 3) if self._expired else 0.0,
+            "lateness_max": round(self._lateness_max, 3),
+        }
@@ -0,0 +1,48 @@
+"""
+ゲートウェイのインテントとキャッシュの設定（実行プロファイル）。
+
+- ``default`` — `Intents.default()` と discord.py 既定のキャッシュ（テンプレートの元の設定）
+- ``lean`` — VC自動作成に必要なものだけに絞った省メモリ設定。大量のギルドに参加する運用向け
+
+``lean`` で残すもの:
+- `guilds` — チャンネル・ロール（複製時の権限上書き）とギルドの参加/退出
+- `voice_states` — 入退室イベントと `VoiceChannel.members`
+- `dm_messages` — オーナー向けのプレフィックスコマンド（`sync` など）をDMで使うため
+
+``lean`` で落とすもの:
+- ギルドのメッセージ・リアクション・入力中などのイベント（大量のギルドではゲートウェイの受信と解析の大半を占める）
+- 絵文字・スタンプのキャッシュ（`emojis_and_stickers` がない場合 discord.py は保持しない）
+- メッセージキャッシュ（``max_messages=None``）
+- メンバーキャッシュはボイスチャンネルにいるメンバーだけ、起動時のチャンク取得なし
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+import discord
+
+PROFILES = ("default", "lean")
+
+
+def build_profile(name: str) -> Tuple[discord.Intents, Dict[str, Any]]:
+    """プロファイル名から、インテントとクライアントに渡す追加の引数を返します。
+
+    :param name: ``"default"`` または ``"lean"``。
+    :return: ``(intents, options)``。``options`` は `commands.Bot` にそのまま渡せます。
+    """
+    if name == "default":
+        return discord.Intents.default(), {}
+    if name == "lean":
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.voice_states = True
+        intents.dm_messages = True
+        member_cache_flags = discord.MemberCacheFlags.none()
+        member_cache_flags.voice = True
+        return intents, {
+            "member_cache_flags": member_cache_flags,
+            "chunk_guilds_at_startup": False,
+            "max_messages": None,
+        }
+    raise ValueError(f"不明なプロファイルです: {name!r}（{' / '.join(PROFILES)}）")
@@ -0,0 +1,69 @@
+"""
+複数プロセス間で共有する IDENTIFY の間隔制御。
+
+Discord は IDENTIFY を ``shard_id % max_concurrency`` のバケットごとに 5 秒に 1 回までしか受け付けません。
+クラスタモードでは複数のプロセスが同時にシャードを起動するため、バケットごとのロックファイルに
+最後に IDENTIFY した時刻を記録し、ファイルロック（`fcntl.flock`）で順番を待ってから IDENTIFY します。
+
+`fcntl` のない環境（Windows）ではプロセス内の待機だけを行います。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 同じバケットで IDENTIFY を送る最小間隔（秒）
+IDENTIFY_INTERVAL = 5.0
+
+
+class IdentifyGate:
+    def __init__(self, directory: str, *, max_concurrency: int = 1, interval: float = IDENTIFY_INTERVAL) -> None:
+        """
+        :param directory: ロックファイルを置くディレクトリ（同じボットの全プロセスで共有）。
+        :param max_concurrency: `GET /gateway/bot` の ``session_start_limit.max_concurrency``。
+        :param interval: 同じバケットで IDENTIFY を送る最小間隔（秒）。
+        """
+        self._directory = directory
+        self.max_concurrency = max(1, max_concurrency)
+        self._interval = interval
+        self._last: dict[int, float] = {}
+        self.waited = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    async def wait(self, shard_id: int) -> None:
+        """``shard_id`` が IDENTIFY してよい時刻まで待ちます。"""
+        bucket = shard_id % self.max_concurrency
+        started = time.monotonic()
+        if fcntl is None:
+            delay = self._last.get(bucket, 0.0) + self._interval - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last[bucket] = time.time()
+        else:
+            await asyncio.to_thread(self._acquire, bucket)
+        self.waited += time.monotonic() - started
+
+    def _acquire(self, bucket: int) -> None:
+        path = os.path.join(self._directory, f"identify-{bucket}.lock")
+        with open(path, "a+", encoding="utf-8") as file:
+            # 同じバケットの他プロセスはここで順番を待つ（ロックはファイルを閉じると解放される）
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            try:
+                last = float(file.read().strip() or 0)
+            except ValueError:
+                last = 0.0
+            delay = last + self._interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            file.seek(0)
+            file.truncate()
+            file.write(f"{time.time():.3f}")
+            file.flush()
@@ -0,0 +1,100 @@
+"""
+ギルドごとの入室処理キュー。
+
+リスナーは処理を積むだけで待たずに戻り、同じキー（ユーザー, チャンネル）の重複入室は
+処理中・待機中のものにまとめます。ギルドごとに同時実行数の上限を設け、
+バースト時でも上限までは並列に処理します。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Set, Tuple
+
+JoinJob = Callable[[], Awaitable[None]]
+
+
+class _GuildQueue:
+    __slots__ = ("jobs", "workers")
+
+    def __init__(self) -> None:
+        self.jobs: Deque[Tuple[Hashable, JoinJob]] = deque()
+        self.workers = 0
+
+
+class GuildJoinQueue:
+    def __init__(self, concurrency: int = 4, *, logger: logging.Logger | None = None) -> None:
+        """
+        :param concurrency: ギルドごとの同時実行数の上限。
+        :param logger: ジョブで発生した例外の出力先。
+        """
+        self.concurrency = max(1, concurrency)
+        self._logger = logger or logging.getLogger("discord_bot")
+        self._guilds: Dict[int, _GuildQueue] = {}
+        # 待機中または処理中のキー（重複入室の集約用）
+        self._keys: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # 実行中のジョブ数（待機中のものは含まない）
+        self._running = 0
+        self._submitted = 0
+        self._coalesced = 0
+        self._failed = 0
+
+    def submit(self, guild_id: int, key: Hashable, job: JoinJob) -> bool:
+        """ジョブを積みます。同じキーが待機中・処理中なら積まずに ``False`` を返します。"""
+        if key in self._keys:
+            self._coalesced += 1
+            return False
+        self._keys.add(key)
+        self._submitted += 1
+        queue = self._guilds.get(guild_id)
+        if queue is None:
+            queue = self._guilds[guild_id] = _GuildQueue()
+        queue.jobs.append((key, job))
+        if queue.workers < self.concurrency:
+            queue.workers += 1
+            task = asyncio.create_task(self._worker(guild_id, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _worker(self, guild_id: int, queue: _GuildQueue) -> None:
+        try:
+            while queue.jobs:
+                key, job = queue.jobs.popleft()
+                self._running += 1
+                try:
+                    await job()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._failed += 1
+                    self._logger.error(f"入室処理中に例外が発生しました (guild={guild_id}): {type(e).__name__}: {e}")
+                finally:
+                    self._running -= 1
+                    self._keys.discard(key)
+        finally:
+            queue.workers -= 1
+            # 空になったギルドのキューは破棄してメモリを抑える
+            if queue.workers == 0 and not queue.jobs and self._guilds.get(guild_id) is queue:
+                del self._guilds[guild_id]
+
+    def close(self) -> None:
+        """待機中のジョブを破棄し、処理中のワーカーをキャンセルします。"""
+        for task in list(self._tasks):
+            task.cancel()
+        self._guilds.clear()
+        self._keys.clear()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queued": sum(len(queue.jobs) for queue in self._guilds.values()),
+            "running": self._running,
+            "active_guilds": len(self._guilds),
+            "submitted": self._submitted,
+            "coalesced": self._coalesced,
+            "failed": self._failed,
+        }
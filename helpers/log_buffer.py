@@ -0,0 +1,135 @@
+"""
+ログチャンネル向けのギルド別バッファ。
+
+VCの作成・移動・削除のたびに1通ずつ送る代わりに、ギルドごとに行を溜めて
+一定間隔でまとめて送信します（Discordのメッセージ長上限で分割）。
+追記は同期的で待ちが発生せず、バッファは行数で上限を設け、溢れた行は件数だけを記録して最後に添えます。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List
+
+# Discordのメッセージ本文の上限
+MESSAGE_LIMIT = 2000
+
+LogSender = Callable[[int, str], Awaitable[None]]
+
+
+class _GuildLog:
+    __slots__ = ("lines", "dropped")
+
+    def __init__(self) -> None:
+        self.lines: Deque[str] = deque()
+        self.dropped = 0
+
+
+def split_messages(lines: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """行のリストを、改行で連結して ``limit`` 文字以内のメッセージに分割します。"""
+    messages: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if len(line) > limit:
+            line = line[: limit - 1] + "…"
+        added = len(line) + (1 if current else 0)
+        if current and size + added > limit:
+            messages.append("\n".join(current))
+            current, size = [], 0
+            added = len(line)
+        current.append(line)
+        size += added
+    if current:
+        messages.append("\n".join(current))
+    return messages
+
+
+class LogBuffer:
+    def __init__(
+        self,
+        send: LogSender,
+        *,
+        interval: float = 2.0,
+        max_lines: int = 200,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param send: ``(guild_id, 本文)`` を受け取ってログチャンネルへ送信するコールバック。
+        :param interval: まとめて送信する間隔（秒）。
+        :param max_lines: ギルドごとに保持する最大行数（超えた分は破棄して件数を数えます）。
+        :param logger: 送信失敗などの出力先。
+        """
+        self._send = send
+        self._interval = interval
+        self._max_lines = max(1, max_lines)
+        self._logger = logger or logging.getLogger("discord_bot")
+        self._guilds: Dict[int, _GuildLog] = {}
+        self._task: asyncio.Task | None = None
+        self._appended = 0
+        self._dropped = 0
+        self._messages_sent = 0
+        self._flushes = 0
+
+    def append(self, guild_id: int, line: str) -> None:
+        guild_log = self._guilds.get(guild_id)
+        if guild_log is None:
+            guild_log = self._guilds[guild_id] = _GuildLog()
+        if len(guild_log.lines) >= self._max_lines:
+            # 古い行を押し出さず、新しい行を捨てて件数だけ残す
+            guild_log.dropped += 1
+            self._dropped += 1
+            return
+        guild_log.lines.append(line)
+        self._appended += 1
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """ループを止め、残っている行を送信します。"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        guilds, self._guilds = self._guilds, {}
+        if not guilds:
+            return
+        self._flushes += 1
+        await asyncio.gather(*(self._flush_guild(guild_id, guild_log) for guild_id, guild_log in guilds.items()))
+
+    async def _flush_guild(self, guild_id: int, guild_log: _GuildLog) -> None:
+        lines = list(guild_log.lines)
+        if guild_log.dropped:
+            lines.append(f"…ほか {guild_log.dropped} 件のログを省略しました。")
+        for message in split_messages(lines):
+            try:
+                await self._send(guild_id, message)
+                self._messages_sent += 1
+            except Exception as e:
+                self._logger.warning(f"ログチャンネルへの送信に失敗しました (guild={guild_id}): {type(e).__name__}: {e}")
+                return
+
+    def stats(self) -> dict:
+        return {
+            "buffered_guilds": len(self._guilds),
+            "buffered_lines": sum(len(guild_log.lines) for guild_log in self._guilds.values()),
+            "appended": self._appended,
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "messages_sent": self._messages_sent,
+        }
@@ -0,0 +1,126 @@
+"""
+イベントループを止めないログ出力。
+
+ロガーには `queue` にレコードを積むだけのハンドラを付け、ファイルやコンソールへの書き込み（フォーマットを含む）は
+`QueueListener` の専用スレッドで行います。大量のログが出てもディスクI/Oがゲートウェイの処理を待たせません。
+
+- キューは上限付きで、満杯のときは待たずにレコードを捨てて件数を数えます（`stats()` / メトリクス）
+- ファイルはサイズでローテーションし、再起動しても以前のログを残します
+- ファイルの形式はテキストか JSON Lines。JSON Lines では ``extra`` で渡した項目（VCのライフサイクルの
+  ``event`` / ``guild_id`` / ``channel_id`` など）をそのまま列として出力します
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+from typing import Iterable
+
+# LogRecord が標準で持つ属性（これ以外は ``extra`` で渡された項目として JSON に出す）
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+FORMATS = ("text", "json")
+TEXT_FORMAT = "[{asctime}] [{levelname:<8}] {name}: {message}"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """1レコードを1行の JSON にします（時刻は UTC の ISO 8601）。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """キューが満杯なら待たずに捨てる `QueueHandler`。"""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数の埋め込みだけはここで行う（引数のオブジェクトが後から変わっても記録時の内容を残すため）。
+        # 同じプロセス内のキューなので、例外情報はそのまま渡してリスナーのスレッドで整形する
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def file_handler(path: str, *, max_bytes: int, backup_count: int, fmt: str = "text") -> logging.Handler:
+    """サイズでローテーションするファイルハンドラ（追記モード）を返します。
+
+    :param path: ログファイルのパス。
+    :param max_bytes: このサイズを超えたらローテーションします（0 でローテーションしない）。
+    :param backup_count: 残す古いファイルの数（``path.1`` 〜 ``path.N``）。
+    :param fmt: ``"text"`` または ``"json"``（JSON Lines）。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"LOG_FORMAT は {' / '.join(FORMATS)} のいずれかです: {fmt!r}")
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max(0, max_bytes), backupCount=max(0, backup_count), encoding="utf-8"
+    )
+    handler.setFormatter(JsonLinesFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT, DATE_FORMAT, style="{"))
+    return handler
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # 停止の合図だけは満杯でも捨てない（リスナーが取り出すので待てば空く）
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    def __init__(self, handlers: Iterable[logging.Handler], *, queue_size: int = 10000) -> None:
+        """
+        :param handlers: リスナーのスレッドで実行するハンドラ（ファイル・コンソールなど）。
+        :param queue_size: キューに溜められるレコード数（超えた分は捨てる）。
+        """
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self._listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+        self._started = False
+
+    def attach(self, *loggers: logging.Logger) -> None:
+        for logger in loggers:
+            logger.addHandler(self.handler)
+
+    def start(self) -> None:
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """キューに残っているレコードを書き出してからリスナーのスレッドを止めます（複数回呼んでもよい）。"""
+        if self._started:
+            self._started = False
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), "dropped": self.handler.dropped}
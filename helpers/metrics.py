@@ -0,0 +1,210 @@
+"""
+Prometheus テキスト形式のメトリクスと、それを公開するローカルHTTPエンドポイント。
+
+外部ライブラリを増やさないよう、必要な種類（ヒストグラム・ゲージ）だけを自前で実装し、
+HTTPサーバーは discord.py が依存している aiohttp を使います。
+エンドポイントは `METRICS_PORT` を設定したときだけ起動します。
+
+- `/metrics` — Prometheus テキスト形式
+- `/healthz` — プロセスが応答できれば 200
+- `/readyz` — ボットがゲートウェイに接続済みで、DBとCogの準備ができていれば 200（それ以外は 503）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+# 秒単位のレイテンシ向け（Discordへの往復を想定して 5ms〜10s）
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    __slots__ = ("name", "documentation", "labelnames", "buckets", "_series")
+
+    def __init__(self, name: str, documentation: str, *, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 -> [各バケットの件数..., 合計, 件数]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {_format_value(count)}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {_format_value(series[-1])}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(series[-1])}"
+
+
+GaugeFunction = Callable[[], "float | Dict[LabelValues, float]"]
+
+
+class Gauge:
+    __slots__ = ("name", "documentation", "labelnames", "_values", "_function")
+
+    def __init__(self, name: str, documentation: str, *, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[GaugeFunction] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(str(labels.get(name, "")) for name in self.labelnames)] = value
+
+    def set_function(self, function: Optional[GaugeFunction]) -> None:
+        """出力時に値を計算する関数を登録します。
+
+        ラベルがないゲージでは数値を、ラベル付きのゲージでは ``{ラベル値のタプル: 値}`` を返します。
+        """
+        self._function = function
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        values = self._values
+        if self._function is not None:
+            result = self._function()
+            values = result if isinstance(result, dict) else {(): result}
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """メトリクスの登録先。同じ名前で再登録すると既存のものを返します（Cogの再読み込みに対応）。"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, "Histogram | Gauge"] = {}
+
+    def histogram(self, name: str, documentation: str, **kwargs) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Histogram(name, documentation, **kwargs)
+        return metric
+
+    def gauge(self, name: str, documentation: str, **kwargs) -> Gauge:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Gauge(name, documentation, **kwargs)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        *,
+        ready: Callable[[], bool],
+        host: str = "127.0.0.1",
+        port: int = 9100,
+        lag_interval: float = 0.5,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param registry: 公開するメトリクス。
+        :param ready: 準備完了かどうかを返す関数（`/readyz` の判定に使います）。
+        :param host: 待ち受けるアドレス。
+        :param port: 待ち受けるポート。
+        :param lag_interval: イベントループの遅延を計測する間隔（秒）。
+        :param logger: 起動・停止の出力先。
+        """
+        self._registry = registry
+        self._ready = ready
+        self._host = host
+        self._port = port
+        self._lag_interval = lag_interval
+        self._logger = logger or logging.getLogger("discord_bot")
+        self._runner: web.AppRunner | None = None
+        self._lag_task: asyncio.Task | None = None
+        self._loop_lag = registry.gauge("event_loop_lag_seconds", "イベントループの遅延（直近の計測値）")
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/healthz", self._healthz)
+        app.router.add_get("/readyz", self._readyz)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        self._lag_task = asyncio.create_task(self._measure_lag())
+        self._logger.info(f"メトリクスを http://{self._host}:{self._port}/metrics で公開しています")
+
+    async def close(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _measure_lag(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self._lag_interval)
+            self._loop_lag.set(max(0.0, time.perf_counter() - started - self._lag_interval))
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self._registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def _healthz(self, request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def _readyz(self, request: web.Request) -> web.Response:
+        if self._ready():
+            return web.Response(text="ready")
+        return web.Response(text="not ready", status=503)
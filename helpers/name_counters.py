@@ -0,0 +1,189 @@
+"""
+VC名の連番（`{count}`）をメモリ上で払い出すカウンタ。
+
+ベースVC単位とギルド単位のカウンタをメモリに持ち、払い出しは同期的に行います（DBアクセスなし）。
+DBには「ここまでは払い出してよい」という予約済みの上限をブロック単位でまとめて書き込み（チェックポイント）、
+クラッシュ後はその上限から再開するため、番号が巻き戻ることはありません（最大で1ブロック分の欠番が出ます）。
+正常終了時は実際の次の番号を書き込み、欠番を出さずに再開します。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Set
+
+# (ベースVC単位, ギルド単位) の ``{id: 保存する値}`` を書き込むコールバック
+CheckpointWriter = Callable[[Dict[int, int], Dict[int, int]], Awaitable[None]]
+
+BASE_START = 1
+GUILD_START = 0
+
+
+class _Counter:
+    __slots__ = ("next", "ceiling", "saved")
+
+    def __init__(self, value: int) -> None:
+        self.next = value
+        # 払い出しを予約済みの上限（この値未満は払い出してよい）
+        self.ceiling = value
+        # DBに保存済みの値
+        self.saved = value
+
+
+class NameCounters:
+    def __init__(
+        self,
+        checkpoint: CheckpointWriter,
+        *,
+        block: int = 100,
+        interval: float = 10.0,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param checkpoint: 予約済みの上限（終了時は次の番号）をDBに書き込むコールバック。
+        :param block: 一度に予約する番号の数。残りが半分を切ったら次のブロックを予約します。
+        :param interval: 定期チェックポイントの間隔（秒）。予約が必要になった場合は待たずに書き込みます。
+        :param logger: 書き込み失敗などの出力先。
+        """
+        self._checkpoint = checkpoint
+        self._block = max(2, block)
+        self._interval = interval
+        self._logger = logger or logging.getLogger("discord_bot")
+        self._base: Dict[int, _Counter] = {}
+        self._guild: Dict[int, _Counter] = {}
+        self._dirty_base: Set[int] = set()
+        self._dirty_guild: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._allocated = 0
+        self._unreserved = 0
+        self._checkpoints = 0
+
+    def load(self, base: Dict[int, int], guild: Dict[int, int]) -> None:
+        """DBの値（予約済みの上限、または正常終了時の次の番号）を読み込み、全カウンタに1ブロックを予約します。
+
+        予約は次の `checkpoint()` で書き込まれるため、呼び出し側は払い出しを始める前に一度 `checkpoint()` を待ってください。
+        """
+        self._base = {base_id: _Counter(value) for base_id, value in base.items()}
+        self._guild = {guild_id: _Counter(value) for guild_id, value in guild.items()}
+        for counters, dirty in ((self._base, self._dirty_base), (self._guild, self._dirty_guild)):
+            for key, counter in counters.items():
+                counter.ceiling = counter.next + self._block
+                dirty.add(key)
+
+    # ---- 払い出し ----
+    def next_base(self, base_channel_id: int) -> int:
+        """ベースVC単位の連番を払い出します（1始まり）。"""
+        return self._allocate(self._base, self._dirty_base, base_channel_id, BASE_START)
+
+    def next_guild(self, guild_id: int) -> int:
+        """ギルド単位の連番を払い出します（0始まり）。"""
+        return self._allocate(self._guild, self._dirty_guild, guild_id, GUILD_START)
+
+    def reset_base(self, base_channel_id: int) -> None:
+        """ベースVCの連番を最初に戻します（そのベース由来の生成VCがすべて消えたとき）。"""
+        counter = self._base.get(base_channel_id)
+        if counter is None:
+            counter = self._base[base_channel_id] = _Counter(BASE_START)
+        counter.next = BASE_START
+        counter.ceiling = BASE_START + self._block
+        self._dirty_base.add(base_channel_id)
+        self._wakeup.set()
+
+    def reserve_base(self, base_channel_id: int) -> None:
+        """新しいベースVCの最初のブロックを予約します（最初の払い出しより前に書き込まれるように）。"""
+        if base_channel_id not in self._base:
+            counter = self._base[base_channel_id] = _Counter(BASE_START)
+            counter.ceiling = BASE_START + self._block
+            self._dirty_base.add(base_channel_id)
+            self._wakeup.set()
+
+    def _allocate(self, counters: Dict[int, _Counter], dirty: Set[int], key: int, start: int) -> int:
+        counter = counters.get(key)
+        if counter is None:
+            counter = counters[key] = _Counter(start)
+        value = counter.next
+        counter.next += 1
+        self._allocated += 1
+        if value >= counter.saved:
+            # 予約の書き込みが追いついていない（新しいキーの最初の番号など）
+            self._unreserved += 1
+        if counter.ceiling - counter.next < self._block // 2:
+            counter.ceiling = counter.next + self._block
+            dirty.add(key)
+            self._wakeup.set()
+        return value
+
+    # ---- チェックポイント ----
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """ループを止め、実際の次の番号を書き込みます（正常終了時は欠番を出さない）。"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        async with self._lock:
+            base = {key: counter.next for key, counter in self._base.items() if counter.saved != counter.next}
+            guild = {key: counter.next for key, counter in self._guild.items() if counter.saved != counter.next}
+            if not base and not guild:
+                return
+            await self._checkpoint(base, guild)
+            for key, value in base.items():
+                self._base[key].saved = self._base[key].ceiling = value
+            for key, value in guild.items():
+                self._guild[key].saved = self._guild[key].ceiling = value
+            self._dirty_base.clear()
+            self._dirty_guild.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                self._logger.error(f"連番のチェックポイントに失敗しました: {type(e).__name__}: {e}")
+                await asyncio.sleep(self._interval)
+
+    async def checkpoint(self) -> None:
+        """予約済みの上限が変わったカウンタをまとめて書き込みます。"""
+        async with self._lock:
+            if not self._dirty_base and not self._dirty_guild:
+                return
+            base_keys, self._dirty_base = self._dirty_base, set()
+            guild_keys, self._dirty_guild = self._dirty_guild, set()
+            base = {key: self._base[key].ceiling for key in base_keys}
+            guild = {key: self._guild[key].ceiling for key in guild_keys}
+            try:
+                await self._checkpoint(base, guild)
+            except Exception:
+                # 次回に書き直す
+                self._dirty_base |= base_keys
+                self._dirty_guild |= guild_keys
+                raise
+            for key, value in base.items():
+                self._base[key].saved = value
+            for key, value in guild.items():
+                self._guild[key].saved = value
+            self._checkpoints += 1
+
+    def stats(self) -> dict:
+        return {
+            "base_counters": len(self._base),
+            "guild_counters": len(self._guild),
+            "allocated": self._allocated,
+            "unreserved": self._unreserved,
+            "checkpoints": self._checkpoints,
+            "pending": len(self._dirty_base) + len(self._dirty_guild),
+        }
@@ -0,0 +1,207 @@
+"""
+VC名テンプレートのコンパイルと描画。
+
+テンプレートは保存時に一度だけ「文字列リテラル / トークン」の列へコンパイルし、
+複製のたびには1回の走査で連結するだけにします（DBアクセスや `str.replace` の連鎖は行いません）。
+未知のトークンは保存時に `TemplateError` として拒否します。
+
+トークンを追加するには `register_token` で描画関数を登録します。
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Discordのチャンネル名の上限（文字数）
+NAME_LIMIT = 100
+# 描画結果が空になった場合の名前
+FALLBACK_NAME = "VC"
+
+_TOKEN = re.compile(r"\{([^{}]*)\}")
+
+
+class TemplateError(ValueError):
+    """テンプレートに未知のトークンが含まれているなど、保存できない場合に送出されます。"""
+
+
+class NameContext:
+    """テンプレートの描画に使う値。"""
+
+    __slots__ = ("user", "count", "base_name")
+
+    def __init__(self, user: object, count: int, base_name: str = "") -> None:
+        """
+        :param user: 生成をトリガーしたユーザー（`name` / `display_name` を参照します）。
+        :param count: 連番。
+        :param base_name: ベースVCの名前。
+        """
+        self.user = user
+        self.count = count
+        self.base_name = base_name
+
+
+class _Token:
+    __slots__ = ("name", "render", "shrinkable")
+
+    def __init__(self, name: str, render: Callable[[NameContext], str], shrinkable: bool) -> None:
+        self.name = name
+        self.render = render
+        self.shrinkable = shrinkable
+
+
+_TOKENS: Dict[str, _Token] = {}
+
+
+def register_token(name: str, render: Callable[[NameContext], str], *, shrinkable: bool = False) -> None:
+    """テンプレートで使えるトークンを登録します。
+
+    :param name: トークン名（テンプレート中では ``{name}`` と書きます）。
+    :param render: 値を返す関数。
+    :param shrinkable: 名前が上限を超えるとき、この値を優先して短縮するかどうか（ユーザー名など可変長の値）。
+    """
+    _TOKENS[name] = _Token(name, render, shrinkable)
+
+
+def available_tokens() -> List[str]:
+    return list(_TOKENS)
+
+
+register_token("user_name", lambda context: getattr(context.user, "name", ""), shrinkable=True)
+register_token(
+    "display_name",
+    lambda context: getattr(context.user, "display_name", None) or getattr(context.user, "name", ""),
+    shrinkable=True,
+)
+register_token("base_name", lambda context: context.base_name, shrinkable=True)
+register_token("count", lambda context: str(context.count))
+
+Part = Union[str, _Token]
+
+
+def _trim(text: str, length: int) -> str:
+    """``length`` 文字以内に切り詰めます。結合文字や異体字セレクタ・ZWJ が末尾に取り残されないようにします。"""
+    if len(text) <= length:
+        return text
+    text = text[: max(0, length)]
+    while text and (unicodedata.combining(text[-1]) or text[-1] in "‍︎️"):
+        text = text[:-1]
+    return text
+
+
+class CompiledTemplate:
+    __slots__ = ("source", "parts", "_shrinkable")
+
+    def __init__(self, source: str, parts: Tuple[Part, ...]) -> None:
+        self.source = source
+        self.parts = parts
+        self._shrinkable = any(isinstance(part, _Token) and part.shrinkable for part in parts)
+
+    def render(self, context: NameContext, *, limit: int = NAME_LIMIT) -> str:
+        """名前を描画します。上限を超える場合はユーザー名などの可変長の値を優先して短縮します。"""
+        pieces: List[str] = []
+        for part in self.parts:
+            pieces.append(part if isinstance(part, str) else part.render(context))
+        name = "".join(pieces)
+        if len(name) > limit and self._shrinkable:
+            name = self._shrink(pieces, len(name) - limit)
+        name = _trim(name, limit).strip()
+        return name or FALLBACK_NAME
+
+    def _shrink(self, pieces: List[str], overflow: int) -> str:
+        # 長い値から順に「…」付きで短縮し、連番や固定文字列はできるだけ残す
+        indexes = sorted(
+            (i for i, part in enumerate(self.parts) if isinstance(part, _Token) and part.shrinkable),
+            key=lambda i: len(pieces[i]),
+            reverse=True,
+        )
+        for i in indexes:
+            if overflow <= 0:
+                break
+            piece = pieces[i]
+            keep = len(piece) - overflow - 1
+            if keep < 1:
+                overflow -= len(piece) - 1
+                pieces[i] = "…" if piece else ""
+            else:
+                trimmed = _trim(piece, keep)
+                overflow -= len(piece) - len(trimmed) - 1
+                pieces[i] = trimmed + "…"
+        return "".join(pieces)
+
+    def __repr__(self) -> str:
+        return f"<CompiledTemplate {self.source!r}>"
+
+
+def compile_template(source: str, *, strict: bool = True) -> CompiledTemplate:
+    """テンプレートをコンパイルします。
+
+    :param source: テンプレート文字列（例: ``"{user_name}の部屋 #{count}"``）。
+    :param strict: ``True`` の場合、未知のトークンで `TemplateError` を送出します。
+        ``False`` の場合は文字列としてそのまま残します（検証導入前に保存されたテンプレート用）。
+    :return: コンパイル済みのテンプレート。
+    """
+    parts: List[Part] = []
+    unknown: List[str] = []
+    position = 0
+    for match in _TOKEN.finditer(source):
+        if match.start() > position:
+            parts.append(source[position : match.start()])
+        token = _TOKENS.get(match.group(1).strip())
+        if token is None:
+            unknown.append(match.group(0))
+            parts.append(match.group(0))
+        else:
+            parts.append(token)
+        position = match.end()
+    if position < len(source):
+        parts.append(source[position:])
+    if unknown and strict:
+        tokens = ", ".join(f"{{{name}}}" for name in _TOKENS)
+        raise TemplateError(f"未知のトークンがあります: {', '.join(unknown)}（使用可能: {tokens}）")
+    # 隣り合う文字列リテラルはまとめておく
+    merged: List[Part] = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+    return CompiledTemplate(source, tuple(merged))
+
+
+class TemplateCache:
+    """コンパイル済みテンプレートをベースVC単位・ギルド単位で保持します。"""
+
+    def __init__(self) -> None:
+        self._base: Dict[int, CompiledTemplate] = {}
+        self._guild: Dict[int, CompiledTemplate] = {}
+
+    def load_base(self, templates: Dict[int, str]) -> None:
+        self._base = {
+            base_channel_id: compile_template(template, strict=False)
+            for base_channel_id, template in templates.items()
+            if template
+        }
+
+    def set_base(self, base_channel_id: int, compiled: Optional[CompiledTemplate]) -> None:
+        if compiled is None:
+            self._base.pop(base_channel_id, None)
+        else:
+            self._base[base_channel_id] = compiled
+
+    def get_base(self, base_channel_id: int) -> Optional[CompiledTemplate]:
+        return self._base.get(base_channel_id)
+
+    def get_guild(self, guild_id: int, source: str) -> CompiledTemplate:
+        """ギルド既定テンプレートのコンパイル結果を返します（文字列が変わっていれば作り直します）。"""
+        compiled = self._guild.get(guild_id)
+        if compiled is None or compiled.source != source:
+            compiled = self._guild[guild_id] = compile_template(source, strict=False)
+        return compiled
+
+    def discard_guild(self, guild_id: int) -> None:
+        self._guild.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        return {"base_templates": len(self._base), "guild_templates": len(self._guild)}
@@ -0,0 +1,277 @@
+"""
+DiscordのREST呼び出し（作成・移動・削除・ログ送信）の優先度付きスケジューラ。
+
+すべての副作用をここに通し、同じレート制限枠を取り合うときは
+移動 > 作成 > 削除 > ログ の順で実行します。同じ優先度の中ではギルドを順番に回し、
+1つの混雑したギルドが他のギルドを待たせ続けないようにします。
+全体の送信ペースはトークンバケットで抑えます。429 を受けたら、グローバルの制限なら `Retry-After` の間すべての送信を止め、
+ルート（チャンネルなど）単位の制限ならその呼び出しだけを `Retry-After` の後に積み直して、他の呼び出しは止めません。
+discord.py が呼び出しの中で長く待たないよう、クライアントには ``max_ratelimit_timeout`` を渡しておきます（`bot.py`）。
+
+呼び出しは引数なしのコルーチン関数として渡すため、実際の `discord.py` の代わりに
+429 を返す偽のHTTP層を渡して検証できます。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import discord
+
+PRIORITY_MOVE = 0
+PRIORITY_CREATE = 1
+PRIORITY_DELETE = 2
+PRIORITY_LOG = 3
+PRIORITY_NAMES = ("move", "create", "delete", "log")
+
+RestCall = Callable[[], Awaitable[Any]]
+
+
+class _Action:
+    __slots__ = ("guild_id", "call", "future", "enqueued_at", "attempts")
+
+    def __init__(self, guild_id: int, call: RestCall, future: asyncio.Future) -> None:
+        self.guild_id = guild_id
+        self.call = call
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class _ClassStats:
+    __slots__ = ("completed", "failed", "wait_total", "wait_max")
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+def _rate_limit(exc: BaseException) -> Optional[tuple[float, bool]]:
+    """429 を表す例外なら ``(待機秒数, 全体の制限かどうか)`` を返します（それ以外は ``None``）。
+
+    - `discord.RateLimited` — ``max_ratelimit_timeout`` より長いルート単位の制限（discord.py はグローバル制限では送出しない）
+    - status が 429 の例外 — ``X-RateLimit-Global`` / ``X-RateLimit-Scope: global`` ヘッダ
+      （または例外の ``is_global`` 属性）で全体の制限かどうかを判定する
+    """
+    if isinstance(exc, discord.RateLimited):
+        return max(0.0, float(exc.retry_after)), False
+    if getattr(exc, "status", None) != 429:
+        return None
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is None:
+        try:
+            retry_after = float(headers.get("Retry-After", 1.0))
+        except (TypeError, ValueError):
+            retry_after = 1.0
+    is_global = bool(getattr(exc, "is_global", False))
+    if str(headers.get("X-RateLimit-Global", "")).lower() == "true" or headers.get("X-RateLimit-Scope") == "global":
+        is_global = True
+    return max(0.0, float(retry_after)), is_global
+
+
+class RestScheduler:
+    def __init__(
+        self,
+        *,
+        workers: int = 4,
+        rate: float = 40.0,
+        max_retries: int = 3,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        """
+        :param workers: 同時に実行するREST呼び出しの数。
+        :param rate: 全体の送信ペースの上限（リクエスト/秒）。Discordのグローバル上限より少し低めにします。
+        :param max_retries: 429 を受けたときに再試行する回数。
+        :param logger: 再試行などの出力先。
+        """
+        self._workers = max(1, workers)
+        self._rate = max(0.1, rate)
+        self._max_retries = max(0, max_retries)
+        self._logger = logger or logging.getLogger("discord_bot")
+        # 優先度ごとに guild_id -> 待ち行列（ギルド間はラウンドロビン）
+        self._queues: List[OrderedDict[int, Deque[_Action]]] = [OrderedDict() for _ in PRIORITY_NAMES]
+        self._depth = [0] * len(PRIORITY_NAMES)
+        self._stats = [_ClassStats() for _ in PRIORITY_NAMES]
+        self._available = asyncio.Condition()
+        self._tasks: List[asyncio.Task] = []
+        # トークンバケットと 429 による全体停止
+        self._tokens = self._rate
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._bucket_lock = asyncio.Lock()
+        self._rate_limited = 0
+        self._global_rate_limited = 0
+        # ルート単位の制限で再試行を待っている呼び出し（待機タスク -> 呼び出し）
+        self._delayed: Dict[asyncio.Task, _Action] = {}
+
+    # ---- 投入 ----
+    async def submit(self, guild_id: int, priority: int, call: RestCall) -> Any:
+        """REST呼び出しを積み、実行結果（または例外）を返します。"""
+        future = asyncio.get_running_loop().create_future()
+        self._push(priority, _Action(guild_id, call, future))
+        async with self._available:
+            self._available.notify()
+        return await future
+
+    def _push(self, priority: int, action: _Action, *, front: bool = False) -> None:
+        queues = self._queues[priority]
+        queue = queues.get(action.guild_id)
+        if queue is None:
+            queue = queues[action.guild_id] = deque()
+        if front:
+            queue.appendleft(action)
+        else:
+            queue.append(action)
+        self._depth[priority] += 1
+
+    def _pop(self) -> Optional[tuple[int, _Action]]:
+        for priority, queues in enumerate(self._queues):
+            if not queues:
+                continue
+            guild_id, queue = next(iter(queues.items()))
+            action = queue.popleft()
+            # 取り出したギルドは末尾へ回す（空になったら外す）
+            del queues[guild_id]
+            if queue:
+                queues[guild_id] = queue
+            self._depth[priority] -= 1
+            return priority, action
+        return None
+
+    # ---- 実行 ----
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for task, action in list(self._delayed.items()):
+            task.cancel()
+            if not action.future.done():
+                action.future.cancel()
+        self._delayed.clear()
+        for queues in self._queues:
+            for queue in queues.values():
+                for action in queue:
+                    if not action.future.done():
+                        action.future.cancel()
+            queues.clear()
+        self._depth = [0] * len(PRIORITY_NAMES)
+
+    async def _acquire_token(self) -> None:
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self._rate, self._tokens + (now - self._refilled_at) * self._rate)
+                self._refilled_at = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self._rate)
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._available:
+                item = self._pop()
+                while item is None:
+                    await self._available.wait()
+                    item = self._pop()
+            priority, action = item
+            if action.future.done():
+                # 呼び出し側がキャンセル済み
+                continue
+            await self._acquire_token()
+            stats = self._stats[priority]
+            if action.attempts == 0:
+                waited = time.monotonic() - action.enqueued_at
+                stats.wait_total += waited
+                stats.wait_max = max(stats.wait_max, waited)
+            action.attempts += 1
+            try:
+                result = await action.call()
+            except asyncio.CancelledError:
+                if not action.future.done():
+                    action.future.cancel()
+                raise
+            except Exception as e:
+                limit = _rate_limit(e)
+                if limit is not None and action.attempts <= self._max_retries:
+                    retry_after, is_global = limit
+                    self._rate_limited += 1
+                    if is_global:
+                        # 全体の制限: すべての送信を止め、この呼び出しは先頭に戻す
+                        self._global_rate_limited += 1
+                        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                        self._logger.warning(
+                            f"REST呼び出しがグローバルにレート制限されました（{PRIORITY_NAMES[priority]}、{retry_after:.2f} 秒間すべて停止）"
+                        )
+                        self._push(priority, action, front=True)
+                        async with self._available:
+                            self._available.notify()
+                    else:
+                        # ルート単位の制限: この呼び出しだけを後で積み直す（ワーカーは次の呼び出しへ）
+                        self._logger.warning(
+                            f"REST呼び出しがレート制限されました（{PRIORITY_NAMES[priority]}、{retry_after:.2f} 秒後に再試行）"
+                        )
+                        self._retry_later(priority, action, retry_after)
+                    continue
+                stats.failed += 1
+                if not action.future.done():
+                    action.future.set_exception(e)
+                continue
+            stats.completed += 1
+            if not action.future.done():
+                action.future.set_result(result)
+
+    def _retry_later(self, priority: int, action: _Action, delay: float) -> None:
+        async def requeue() -> None:
+            await asyncio.sleep(delay)
+            self._delayed.pop(task, None)
+            if action.future.done():
+                return
+            self._push(priority, action, front=True)
+            async with self._available:
+                self._available.notify()
+
+        task = asyncio.create_task(requeue())
+        self._delayed[task] = action
+
+    def stats(self) -> dict:
+        classes: Dict[str, dict] = {}
+        for priority, name in enumerate(PRIORITY_NAMES):
+            stats = self._stats[priority]
+            classes[name] = {
+                "depth": self._depth[priority],
+                "completed": stats.completed,
+                "failed": stats.failed,
+                "wait_avg_ms": round(stats.wait_total / (stats.completed + stats.failed) * 1000, 1)
+                if stats.completed + stats.failed
+                else 0.0,
+                "wait_max_ms": round(stats.wait_max * 1000, 1),
+            }
+        return {
+            "rate_per_second": self._rate,
+            "rate_limited": self._rate_limited,
+            "global_rate_limited": self._global_rate_limited,
+            "delayed": len(self._delayed),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "classes": classes,
+        }
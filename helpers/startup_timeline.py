@@ -0,0 +1,57 @@
+"""
+起動のタイムライン（フェーズごとの開始時刻と所要時間）の記録。
+
+フェーズは並行して走ることがあるため、所要時間の合計ではなく「プロセス起動からの開始・終了時刻」で記録します。
+最初の `on_voice_state_update` を処理できるまでの時間（再起動後にユーザーを待たせる時間）を詰めるための計測です。
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class StartupTimeline:
+    def __init__(self, started: Optional[float] = None) -> None:
+        """
+        :param started: 起点となる `time.monotonic()` の値（省略時は生成した時刻）。
+        """
+        self.started = time.monotonic() if started is None else started
+        # (名前, 開始, 終了)。時刻は起点からの秒数
+        self._phases: List[Tuple[str, float, float]] = []
+        self._marks: Dict[str, float] = {}
+
+    def _now(self) -> float:
+        return time.monotonic() - self.started
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """``with`` ブロック（``await`` を含んでもよい）の開始・終了時刻をフェーズとして記録します。"""
+        start = self._now()
+        try:
+            yield
+        finally:
+            self._phases.append((name, start, self._now()))
+
+    def mark(self, name: str) -> bool:
+        """一度きりの出来事（準備完了など）の時刻を記録します。すでに記録済みなら何もせず ``False`` を返します。"""
+        if name in self._marks:
+            return False
+        self._marks[name] = self._now()
+        return True
+
+    def durations(self) -> Dict[str, float]:
+        """フェーズごとの所要時間（秒）。"""
+        return {name: end - start for name, start, end in self._phases}
+
+    def marks(self) -> Dict[str, float]:
+        """記録した出来事の、起点からの時刻（秒）。"""
+        return dict(self._marks)
+
+    def format(self) -> str:
+        """開始時刻の順に並べた、ログ向けの複数行のタイムラインを返します。"""
+        width = max((len(name) for name in [*self.durations(), *self._marks]), default=0)
+        entries = [(start, f"{start:7.3f}s  {name:<{width}}  {end - start:7.3f}s") for name, start, end in self._phases]
+        entries += [(at, f"{at:7.3f}s  {name:<{width}}  ●") for name, at in self._marks.items()]
+        return "\n".join(line for _, line in sorted(entries, key=lambda entry: entry[0]))
@@ -0,0 +1,170 @@
+"""
+ベースVC / 自動生成VC のインメモリ索引。
+
+`on_voice_state_update` のホットパスでは、ほとんどのイベントがBotの管理外チャンネルに対するものです。
+起動時にDBから一度だけ読み込み、以降は作成・削除のたびに更新することで、
+「管理対象か？」の判定をDBアクセスなしの集合検索で行えるようにします。
+
+ギルド単位・ベースVC単位の稼働数も保持し、`max_channels` の上限判定は `reserve()` で枠を確保してから複製します。
+確保は await を挟まない同期処理なので、同時に大量の入室があっても上限を超えません。
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+
+class GeneratedChannel:
+    """自動生成VC 1件分のメタデータ（数万件でも小さく保つため `__slots__` を使用）。"""
+
+    __slots__ = ("guild_id", "base_channel_id")
+
+    def __init__(self, guild_id: int, base_channel_id: int) -> None:
+        self.guild_id = guild_id
+        self.base_channel_id = base_channel_id
+
+
+class VoiceChannelIndex:
+    """ベースVCのID集合と、稼働中（未削除）の生成VCの対応表を保持します。"""
+
+    __slots__ = ("_base", "_generated", "_per_base", "_per_guild", "_reserved_base", "_reserved_guild", "_rejected")
+
+    def __init__(self) -> None:
+        self._base: Set[int] = set()
+        self._generated: Dict[int, GeneratedChannel] = {}
+        # base_channel_id -> 稼働中の生成VC数
+        self._per_base: Counter[int] = Counter()
+        # guild_id -> 稼働中の生成VC数
+        self._per_guild: Counter[int] = Counter()
+        # 複製中（枠を確保済みでまだ登録されていない）の数
+        self._reserved_base: Counter[int] = Counter()
+        self._reserved_guild: Counter[int] = Counter()
+        self._rejected = 0
+
+    def load(
+        self,
+        base_channel_ids: Iterable[int],
+        generated_rows: Iterable[Tuple[int, int, int]],
+    ) -> None:
+        """DBの内容で索引を作り直します。
+
+        :param base_channel_ids: `vc_base_channels` のチャンネルID一覧。
+        :param generated_rows: `deleted_at IS NULL` の生成VC `(channel_id, guild_id, base_channel_id)` 一覧。
+        """
+        self._base = set(base_channel_ids)
+        self._generated = {
+            channel_id: GeneratedChannel(guild_id, base_channel_id)
+            for channel_id, guild_id, base_channel_id in generated_rows
+        }
+        self._per_base = Counter(record.base_channel_id for record in self._generated.values())
+        self._per_guild = Counter(record.guild_id for record in self._generated.values())
+
+    # ---- ベースVC ----
+    def add_base(self, channel_id: int) -> None:
+        self._base.add(channel_id)
+
+    def is_base(self, channel_id: int) -> bool:
+        return channel_id in self._base
+
+    # ---- 生成VC ----
+    def add_generated(self, channel_id: int, guild_id: int, base_channel_id: int) -> None:
+        self.discard_generated(channel_id)
+        self._generated[channel_id] = GeneratedChannel(guild_id, base_channel_id)
+        self._per_base[base_channel_id] += 1
+        self._per_guild[guild_id] += 1
+
+    def discard_generated(self, channel_id: int) -> Optional[GeneratedChannel]:
+        """生成VCを索引から外し、外したレコード（なければ ``None``）を返します。"""
+        record = self._generated.pop(channel_id, None)
+        if record is not None:
+            _decrement(self._per_base, record.base_channel_id)
+            _decrement(self._per_guild, record.guild_id)
+        return record
+
+    def is_generated(self, channel_id: int) -> bool:
+        return channel_id in self._generated
+
+    def get_generated(self, channel_id: int) -> Optional[GeneratedChannel]:
+        return self._generated.get(channel_id)
+
+    def generated_items(self) -> Iterable[Tuple[int, GeneratedChannel]]:
+        return self._generated.items()
+
+    def count_for_base(self, base_channel_id: int) -> int:
+        """ベースVC由来の生成VC数（稼働中＋複製中）を返します。"""
+        return self._per_base.get(base_channel_id, 0) + self._reserved_base.get(base_channel_id, 0)
+
+    def count_for_guild(self, guild_id: int) -> int:
+        """ギルドの生成VC数（稼働中＋複製中）を返します。"""
+        return self._per_guild.get(guild_id, 0) + self._reserved_guild.get(guild_id, 0)
+
+    def count_by_guild(self) -> Dict[int, int]:
+        """ギルドごとの稼働中の生成VC数を返します。"""
+        return dict(self._per_guild)
+
+    # ---- 上限の枠 ----
+    def reserve(self, guild_id: int, base_channel_id: int, limit: int) -> Optional["SlotReservation"]:
+        """ギルドの生成VC数が ``limit`` 未満なら1枠確保して返し、上限に達していれば ``None`` を返します。
+
+        確保した枠は、複製に成功したら `SlotReservation.commit()` で生成VCとして登録し、
+        失敗したら `SlotReservation.release()` で戻します（``with`` で使うと、登録しなかった枠は自動で戻ります）。
+        """
+        if self.count_for_guild(guild_id) >= limit:
+            self._rejected += 1
+            return None
+        self._reserved_guild[guild_id] += 1
+        self._reserved_base[base_channel_id] += 1
+        return SlotReservation(self, guild_id, base_channel_id)
+
+    def _unreserve(self, guild_id: int, base_channel_id: int) -> None:
+        _decrement(self._reserved_guild, guild_id)
+        _decrement(self._reserved_base, base_channel_id)
+
+    def is_managed(self, channel_id: int) -> bool:
+        return channel_id in self._base or channel_id in self._generated
+
+    def stats(self) -> dict:
+        return {
+            "base_channels": len(self._base),
+            "generated_channels": len(self._generated),
+            "reserved_slots": sum(self._reserved_guild.values()),
+            "rejected_by_limit": self._rejected,
+        }
+
+
+class SlotReservation:
+    """`VoiceChannelIndex.reserve()` で確保した1枠。"""
+
+    __slots__ = ("_index", "guild_id", "base_channel_id", "_open")
+
+    def __init__(self, index: VoiceChannelIndex, guild_id: int, base_channel_id: int) -> None:
+        self._index = index
+        self.guild_id = guild_id
+        self.base_channel_id = base_channel_id
+        self._open = True
+
+    def commit(self, channel_id: int) -> None:
+        """枠を作成済みの生成VCとして登録します。"""
+        if self._open:
+            self._open = False
+            self._index._unreserve(self.guild_id, self.base_channel_id)
+        self._index.add_generated(channel_id, self.guild_id, self.base_channel_id)
+
+    def release(self) -> None:
+        """複製しなかった枠を戻します（2回目以降や `commit()` 後は何もしません）。"""
+        if self._open:
+            self._open = False
+            self._index._unreserve(self.guild_id, self.base_channel_id)
+
+    def __enter__(self) -> "SlotReservation":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+def _decrement(counter: Counter, key: int) -> None:
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
@@ -0,0 +1,345 @@
+"""
+クラスタモードのランチャー。
+
+シャードを複数のプロセス（クラスタ）に分けて `bot.py` を起動し、異常終了したプロセスを再起動します。
+各プロセスは `AutoShardedBot` として担当シャードだけに接続し、自分のシャードのギルドだけを持つ専用の SQLite ファイルを使います
+（別プロセスの書き込みが同じファイルのロックを取り合わないように）。
+
+IDENTIFY は `helpers/identify_gate.py` のロックファイルでプロセスをまたいで順番を待ち、
+``max_concurrency`` のバケットごとに 5 秒に 1 回を守ります。
+
+クラスタ用のDBは割り当てごとに別のファイルになるため、使っている割り当てを各DBの `bot_state` に記録します。
+シャード数・クラスタ数を指定しなければ記録済みの割り当てをそのまま使い、指定した割り当てが記録と異なる場合は
+``--repartition`` を付けない限り起動しません（付けた場合は既存のクラスタ用DBすべてから新しい割り当てに行を移し替えます）。
+
+使い方:
+    python launcher.py [--repartition]
+
+環境変数（`bot.py` の環境変数に加えて）:
+- `SHARD_COUNT` — 全体のシャード数（省略時は記録済みの値、初回は Discord の推奨値）
+- `CLUSTER_COUNT` — プロセス数（省略時は記録済みの割り当て、初回は 1。シャード数を超えない）
+- `CLUSTER_SHARDS` — プロセスごとのシャードの明示的な割り当て（例: ``0-3;4-7``）
+- `METRICS_PORT` — 設定するとプロセス i はポート ``METRICS_PORT + i`` でメトリクスを公開
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+import urllib.request
+
+from dotenv import load_dotenv
+
+from database import DatabaseManager, open_connection, seed_shard_database
+from helpers.cluster import (
+    build_layout,
+    cluster_database_name,
+    format_layout,
+    format_shard_ids,
+    parse_cluster_database_name,
+)
+
+load_dotenv()
+
+ROOT = os.path.realpath(os.path.dirname(__file__))
+DATABASE_DIR = os.path.join(ROOT, "database")
+SINGLE_DATABASE = os.path.join(DATABASE_DIR, "database.db")
+# 各クラスタ用DBの `bot_state` に記録する担当（{"shard_count": N, "shard_ids": [...]}）
+LAYOUT_STATE_KEY = "cluster_layout"
+
+# この時間以上動いていたプロセスが終了した場合は、再起動の待ち時間を最初に戻す
+HEALTHY_RUNTIME = 60.0
+MAX_BACKOFF = 60.0
+
+logger = logging.getLogger("launcher")
+logger.setLevel(logging.INFO)
+_handler = logging.StreamHandler()
+_handler.setFormatter(
+    logging.Formatter("[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{")
+)
+logger.addHandler(_handler)
+
+
+def fetch_gateway(token: str) -> dict:
+    """`GET /gateway/bot` で推奨シャード数とセッション開始の制限を取得します。"""
+    request = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (launcher)"},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+
+class Cluster:
+    def __init__(self, index: int, shard_ids: list[int], env: dict[str, str]) -> None:
+        self.index = index
+        self.shard_ids = shard_ids
+        self.env = env
+        self.process: asyncio.subprocess.Process | None = None
+        self.restarts = 0
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        """プロセスを起動し、異常終了したら待ち時間を倍にしながら再起動します（正常終了なら再起動しません）。"""
+        backoff = 1.0
+        while not stopping.is_set():
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(ROOT, "bot.py"), cwd=ROOT, env=self.env
+            )
+            logger.info(
+                f"クラスタ {self.index}（シャード {format_shard_ids(self.shard_ids)}）を起動しました (PID {self.process.pid})"
+            )
+            code = await self.process.wait()
+            if stopping.is_set():
+                return
+            if code == 0:
+                logger.info(f"クラスタ {self.index} が正常終了しました")
+                return
+            if time.monotonic() - started >= HEALTHY_RUNTIME:
+                backoff = 1.0
+            self.restarts += 1
+            logger.warning(f"クラスタ {self.index} が終了しました (終了コード {code})。{backoff:.0f} 秒後に再起動します")
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"クラスタ {self.index} が終了しないため強制終了します")
+            process.kill()
+            await process.wait()
+
+
+async def read_cluster_databases() -> dict[str, tuple[int, list[int]]]:
+    """既存のクラスタ用DBを最新のスキーマにし、それぞれに記録された ``(シャード数, 担当シャード)`` を返します。
+
+    担当を記録する前に作られたファイルは、ファイル名の担当シャードとシャード数を使います。
+    """
+    found: dict[str, tuple[int, list[int]]] = {}
+    for name in sorted(os.listdir(DATABASE_DIR)):
+        parsed = parse_cluster_database_name(name)
+        if parsed is None:
+            continue
+        path = os.path.join(DATABASE_DIR, name)
+        database = DatabaseManager(connection=await open_connection(path))
+        try:
+            await database.migrate()
+            recorded = await database.get_bot_state(LAYOUT_STATE_KEY)
+        finally:
+            await database.close()
+        if recorded:
+            state = json.loads(recorded)
+            found[path] = (int(state["shard_count"]), [int(shard_id) for shard_id in state["shard_ids"]])
+        else:
+            shard_ids, shard_count = parsed
+            found[path] = (shard_count, shard_ids)
+    return found
+
+
+def recorded_layout(found: dict[str, tuple[int, list[int]]]) -> tuple[int, list[list[int]]] | None:
+    """既存のクラスタ用DBが表す ``(シャード数, 割り当て)``。
+
+    シャード数が食い違う、または全シャードを重複なく覆っていない場合は ``None`` を返します。
+    """
+    if not found:
+        return None
+    shard_counts = {shard_count for shard_count, _ in found.values()}
+    if len(shard_counts) != 1:
+        return None
+    shard_count = shard_counts.pop()
+    layout = sorted((shard_ids for _, shard_ids in found.values()), key=lambda shard_ids: shard_ids[0])
+    if sorted(shard_id for shard_ids in layout for shard_id in shard_ids) != list(range(shard_count)):
+        return None
+    return shard_count, layout
+
+
+def same_layout(a: list[list[int]], b: list[list[int]]) -> bool:
+    """クラスタの順番を除いて同じ割り当てかどうか（DBファイルの対応は担当シャードだけで決まる）。"""
+    return sorted(map(tuple, a)) == sorted(map(tuple, b))
+
+
+async def record_layout(path: str, shard_ids: list[int], shard_count: int) -> None:
+    """クラスタ用DBに担当シャードを記録します（なければ最新のスキーマで作成）。"""
+    database = DatabaseManager(connection=await open_connection(path))
+    try:
+        await database.migrate()
+        await database.set_bot_state(LAYOUT_STATE_KEY, json.dumps({"shard_count": shard_count, "shard_ids": shard_ids}))
+    finally:
+        await database.close()
+
+
+async def prepare_database(path: str, shard_ids: list[int], shard_count: int) -> None:
+    """クラスタ用のDBがなければ、単一プロセス用のDBから担当シャードのギルドの行をコピーして作ります。"""
+    if os.path.exists(path):
+        return
+    if not os.path.exists(SINGLE_DATABASE):
+        return
+    copied = await seed_shard_database([SINGLE_DATABASE], path, shard_ids, shard_count)
+    logger.info(f"{os.path.basename(path)} を作成しました（{', '.join(f'{t}: {n}' for t, n in copied.items())}）")
+
+
+async def repartition(sources: list[str], layout: list[list[int]], shard_count: int) -> None:
+    """以前の割り当てのクラスタ用DBすべてから、新しい割り当てのDBに行を移し替えます。
+
+    新しいDBは一時ファイルに作ってから、元のファイルを `database/repartitioned-<時刻>/` に退避して置き換えます
+    （ファイル名が同じ割り当てがあっても上書きしない。退避したファイルは確認後に手動で削除してください）。
+    """
+    staged: list[tuple[str, str]] = []
+    for shard_ids in layout:
+        path = os.path.join(DATABASE_DIR, cluster_database_name(shard_ids, shard_count))
+        temporary = f"{path}.repartition"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(temporary + suffix):
+                os.remove(temporary + suffix)
+        copied = await seed_shard_database(sources, temporary, shard_ids, shard_count)
+        logger.info(f"{os.path.basename(path)} に移し替えました（{', '.join(f'{t}: {n}' for t, n in copied.items())}）")
+        staged.append((temporary, path))
+    backup_dir = os.path.join(DATABASE_DIR, f"repartitioned-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(backup_dir, exist_ok=True)
+    for source in sources:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(source + suffix):
+                os.replace(source + suffix, os.path.join(backup_dir, os.path.basename(source) + suffix))
+    for temporary, path in staged:
+        os.replace(temporary, path)
+    logger.info(f"以前のクラスタ用DB {len(sources)} 個を {os.path.relpath(backup_dir, ROOT)} に退避しました")
+
+
+async def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="シャードを複数プロセスに分けてボットを起動します")
+    parser.add_argument(
+        "--repartition",
+        action="store_true",
+        help="シャード数・割り当てが既存のクラスタ用DBの記録と異なる場合に、既存のDBから行を移し替えて起動する",
+    )
+    args = parser.parse_args(argv)
+
+    found = await read_cluster_databases()
+    previous = recorded_layout(found)
+
+    token = os.getenv("TOKEN", "")
+    shard_count = int(os.getenv("SHARD_COUNT", "0"))
+    if not shard_count and previous is not None:
+        # 推奨値が変わってもDBの割り当ては変えない（変えるときは SHARD_COUNT と --repartition を指定する）
+        shard_count = previous[0]
+    max_concurrency = int(os.getenv("MAX_CONCURRENCY", "0"))
+    if token and (not shard_count or not max_concurrency):
+        try:
+            gateway = await asyncio.to_thread(fetch_gateway, token)
+        except Exception as e:
+            logger.warning(f"ゲートウェイ情報を取得できませんでした: {e}")
+        else:
+            limit = gateway.get("session_start_limit", {})
+            recommended = int(gateway.get("shards", 1))
+            if shard_count and not os.getenv("SHARD_COUNT") and recommended > shard_count:
+                logger.warning(
+                    f"推奨シャード数 ({recommended}) が記録済みのシャード数 ({shard_count}) を超えています。"
+                    f"増やす場合は SHARD_COUNT={recommended} と --repartition を指定して起動してください"
+                )
+            shard_count = shard_count or recommended
+            max_concurrency = max_concurrency or int(limit.get("max_concurrency", 1))
+            if int(limit.get("remaining", shard_count)) < shard_count:
+                logger.warning(
+                    f"セッション開始の残り回数 ({limit.get('remaining')}) がシャード数 ({shard_count}) より少ないため、"
+                    f"{int(limit.get('reset_after', 0)) / 1000:.0f} 秒後のリセットまで一部のシャードが接続できません"
+                )
+    shard_count = max(1, shard_count)
+    max_concurrency = max(1, max_concurrency)
+    if (
+        previous is not None
+        and previous[0] == shard_count
+        and not os.getenv("CLUSTER_COUNT")
+        and not os.getenv("CLUSTER_SHARDS")
+    ):
+        layout = previous[1]
+    else:
+        layout = build_layout(shard_count, int(os.getenv("CLUSTER_COUNT", "1")), os.getenv("CLUSTER_SHARDS"))
+
+    if found and (previous is None or previous[0] != shard_count or not same_layout(previous[1], layout)):
+        before = (
+            f"{previous[0]} シャード [{format_layout(previous[1])}]"
+            if previous is not None
+            else "不揃い（" + ", ".join(os.path.basename(path) for path in found) + "）"
+        )
+        after = f"{shard_count} シャード [{format_layout(layout)}]"
+        if not args.repartition:
+            logger.error(
+                f"シャードの割り当てが既存のクラスタ用DBの記録と異なります（{before} → {after}）。"
+                "このまま起動すると既存のDBの内容が使われないため起動しません。"
+                "移し替える場合は --repartition を付けて起動してください"
+            )
+            return 1
+        logger.info(f"クラスタ用DBを再分割します（{before} → {after}）")
+        await repartition(list(found), layout, shard_count)
+
+    # 既存の単一DBは、分割する前に v2 スキーマにしておく
+    if os.path.exists(SINGLE_DATABASE):
+        database = DatabaseManager(connection=await open_connection(SINGLE_DATABASE))
+        try:
+            await database.migrate()
+        finally:
+            await database.close()
+
+    lock_dir = os.path.join(DATABASE_DIR, "identify")
+    # LOG_FILE が指定されていれば、プロセスごとのログも同じディレクトリに出す（Docker でマウントしたディレクトリなど）
+    log_dir = os.path.dirname(os.getenv("LOG_FILE", "")) or ROOT
+    metrics_port = os.getenv("METRICS_PORT")
+    clusters: list[Cluster] = []
+    for index, shard_ids in enumerate(layout):
+        db_path = os.path.join(DATABASE_DIR, cluster_database_name(shard_ids, shard_count))
+        await prepare_database(db_path, shard_ids, shard_count)
+        await record_layout(db_path, shard_ids, shard_count)
+        env = dict(os.environ)
+        env.update(
+            {
+                "CLUSTER_ID": str(index),
+                "SHARD_COUNT": str(shard_count),
+                "SHARD_IDS": format_shard_ids(shard_ids),
+                "MAX_CONCURRENCY": str(max_concurrency),
+                "IDENTIFY_LOCK_DIR": lock_dir,
+                "DB_PATH": db_path,
+                "LOG_FILE": os.path.join(log_dir, f"discord.cluster{index}.log"),
+            }
+        )
+        if metrics_port:
+            env["METRICS_PORT"] = str(int(metrics_port) + index)
+        clusters.append(Cluster(index, shard_ids, env))
+    logger.info(
+        f"{shard_count} シャードを {len(clusters)} プロセスで起動します（max_concurrency={max_concurrency}）"
+    )
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:  # Windows
+            pass
+    runners = [asyncio.create_task(cluster.run(stopping)) for cluster in clusters]
+    waiter = asyncio.create_task(stopping.wait())
+    await asyncio.wait([waiter, asyncio.gather(*runners)], return_when=asyncio.FIRST_COMPLETED)
+    stopping.set()
+    logger.info("すべてのクラスタを停止しています")
+    await asyncio.gather(*(cluster.stop() for cluster in clusters))
+    await asyncio.gather(*runners, return_exceptions=True)
+    waiter.cancel()
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,198 @@
+"""
+`helpers/rest_scheduler.py` のテスト。
+
+実際の discord.py の代わりに `benchmarks/fakes.py` の偽HTTP層（遅延と 429）を呼び出しとして渡し、
+優先度の順番・ギルド間のラウンドロビン・トークンバケットによるペース・429 の扱いを確認します。
+"""
+
+import asyncio
+import time
+
+import discord
+import pytest
+
+from benchmarks.fakes import FakeHTTP, FakeRateLimited
+from helpers.rest_scheduler import (
+    PRIORITY_CREATE,
+    PRIORITY_DELETE,
+    PRIORITY_LOG,
+    PRIORITY_MOVE,
+    RestScheduler,
+)
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+def recorder(http: FakeHTTP, order: list, label):
+    """呼ばれた順番を記録してから偽HTTP層にリクエストする呼び出しを返します。"""
+
+    async def call():
+        order.append(label)
+        await http.request(f"POST /{label}")
+        return label
+
+    return call
+
+
+def flaky(http: FakeHTTP, error: BaseException, attempts: list, *, failures: int = 1):
+    """最初の ``failures`` 回は ``error`` を送出し、その後は成功する呼び出しを返します。"""
+
+    async def call():
+        attempts.append(time.monotonic())
+        if len(attempts) <= failures:
+            raise error
+        await http.request("PATCH /channels/{channel_id}")
+        return "ok"
+
+    return call
+
+
+async def submit_all(scheduler: RestScheduler, items):
+    """開始前に全部積んでから開始し、結果を待ちます（積んだ順ではなくスケジューラの順で実行される）。"""
+    futures = [asyncio.ensure_future(scheduler.submit(guild_id, priority, call)) for guild_id, priority, call in items]
+    await asyncio.sleep(0)
+    scheduler.start()
+    try:
+        return await asyncio.gather(*futures)
+    finally:
+        await scheduler.close()
+
+
+def test_priority_order():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    order: list = []
+    scheduler = RestScheduler(workers=1, rate=1000)
+    items = [
+        (1, PRIORITY_LOG, recorder(http, order, "log")),
+        (1, PRIORITY_DELETE, recorder(http, order, "delete")),
+        (1, PRIORITY_CREATE, recorder(http, order, "create")),
+        (1, PRIORITY_MOVE, recorder(http, order, "move")),
+    ]
+    assert run(submit_all(scheduler, items)) == ["log", "delete", "create", "move"]
+    assert order == ["move", "create", "delete", "log"]
+    assert http.stats()["requests"] == 4
+
+
+def test_round_robin_between_guilds():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    order: list = []
+    scheduler = RestScheduler(workers=1, rate=1000)
+    items = [(1, PRIORITY_MOVE, recorder(http, order, ("a", index))) for index in range(3)]
+    items += [(2, PRIORITY_MOVE, recorder(http, order, ("b", index))) for index in range(2)]
+    run(submit_all(scheduler, items))
+    # 混雑したギルド 1 が先に積んでいても、ギルド 2 は 1 件ごとに交互に実行される
+    assert order == [("a", 0), ("b", 0), ("a", 1), ("b", 1), ("a", 2)]
+
+
+def test_token_bucket_paces_requests():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    scheduler = RestScheduler(workers=4, rate=20)
+    items = [(guild_id % 3, PRIORITY_MOVE, recorder(http, [], guild_id)) for guild_id in range(30)]
+    started = time.monotonic()
+    run(submit_all(scheduler, items))
+    elapsed = time.monotonic() - started
+    # 最初の 20 件はバケットの残りで即座に、残り 10 件は 20 件/秒で送られる
+    assert elapsed >= 0.45
+    assert http.stats()["requests"] == 30
+
+
+def test_global_rate_limit_pauses_everything():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    attempts: list = []
+    finished: dict = {}
+    scheduler = RestScheduler(workers=2, rate=1000)
+
+    async def other_guild():
+        await asyncio.sleep(0.05)
+        await scheduler.submit(2, PRIORITY_MOVE, recorder(http, [], "other"))
+        finished["other"] = time.monotonic()
+
+    async def scenario():
+        scheduler.start()
+        try:
+            started = time.monotonic()
+            limited = scheduler.submit(1, PRIORITY_MOVE, flaky(http, FakeRateLimited(0.3, is_global=True), attempts))
+            result, _ = await asyncio.gather(limited, other_guild())
+            return started, result, scheduler.stats()
+        finally:
+            await scheduler.close()
+
+    started, result, stats = run(scenario())
+    assert result == "ok"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.28
+    # 別のギルドの呼び出しも全体の停止が明けるまで送られない
+    assert finished["other"] - started >= 0.28
+    assert stats["rate_limited"] == 1
+    assert stats["global_rate_limited"] == 1
+
+
+def test_route_rate_limit_delays_only_the_failing_call():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    attempts: list = []
+    finished: dict = {}
+    scheduler = RestScheduler(workers=1, rate=1000)
+
+    async def other_guild():
+        await asyncio.sleep(0.05)
+        await scheduler.submit(2, PRIORITY_MOVE, recorder(http, [], "other"))
+        finished["other"] = time.monotonic()
+
+    async def scenario():
+        scheduler.start()
+        try:
+            started = time.monotonic()
+            limited = scheduler.submit(1, PRIORITY_MOVE, flaky(http, FakeRateLimited(0.3), attempts))
+            task = asyncio.ensure_future(limited)
+            await other_guild()
+            delayed = scheduler.stats()["delayed"]
+            result = await task
+            return started, result, delayed, scheduler.stats()
+        finally:
+            await scheduler.close()
+
+    started, result, delayed, stats = run(scenario())
+    assert result == "ok"
+    assert attempts[1] - attempts[0] >= 0.28
+    # ワーカーが 1 つでも、制限されていない呼び出しは待たされない
+    assert finished["other"] - started < 0.2
+    assert delayed == 1
+    assert stats["rate_limited"] == 1
+    assert stats["global_rate_limited"] == 0
+    assert stats["paused_for"] == 0.0
+
+
+def test_discord_rate_limited_is_retried_per_route():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    attempts: list = []
+    scheduler = RestScheduler(workers=1, rate=1000)
+    result = run(submit_all(scheduler, [(1, PRIORITY_CREATE, flaky(http, discord.RateLimited(0.1), attempts))]))
+    assert result == ["ok"]
+    assert len(attempts) == 2
+    assert scheduler.stats()["global_rate_limited"] == 0
+
+
+def test_rate_limit_gives_up_after_max_retries():
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    attempts: list = []
+    scheduler = RestScheduler(workers=1, rate=1000, max_retries=2)
+    call = flaky(http, FakeRateLimited(0.01), attempts, failures=10)
+    with pytest.raises(FakeRateLimited):
+        run(submit_all(scheduler, [(1, PRIORITY_MOVE, call)]))
+    assert len(attempts) == 3
+    assert scheduler.stats()["classes"]["move"]["failed"] == 1
+
+
+def test_fake_http_rate_limits_are_absorbed():
+    # 偽HTTP層がランダムに返す（ルート単位の）429 は、再試行ですべて成功する
+    http = FakeHTTP(latency=0.001, jitter=0.0, rate_limit_probability=0.3, retry_after=0.01, seed=1)
+    scheduler = RestScheduler(workers=4, rate=1000, max_retries=20)
+    items = [(index % 4, PRIORITY_MOVE, lambda: http.request("PATCH /guilds/{guild_id}/members/{user_id}")) for index in range(40)]
+    run(submit_all(scheduler, items))
+    stats = scheduler.stats()
+    assert http.stats()["rate_limited"] > 0
+    assert stats["rate_limited"] == http.stats()["rate_limited"]
+    assert stats["classes"]["move"]["completed"] == 40
+    assert stats["classes"]["move"]["failed"] == 0